@@ -61,5 +61,11 @@ then
     exit 1
 fi
 
+# 分析テーブル gamehard_weekly_analysis と hard_sales(実体テーブル gamehard_sales とビュー)を作成する。
+if ! python3 ./update/refresh_analysis.py -c; then
+    echo "Error: Failed to build analysis tables and hard_sales."
+    exit 1
+fi
+
 exit 0
 # スクリプトの終了コードは0で正常終了を示す。
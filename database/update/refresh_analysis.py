@@ -2,7 +2,9 @@
 
 """gamehard_weeklyの14日集計を7日×2に正規化し、分析テーブルを再構築するユーティリティ。
 - normalize7_db(): period_date=14 の行を 7 日×2 に分割してINSERT/UPDATEする
-- insert_weekly_analysis(): gamehard_weekly_analysis を全件削除してから再生成する
+- insert_weekly_analysis(): gamehard_weekly_analysis を全件削除してから再生成し、
+  同じトランザクションで gamehard_sales(hard_salesビューの実体テーブル)も再生成する
+- rebuild_hard_sales_table(): gamehard_sales だけを再生成する
 """
 
 import os
@@ -27,9 +29,11 @@ def insert_weekly_analysis(db_path: str, debug_mode: bool = True) -> None:
           - delta_day/week/month/year（発売日との差分）
           - avg_units = units // period_date（整数除算）
           - sum_units = ハード別の累計台数（昇順で加算）
+        - 続けて _rebuild_hard_sales() で gamehard_sales と hard_sales ビューを再生成し、
+          まとめてコミットする。hard_sales が gamehard_weekly_analysis より古い状態になることはない。
     
     Side Effects:
-        - gamehard_weekly_analysis テーブルを削除・再挿入する。
+        - gamehard_weekly_analysis, gamehard_sales テーブルを削除・再挿入する。
     """
 
     conn = sqlite3.connect(db_path)
@@ -115,10 +119,257 @@ def insert_weekly_analysis(db_path: str, debug_mode: bool = True) -> None:
         else:
             print("追加する行はありません。")
 
-    if not debug_mode:
+    if debug_mode:
+        print(f"[REBUILD予定] {HARD_SALES_TABLE} テーブル再構築")
+    else:
+        try:
+            rebuilt = _rebuild_hard_sales(conn)
+        except BaseException:
+            conn.rollback()
+            conn.close()
+            raise
         conn.commit()
+        print(f"{HARD_SALES_TABLE}: {rebuilt} 行を再構築しました。")
     conn.close()
 
+# hard_salesの実体テーブル。gamehard_weekly, gamehard_weekly_analysis, gamehard_infoを
+# 結合した結果に、gamedata.hard_sales.load_hard_sales() が計算する派生カラムを加えて保存する。
+# hard_salesビューはこのテーブルの(派生カラムを除いた)別名で、ビューの定義はここ(_rebuild_hard_sales())だけにある
+HARD_SALES_TABLE = "gamehard_sales"
+
+# 保存した派生カラムの計算方法のバージョン。schema_versionカラムに保存する。
+# gamedata/hard_sales.py の DERIVED_SCHEMA_VERSION と同じ値にすること
+# (load_hard_sales() は値が一致する場合だけ保存された派生カラムを使う)
+HARD_SALES_SCHEMA_VERSION = 1
+
+# hard_salesビューのカラム
+HARD_SALES_VIEW_COLUMNS = [
+    "weekly_id", "begin_date", "end_date", "report_date", "period_date", "hw",
+    "units", "adjust_units", "year", "month", "mday", "week",
+    "delta_day", "delta_week", "delta_month", "delta_year",
+    "avg_units", "sum_units", "launch_date", "maker_name", "full_name",
+]
+
+# add_derived_columns() がビューのカラムの後ろに追加するカラム(最後は schema_version)
+HARD_SALES_DERIVED_COLUMNS = [
+    "q_num", "fiscal_year", "fiscal_month", "index_week", "index_month", "index_year",
+    "fq_num", "quarter", "fiscal_quarter", "units_diff", "ma4w", "ma13w", "ma52w",
+    "yearly_sum_units", "yday", "yweek", "schema_version",
+]
+
+HARD_SALES_COLUMNS = """
+    weekly_id TEXT NOT NULL PRIMARY KEY,
+    begin_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    period_date INTEGER NOT NULL,
+    hw TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    adjust_units INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    mday INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    delta_day INTEGER NOT NULL,
+    delta_week INTEGER NOT NULL,
+    delta_month INTEGER NOT NULL,
+    delta_year INTEGER NOT NULL,
+    avg_units INTEGER NOT NULL,
+    sum_units INTEGER NOT NULL,
+    launch_date TEXT NOT NULL,
+    maker_name TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    q_num INTEGER NOT NULL,             -- report_dateの四半期番号(1-4)
+    fiscal_year INTEGER NOT NULL,       -- 4月始まりの会計年度(期末年)
+    fiscal_month INTEGER NOT NULL,      -- 4月を1とする会計月
+    index_week INTEGER NOT NULL,        -- delta_week + 1
+    index_month INTEGER NOT NULL,       -- delta_month + 1
+    index_year INTEGER NOT NULL,        -- delta_year + 1
+    fq_num INTEGER NOT NULL,            -- fiscal_year内の四半期番号(1-4)
+    quarter TEXT NOT NULL,              -- 例: "2024Q1"
+    fiscal_quarter TEXT NOT NULL,       -- 例: "2025FQ4"
+    units_diff INTEGER,                 -- 同一ハードの前週差(最初の週はNULL)
+    ma4w INTEGER,                       -- 4週移動平均(4週に満たない間はNULL)
+    ma13w INTEGER,                      -- 13週移動平均(13週に満たない間はNULL)
+    ma52w INTEGER,                      -- 52週移動平均(52週に満たない間はNULL)
+    yearly_sum_units INTEGER NOT NULL,  -- report_date時点での暦年内の累計台数
+    yday INTEGER NOT NULL,              -- report_dateがその年の何日目か(1-366)
+    yweek INTEGER NOT NULL,             -- report_dateがその年の何週目か(日曜始まり、%U + 1)
+    schema_version INTEGER NOT NULL,    -- HARD_SALES_SCHEMA_VERSION
+    update_at TEXT                      -- gamehard_weekly.update_at(refresh_hard_sales() が差分の検出に使う)
+"""
+
+# gamehard_sales に保存する行(hard_sales ビューのカラムと、最後に gamehard_weekly.update_at)を求める結合
+HARD_SALES_SELECT = """
+SELECT
+    gw.id AS weekly_id,
+    gwa.begin_date AS begin_date,
+    gw.report_date AS end_date,
+    gw.report_date AS report_date,
+    gw.period_date AS period_date,
+    gw.hw AS hw,
+    (gw.units + IFNULL(gw.adjust_units, 0)) AS units,
+    IFNULL(gw.adjust_units, 0) AS adjust_units,
+    gwa.year AS year,
+    gwa.month AS month,
+    gwa.mday AS mday,
+    gwa.week AS week,
+    gwa.delta_day AS delta_day,
+    gwa.delta_week AS delta_week,
+    gwa.delta_month AS delta_month,
+    gwa.delta_year AS delta_year,
+    gwa.avg_units AS avg_units,
+    gwa.sum_units AS sum_units,
+    gi.launch_date AS launch_date,
+    gi.maker_name AS maker_name,
+    gi.full_name AS full_name,
+    gw.update_at AS update_at
+FROM
+    gamehard_weekly gw
+    INNER JOIN gamehard_weekly_analysis gwa ON gw.id = gwa.id
+    INNER JOIN gamehard_info gi ON gw.hw = gi.id
+ORDER BY gw.id
+"""
+
+def _moving_average(history: list, window: int):
+    """直近window週の平均を整数に丸める(窓に満たない場合はNone)。
+
+    Polarsの rolling_mean().round(0) と同じく、0.5 は偶数側に丸める。
+    """
+    if len(history) < window:
+        return None
+    return round(sum(history[-window:]) / window)
+
+def add_derived_columns(rows: list) -> list:
+    """hard_sales ビューのカラムの行(weekly_id順)に派生カラムを追加した行のリストを返す。
+
+    gamedata.hard_sales._with_derived_columns() と同じ値を計算する。
+    units_diff, 移動平均はハード別、yearly_sum_units はハード・年別に weekly_id 順で計算する。
+
+    Args:
+        rows: HARD_SALES_VIEW_COLUMNS の順の行(weekly_id昇順)
+
+    Returns:
+        list: HARD_SALES_VIEW_COLUMNS + HARD_SALES_DERIVED_COLUMNS の順のタプルのリスト
+    """
+    units_history = {}
+    yearly_sum_map = {}
+    derived_rows = []
+    for row in rows:
+        report_date, hw, units = row[3], row[5], row[6]
+        year, month = row[8], row[9]
+        delta_week, delta_month, delta_year = row[13], row[14], row[15]
+        report_dt = date.fromisoformat(report_date)
+
+        q_num = (report_dt.month - 1) // 3 + 1
+        fiscal_year = year if month <= 3 else year + 1
+        fiscal_month = (month + 8) % 12 + 1
+        fq_num = (fiscal_month - 1) // 3 + 1
+
+        # 前週差・移動平均
+        history = units_history.setdefault(hw, [])
+        units_diff = units - history[-1] if history else None
+        history.append(units)
+
+        # 暦年内の累計台数
+        yearly_sum_units = yearly_sum_map.get((hw, year), 0) + units
+        yearly_sum_map[(hw, year)] = yearly_sum_units
+
+        derived_rows.append(tuple(row) + (
+            q_num, fiscal_year, fiscal_month,
+            delta_week + 1, delta_month + 1, delta_year + 1,
+            fq_num, f"{year}Q{q_num}", f"{fiscal_year}FQ{fq_num}",
+            units_diff,
+            _moving_average(history, 4),
+            _moving_average(history, 13),
+            _moving_average(history, 52),
+            yearly_sum_units,
+            report_dt.timetuple().tm_yday,
+            int(report_dt.strftime("%U")) + 1,
+            HARD_SALES_SCHEMA_VERSION,
+        ))
+    return derived_rows
+
+def _rebuild_hard_sales(conn: sqlite3.Connection) -> int:
+    """gamehard_sales テーブルと hard_sales ビューを、呼び出し側のトランザクションの中で作り直す。
+
+    Args:
+        conn: トランザクションを開始済みの接続。コミット・ロールバックは呼び出し側が行う。
+
+    Returns:
+        int: gamehard_sales に保存した行数
+
+    処理概要:
+        - gamehard_weekly, gamehard_weekly_analysis, gamehard_info の結合結果を取得し、
+          add_derived_columns() で load_hard_sales() の派生カラムを計算。
+        - gamehard_sales を削除し、weekly_id を主キーとする WITHOUT ROWID テーブルとして再作成。
+          行は weekly_id（= report_date, hw）順に格納されるので、全件読み込みは
+          テーブルを先頭から読むだけで済む。
+        - 計算結果を、元の行の gamehard_weekly.update_at と一緒に一括INSERT。
+          gamedata の refresh_hard_sales() はこの update_at で差分を調べるので、
+          gamehard_weekly を更新してからこの再構築までの間に読み込んでも行を取りこぼさない。
+        - (hw, report_date) と (report_date) のインデックスを作成。
+          WITHOUT ROWID テーブルのインデックスは主キー(weekly_id)も含むため、
+          ハード・期間の絞り込みはテーブル本体を読まずに対象行を特定できる。
+        - hard_sales ビューを gamehard_sales の別名(派生カラムを除く)として再作成。
+    """
+    rows = conn.execute(HARD_SALES_SELECT).fetchall()
+    # update_at(最後のカラム)は派生カラムの計算に使わず、schema_version の後ろに保存する
+    derived_rows = [
+        derived + (row[-1],)
+        for row, derived in zip(rows, add_derived_columns([row[:-1] for row in rows]))
+    ]
+    conn.execute("DROP VIEW IF EXISTS hard_sales")
+    conn.execute(f"DROP TABLE IF EXISTS {HARD_SALES_TABLE}")
+    conn.execute(f"CREATE TABLE {HARD_SALES_TABLE} ({HARD_SALES_COLUMNS}) WITHOUT ROWID")
+    if derived_rows:
+        placeholders = ", ".join("?" * len(derived_rows[0]))
+        conn.executemany(f"INSERT INTO {HARD_SALES_TABLE} VALUES ({placeholders})", derived_rows)
+    conn.execute(
+        f"CREATE INDEX idx_{HARD_SALES_TABLE}_hw_report_date"
+        f" ON {HARD_SALES_TABLE}(hw, report_date)"
+    )
+    conn.execute(
+        f"CREATE INDEX idx_{HARD_SALES_TABLE}_report_date"
+        f" ON {HARD_SALES_TABLE}(report_date)"
+    )
+    conn.execute(
+        f"CREATE VIEW hard_sales AS SELECT {', '.join(HARD_SALES_VIEW_COLUMNS)}"
+        f" FROM {HARD_SALES_TABLE}"
+    )
+    return len(derived_rows)
+
+def rebuild_hard_sales_table(db_path: str, debug_mode: bool = True) -> None:
+    """gamehard_sales テーブルと hard_sales ビューだけを再構築する。
+
+    insert_weekly_analysis() は同じ再構築を分析テーブルと一緒に行うので、通常の更新では呼び出す必要はない。
+    HARD_SALES_SCHEMA_VERSION を上げたときなど、分析テーブルを変えずに作り直す場合に使う。
+
+    Args:
+        db_path: SQLiteデータベースのパス。
+        debug_mode: True の場合、再構築する行数を表示のみ（DB更新なし）。
+
+    処理は _rebuild_hard_sales() を1つのトランザクションで実行するため、読み込み側が途中の状態を見ることはない。
+    """
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if debug_mode:
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM ({HARD_SALES_SELECT})").fetchone()
+            print(f"[REBUILD予定] {HARD_SALES_TABLE} テーブル再構築: {count} 行")
+            return
+
+        conn.execute("BEGIN")
+        try:
+            rebuilt = _rebuild_hard_sales(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        print(f"{HARD_SALES_TABLE}: {rebuilt} 行を再構築しました。")
+    finally:
+        conn.close()
+
 def normalize7_db(db_path:str, debug_mode:bool=True) -> None:
     """period_date=14 の週次データを 7 日×2 のレコードへ正規化する。
     
@@ -208,7 +459,7 @@ def main() -> None:
     
     実行順:
         1) normalize7_db() で 14日集計の行を 7日×2 に分割
-        2) insert_weekly_analysis() で分析用テーブルを再生成
+        2) insert_weekly_analysis() で分析用テーブルと hard_sales の実体テーブルを再生成
     """
     db_path = os.getenv('GAMEHARD_DB')
     if not db_path:
@@ -33,15 +33,15 @@ def _():
 
 @app.cell
 def _(df_all):
-    _df = df_all.with_columns(
-        ((pl.col("units") - pl.col("ma4w"))/pl.col("ma4w")).alias("deviation")
+    _df = g.rolling(df_all, stats=["mean"], windows=[4]).with_columns(
+        ((pl.col("units") - pl.col("units_mean4w"))/pl.col("units_mean4w")).alias("deviation")
     )
     _df = _df.select(
         pl.col("report_date"),
         pl.col("delta_week"),
         pl.col("hw"),
         pl.col("units"),
-        pl.col("ma4w"),
+        pl.col("units_mean4w"),
         pl.col("deviation")
     )
     _df = (_df
@@ -36,6 +36,10 @@ from .chart_rule import (
     chart_line_guide,
     chart_rule_xy,
 )
+from .datasource import (
+    get_db_path,
+    set_db_path,
+)
 from .hard_annotation import (
     load_hard_annotation,
     summarize_annotation,
@@ -56,7 +60,10 @@ from .hard_info import (
 
 # Import main functions from modules
 from .hard_sales import (
+    compact_hard_sales,
     current_report_date,
+    enable_snapshot,
+    expand_hard_sales,
     get_active_hw,
     get_active_maker,
     get_hw,
@@ -64,26 +71,37 @@ from .hard_sales import (
     get_maker,
     get_maker_all,
     load_hard_sales,
+    load_hard_sales_lazy,
+    refresh_hard_sales,
 )
 from .hard_sales_extract import (
     extract_by_date,
+    extract_by_dates,
     extract_latest,
     extract_total,
     extract_week_reached_units,
     hard_sales_summary,
+    hard_sales_summary_table,
     maker_sales_summary,
+    maker_sales_summary_table,
+    milestone_table,
+    rolling,
     sales_value,
+    sales_values,
 )
 from .hard_sales_filter import (
     date_filter,
     delta_yearly_sales,
+    fiscal_yearly_sales,
     monthly_sales,
+    periodic_sales,
     quarterly_sales,
     weekly_sales,
     yearly_maker_sales,
     yearly_sales,
 )
 from .hard_sales_long import (
+    all_pairs,
     cumulative_sales_by_delta_long,
     cumulative_sales_long,
     maker_long,
@@ -127,6 +145,11 @@ from .marimo_util import (
     HwSelect,
     MakerSelect,
 )
+from .memo import (
+    clear_memo,
+    enable_memo,
+    memo_info,
+)
 from .util import (
     # Utility functions can be added here
     report_begin,
@@ -0,0 +1,228 @@
+# SQLiteデータベースからPolarsのDataFrameを読み込むためのユーティリティ関数群
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping, Sequence
+from urllib.parse import quote
+
+import polars as pl
+
+DEFAULT_DB_PATH = "/Users/hide/Documents/sqlite3/gamehard.db"
+# 読み込むデータベースのパス。データ更新スクリプトと同じく環境変数GAMEHARD_DBで指定できる
+DB_PATH = os.environ.get("GAMEHARD_DB", DEFAULT_DB_PATH)
+# プールに保持しておく未使用の接続の最大数
+POOL_SIZE = 4
+# 読み取り専用接続に設定するPRAGMA
+CONNECTION_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": -32768,  # 32MiB(負の値はKiB単位)
+    "mmap_size": 268435456,  # 256MiB
+    "temp_store": "MEMORY",
+}
+
+# SQLiteではTEXTとして保存されている日付の書式
+DATE_FORMAT = "%Y-%m-%d"
+
+# 行の順序をqueryに頼るかどうかの判定に使う(ウィンドウ関数などのORDER BYも含めて、保守的に判定する)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+# 未使用の接続のリスト。要素は(DBパス, ファイルの識別子, 接続)
+_pool: list[tuple[str, tuple[int, int] | None, sqlite3.Connection]] = []
+_pool_lock = threading.Lock()
+
+
+def set_db_path(path: str) -> None:
+    """
+    読み込むデータベースのパスを変更する関数。プールしている接続は閉じる。
+
+    Args:
+        path: SQLiteデータベースファイルのパス
+    """
+    global DB_PATH
+    DB_PATH = path
+    close_connections()
+
+
+def get_db_path() -> str:
+    """
+    読み込むデータベースのパスを返す関数。
+
+    Returns:
+        str: SQLiteデータベースファイルのパス(環境変数GAMEHARD_DB、未設定ならDEFAULT_DB_PATH)
+    """
+    return DB_PATH
+
+
+def _file_id(path: str) -> tuple[int, int] | None:
+    """DBファイルの(デバイス, inode)を返す。ファイルが置き換えられたことの検出に使う"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """読み取り専用の接続を開き、PRAGMAを設定する"""
+    conn = sqlite3.connect(
+        f"file:{quote(os.path.abspath(path))}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+    )
+    for name, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    return conn
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """
+    DB_PATHのデータベースへの読み取り専用接続をプールから取り出すコンテキストマネージャ。
+
+    withブロックを抜けると接続はプールに戻され、次の読み込みで再利用される。
+    SQLiteのページキャッシュやメモリマップは接続ごとに保持されるため、
+    再利用することで読み込みのたびに接続を開き直してキャッシュを温め直す必要がなくなる。
+    接続は同時に1つのスレッドだけが使うので、複数のスレッドから同時に呼び出してもよい。
+
+    Yields:
+        sqlite3.Connection: 読み取り専用の接続(query_only, mode=ro)
+
+    Example:
+        >>> with connect() as conn:
+        ...     df = read_sql("SELECT * FROM gamehard_info", conn)
+    """
+    path = DB_PATH
+    file_id = _file_id(path)
+    conn = None
+    stale = []
+    with _pool_lock:
+        while _pool:
+            pooled_path, pooled_id, pooled_conn = _pool.pop()
+            if pooled_path == path and pooled_id == file_id:
+                conn = pooled_conn
+                break
+            stale.append(pooled_conn)
+    for stale_conn in stale:
+        stale_conn.close()
+    if conn is None:
+        conn = _open_connection(path)
+
+    try:
+        yield conn
+    except BaseException:
+        conn.close()
+        raise
+    with _pool_lock:
+        if len(_pool) < POOL_SIZE:
+            _pool.append((path, file_id, conn))
+            return
+    conn.close()
+
+
+def close_connections() -> None:
+    """
+    プールしている未使用の接続をすべて閉じる関数。
+    """
+    with _pool_lock:
+        conns = [conn for _, _, conn in _pool]
+        _pool.clear()
+    for conn in conns:
+        conn.close()
+
+
+def read_sql(
+    query: str,
+    conn: sqlite3.Connection,
+    params: Sequence[Any] = (),
+    schema: Mapping[str, pl.DataType] | None = None,
+) -> pl.DataFrame:
+    """
+    SQLを実行し、結果を列ごとに型を指定してDataFrameに変換する関数。
+
+    pl.read_database()はカーソルから1行ずつPythonのタプルを受け取り、型を推論しながら
+    DataFrameを組み立てる。この関数はSQLite側でjson_group_array()を使って列ごとに
+    1つのJSON配列にまとめて取得し、Polarsのjson_decodeでschemaの型の列に一括変換する。
+    Pythonのオブジェクトは値ごとではなく列ごとに1つしか作られない。
+    TEXTで保存されている日付はschemaでpl.Dateを指定すれば読み込み時に変換される。
+
+    集約関数に渡される行の順序はSQLiteでは保証されず、REALの値はJSONのテキストで有効数字15桁に丸められる。
+    そのため、queryにORDER BYがある場合とschemaに浮動小数点数の型がある場合は、
+    行を取得して列に転置する方法で読み込む。JSON関数が使えないSQLiteの場合も同じ方法で読み込む。
+    REALのカラムは、schemaで型を指定しなければ丸められた値になる。
+
+    Args:
+        query: 実行するSQL(行の順序はqueryのORDER BYに従う。ORDER BYが無い場合の順序は不定)
+        conn: SQLiteの接続
+        params: SQLのプレースホルダ(?)に渡す値
+        schema: カラム名と型の辞書。指定の無いカラムは値から型を推論する
+
+    Returns:
+        pl.DataFrame: クエリ結果のDataFrame(カラム順はSELECTの順)
+    """
+    schema = schema or {}
+    query = query.strip().rstrip(";")
+    if _ORDER_BY.search(query) or any(dtype.is_float() for dtype in schema.values()):
+        return _read_rows(query, conn, params, schema)
+    names = [
+        desc[0]
+        for desc in conn.execute(f"SELECT * FROM ({query}) LIMIT 0", params).description
+    ]
+    aggregates = ", ".join(f'json_group_array("{name}")' for name in names)
+    try:
+        arrays = conn.execute(f"SELECT {aggregates} FROM ({query})", params).fetchone()
+    except sqlite3.OperationalError:
+        return _read_rows(query, conn, params, schema)
+    return pl.DataFrame(
+        [
+            _json_to_series(name, array, schema.get(name))
+            for name, array in zip(names, arrays)
+        ]
+    )
+
+
+def _json_to_series(name: str, array: str, dtype: pl.DataType | None) -> pl.Series:
+    """json_group_array()で取得した1列分のJSON配列をdtypeのSeriesに変換する"""
+    decode_dtype = pl.Utf8 if dtype == pl.Date else dtype
+    series = (
+        pl.Series(name, [array])
+        .str.json_decode(pl.List(decode_dtype) if decode_dtype is not None else None)[0]
+        .alias(name)
+    )
+    if dtype == pl.Date:
+        return series.str.to_date(DATE_FORMAT)
+    return series
+
+
+def _read_rows(
+    query: str,
+    conn: sqlite3.Connection,
+    params: Sequence[Any],
+    schema: Mapping[str, pl.DataType],
+) -> pl.DataFrame:
+    """行を取得して列に転置し、列ごとにSeriesを生成する(行の順序や値をそのまま保つ読み込み)"""
+    cursor = conn.execute(query, params)
+    names = [desc[0] for desc in cursor.description]
+    rows = cursor.fetchall()
+    cursor.close()
+
+    columns = zip(*rows) if rows else [[] for _ in names]
+    return pl.DataFrame(
+        [
+            _values_to_series(name, values, schema.get(name))
+            for name, values in zip(names, columns)
+        ]
+    )
+
+
+def _values_to_series(
+    name: str, values: Sequence[Any], dtype: pl.DataType | None
+) -> pl.Series:
+    """1列分の値をdtypeのSeriesに変換する"""
+    if dtype is None:
+        return pl.Series(name, values, strict=False)
+    if dtype == pl.Date:
+        return pl.Series(name, values, dtype=pl.Utf8).str.to_date(DATE_FORMAT)
+    return pl.Series(name, values, dtype=dtype)
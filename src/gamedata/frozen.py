@@ -0,0 +1,76 @@
+# キャッシュしたDataFrameを複製せずに共有するための読み取り専用DataFrame
+
+from typing import Any, NoReturn
+
+import polars as pl
+
+
+class FrozenDataFrame(pl.DataFrame):
+    """
+    その場で内容を書き換えるメソッドを禁止したpl.DataFrame。
+
+    load_hard_sales(copy=False) などがモジュール内のキャッシュをそのまま返すときに使う。
+    filter()やwith_columns()など新しいDataFrameを返す操作は通常どおり使え、
+    その結果は普通のpl.DataFrameになる。書き換えたい場合はclone()で複製すること。
+
+    Note:
+        polarsのDataFrameはカラムのバッファを共有するため、禁止すべきなのは
+        DataFrameオブジェクト自身を書き換える操作（列の追加・置換・削除、行の追加、
+        カラム名の変更、要素の代入）だけである。
+    """
+
+    @classmethod
+    def _from_pydf(cls, py_df: Any) -> pl.DataFrame:
+        # 派生したDataFrameは呼び出し側の持ち物なので、通常のDataFrameとして返す
+        return pl.DataFrame._from_pydf(py_df)
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError(
+            "読み取り専用のDataFrameは変更できません。clone()で複製してから変更してください。"
+        )
+
+    __setitem__ = _readonly
+    insert_column = _readonly
+    replace_column = _readonly
+    drop_in_place = _readonly
+    extend = _readonly
+
+    @property
+    def columns(self) -> list[str]:
+        return super().columns
+
+    @columns.setter
+    def columns(self, names: Any) -> None:
+        self._readonly()
+
+    def hstack(self, columns: Any, *, in_place: bool = False) -> pl.DataFrame:
+        if in_place:
+            self._readonly()
+        return super().hstack(columns)
+
+    def vstack(self, other: pl.DataFrame, *, in_place: bool = False) -> pl.DataFrame:
+        if in_place:
+            self._readonly()
+        return super().vstack(other)
+
+    def shrink_to_fit(self, *, in_place: bool = False) -> pl.DataFrame:
+        if in_place:
+            self._readonly()
+        return super().shrink_to_fit()
+
+
+def freeze(df: pl.DataFrame) -> FrozenDataFrame:
+    """
+    DataFrameのデータを複製せずに、読み取り専用のFrozenDataFrameとして包む関数。
+
+    Args:
+        df: 包む対象のDataFrame。FrozenDataFrameの場合はそのまま返す
+
+    Returns:
+        FrozenDataFrame: dfとカラムのバッファを共有する読み取り専用のDataFrame
+    """
+    if isinstance(df, FrozenDataFrame):
+        return df
+    frozen = FrozenDataFrame.__new__(FrozenDataFrame)
+    frozen._df = df._df.clone()
+    return frozen
@@ -1,27 +1,28 @@
 # Game Annotation取得用のユーティリティ関数群
 
-import sqlite3
 from datetime import datetime, date
 import polars as pl
 from typing import List, TypedDict, Dict, Any
+from . import datasource as ds
 from . import hard_info as hi
+from .frozen import FrozenDataFrame, freeze
 from .mode import Mode, parse_mode
 
-DB_PATH = "/Users/hide/Documents/sqlite3/gamehard.db"
 # ISO 8601形式の曜日定数
 ISO_MONDAY = 1
 ISO_SUNDAY = 7
 
-_annotation_dataframe: pl.DataFrame | None = None
+_annotation_dataframe: FrozenDataFrame | None = None
 
 
-def load_hard_annotation(no_cache: bool = False) -> pl.DataFrame:
+def load_hard_annotation(no_cache: bool = False, copy: bool = True) -> pl.DataFrame:
     """
     sqlite3を使用してデータベースからハードウェアアノテーションデータを読み込む関数。
     日付関係のカラムをdatetime型に変換して返す。
 
     Args:
         no_cache (bool): Trueの場合はキャッシュを無視してデータを再読み込みする。
+        copy (bool): Falseの場合はキャッシュを複製せずに読み取り専用のDataFrameとして返す。
 
     Returns:
         pl.DataFrame: ハードウェアアノテーションデータのDataFrame。
@@ -50,27 +51,23 @@ def load_hard_annotation(no_cache: bool = False) -> pl.DataFrame:
     global _annotation_dataframe
 
     if _annotation_dataframe is not None and not no_cache:
-        return _annotation_dataframe.clone()
-    # データベースに接続
-    conn = sqlite3.connect(DB_PATH)
+        return _annotation_dataframe.clone() if copy else _annotation_dataframe
     # データを読み込む
     query = "SELECT * FROM gamehard_annotation"
-    df = pl.read_database(query=query, connection=conn)
-    # データベース接続を閉じる
-    conn.close()
+    with ds.connect() as conn:
+        df = ds.read_sql(query, conn, schema={"report_date": pl.Date})
 
-    # カラムdateとカラムreport_dateをdate型に変換
+    # カラムdateをdate型に変換(report_dateは読み込み時に変換済み)
     df = df.with_columns(
         pl.col("date").str.strptime(pl.Date, format="%Y-%m-%d").alias("annotation_date")
     )
-    df = df.with_columns(pl.col("report_date").str.strptime(pl.Date, format="%Y-%m-%d"))
 
     df = _delta_annotation(df, hi.load_hard_info())
     df = _refine_annotation(df)
 
-    _annotation_dataframe = df
+    _annotation_dataframe = freeze(df)
 
-    return _annotation_dataframe.clone()
+    return _annotation_dataframe.clone() if copy else _annotation_dataframe
 
 
 def _delta_annotation(
@@ -229,7 +226,7 @@ def join_annotation(
         return set(required).issubset(set(main_list))
 
     mode_enum = parse_mode(mode)
-    annotation_df = load_hard_annotation().filter(pl.col("level") <= level)
+    annotation_df = load_hard_annotation(copy=False).filter(pl.col("level") <= level)
     annotation_df = _summarize_annotation(annotation_df, mode_enum)
     if hw_col is not None:
         # カラム名 hw_col の内容を hw カラムにコピー (結合のため)
@@ -1,8 +1,7 @@
 # ゲームハードおよびゲームメーカーの情報を返すライブラリ
-import sqlite3
 import polars as pl
 
-DB_PATH = "/Users/hide/Documents/sqlite3/gamehard.db"
+from . import datasource as ds
 
 
 def load_hard_info() -> pl.DataFrame:
@@ -17,14 +16,10 @@ def load_hard_info() -> pl.DataFrame:
         - maker_name (String): メーカー名
         - full_name (String): ゲームハードの正式名称
     """
-    # SQLite3データベースに接続
-    conn = sqlite3.connect(DB_PATH)
     # SQLクエリを実行してデータをDataFrameに読み込む
     query = "SELECT * FROM gamehard_info;"
-    df = pl.read_database(query, conn)
-    df = df.with_columns(pl.col("launch_date").str.to_date())
-    # 接続を閉じる
-    conn.close()
+    with ds.connect() as conn:
+        df = ds.read_sql(query, conn, schema={"launch_date": pl.Date})
     return df
 
 
@@ -1,11 +1,16 @@
 # GameData分析用のユーティリティ関数群
 
+import glob
+import hashlib
+import os
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 import polars as pl
-from typing import List
+from typing import Callable, List
 
+from . import datasource as ds
 from . import hard_info as hi
+from .frozen import FrozenDataFrame, freeze
 
 # Polars Configuration
 (
@@ -19,29 +24,130 @@ from . import hard_info as hi
     # .set_tbl_column_data_type_inline(True)
 )
 
-DB_PATH = "/Users/hide/Documents/sqlite3/gamehard.db"
-_hard_sales_cache: pl.DataFrame | None = None
+# 派生カラム計算済みDataFrameのスナップショットを保存するディレクトリ
+SNAPSHOT_DIR = os.environ.get(
+    "GAMEDATA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "gamedata")
+)
+# _with_derived_columns() の出力スキーマを変更したら値を上げること(古いスナップショットを無効化する)
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# database/update/refresh_analysis.pyがgamehard_salesテーブルに保存する派生カラムのバージョン。
+# _with_derived_columns()の計算を変更したら、refresh_analysis.pyのHARD_SALES_SCHEMA_VERSIONと
+# 一緒に値を上げること(バージョンが一致しないDBでは保存された派生カラムを使わない)
+DERIVED_SCHEMA_VERSION = 1
+
+# 移動平均の最大ウィンドウ(52週)の計算に必要な、対象行より前の行数
+_WARMUP_WEEKS = 51
+
+_hard_sales_cache: FrozenDataFrame | None = None
+# _hard_sales_cache をcompact_hard_sales()で変換したもの(load_hard_sales(compact=True)で使う)
+_hard_sales_compact_cache: FrozenDataFrame | None = None
+# キャッシュ読み込み時点の hard_sales の行の update_at の最大値(refresh_hard_sales()で使う)
+_hard_sales_watermark: str | None = None
+# キャッシュ読み込み時点の hard_sales に現れるハード毎の(launch_date, maker_name, full_name)
+# (refresh_hard_sales()でgamehard_infoの変更を検出するのに使う)
+_hard_sales_info: dict[str, tuple] | None = None
 _all_hw_list = None
 _all_maker_list = None
+_snapshot_enabled: bool = True
+# _hard_sales_cache を読み込み直す・更新するたびに1つ増やすバージョン(集計結果のキャッシュの無効化に使う)
+_data_version: int = 0
+# frame_version()で比較する、_hard_sales_cacheのカラム毎のメモリのアドレス
+_cache_buffers: dict[str, tuple | None] = {}
+# _hard_sales_cache を破棄・置き換えたときに呼び出す関数(キャッシュから計算した結果を保持するモジュールが登録する)
+_cache_listeners: list[Callable[[], None]] = []
+# _hard_sales_cache のハード毎の最新の状態(latest_state()で作り、refresh_hard_sales()では変更のあったハードだけ更新する)
+_latest_state_cache: FrozenDataFrame | None = None
+# _latest_state_cache を作った時点のdata_version()
+_latest_state_version: int | None = None
+
+
+# hard_salesビューのカラムの型(datasource.read_sql()で読み込むときに使う)
+_RAW_SCHEMA = {
+    "weekly_id": pl.Utf8,
+    "begin_date": pl.Date,
+    "end_date": pl.Date,
+    "report_date": pl.Date,
+    "period_date": pl.Int16,
+    "hw": pl.Utf8,
+    "units": pl.Int64,
+    "adjust_units": pl.Int64,
+    "year": pl.Int16,
+    "month": pl.Int16,
+    "mday": pl.Int16,
+    "week": pl.Int16,
+    "delta_day": pl.Int32,
+    "delta_week": pl.Int32,
+    "delta_month": pl.Int16,
+    "delta_year": pl.Int16,
+    "avg_units": pl.Int64,
+    "sum_units": pl.Int64,
+    "launch_date": pl.Date,
+    "maker_name": pl.Utf8,
+    "full_name": pl.Utf8,
+}
+
+
+# _with_derived_columns()で追加するカラムの型(gamehard_salesテーブルから読み込むときに使う)
+_DERIVED_SCHEMA = {
+    "q_num": pl.Int8,
+    "fiscal_year": pl.Int16,
+    "fiscal_month": pl.Int8,
+    "index_week": pl.Int32,
+    "index_month": pl.Int16,
+    "index_year": pl.Int16,
+    "fq_num": pl.Int8,
+    "quarter": pl.Utf8,
+    "fiscal_quarter": pl.Utf8,
+    "units_diff": pl.Int64,
+    "ma4w": pl.Int64,
+    "ma13w": pl.Int64,
+    "ma52w": pl.Int64,
+    "yearly_sum_units": pl.Int64,
+    "yday": pl.Int16,
+    "yweek": pl.Int16,
+}
+
+# load_hard_sales()が返すDataFrameのカラムの型(カラム順も同じ)
+_HARD_SALES_SCHEMA = {**_RAW_SCHEMA, **_DERIVED_SCHEMA}
+
+
+def _cast_raw_columns(df: pl.DataFrame) -> pl.DataFrame:
+    """hard_salesビューから読み込んだカラムを適切な型に変換する(変換済みのカラムはそのまま)"""
+    return df.cast({col: dtype for col, dtype in _RAW_SCHEMA.items() if col in df.columns})
+
+
+def _rolling_expr(value: str, stat: str, window: int, by: str | None) -> pl.Expr:
+    """
+    byの値毎にreport_dateの順に並べたvalueの、直近window週の統計量を元の行の順に返す式。
+
+    ma4w/ma13w/ma52wとgamedata.rolling_statsの移動統計量は、どちらもこの式で計算する。
+    statは"mean", "sum", "std", "min", "max", "ewm"(window週をspanとする指数移動平均)のいずれか。
+    """
+    col = pl.col(value)
+    if stat == "mean":
+        expr = col.rolling_mean(window_size=window)
+    elif stat == "sum":
+        expr = col.rolling_sum(window_size=window)
+    elif stat == "std":
+        expr = col.rolling_std(window_size=window)
+    elif stat == "min":
+        expr = col.rolling_min(window_size=window)
+    elif stat == "max":
+        expr = col.rolling_max(window_size=window)
+    else:
+        expr = col.ewm_mean(span=window, min_samples=window)
+    return expr.over(by, order_by="report_date")
+
+
+def _moving_average(window: int) -> pl.Expr:
+    """ハード毎の直近window週の週販の平均を整数に丸めた式(ma4w等)"""
+    return _rolling_expr("units", "mean", window, "hw").round(0).cast(pl.Int64)
 
 
 def _with_derived_columns(df: pl.DataFrame) -> pl.DataFrame:
     return (
-        df.with_columns(
-            pl.col("begin_date").cast(pl.Utf8).str.to_date(),
-            pl.col("report_date").cast(pl.Utf8).str.to_date(),
-            pl.col("end_date").cast(pl.Utf8).str.to_date(),
-            pl.col("launch_date").cast(pl.Utf8).str.to_date(),
-            pl.col("period_date").cast(pl.Int16),
-            pl.col("year").cast(pl.Int16),
-            pl.col("month").cast(pl.Int16),
-            pl.col("mday").cast(pl.Int16),
-            pl.col("week").cast(pl.Int16),
-            pl.col("delta_day").cast(pl.Int32),
-            pl.col("delta_week").cast(pl.Int32),
-            pl.col("delta_month").cast(pl.Int16),
-            pl.col("delta_year").cast(pl.Int16),
-        )
+        _cast_raw_columns(df)
         .with_columns(
             q_num=pl.col("report_date").dt.quarter().cast(pl.Int8),
             fiscal_year=pl.when(pl.col("month") <= 3)
@@ -69,24 +175,9 @@ def _with_derived_columns(df: pl.DataFrame) -> pl.DataFrame:
         .sort("weekly_id")
         .with_columns(
             pl.col("units").diff().over("hw").alias("units_diff"),
-            pl.col("units")
-            .rolling_mean(window_size=4)
-            .round(0)
-            .cast(pl.Int64)
-            .over("hw")
-            .alias("ma4w"),
-            pl.col("units")
-            .rolling_mean(window_size=13)
-            .round(0)
-            .cast(pl.Int64)
-            .over("hw")
-            .alias("ma13w"),
-            pl.col("units")
-            .rolling_mean(window_size=52)
-            .round(0)
-            .cast(pl.Int64)
-            .over("hw")
-            .alias("ma52w"),
+            _moving_average(4).alias("ma4w"),
+            _moving_average(13).alias("ma13w"),
+            _moving_average(52).alias("ma52w"),
             pl.col("units")
             .cum_sum()
             .over(pl.col("hw"), pl.col("year"))
@@ -99,13 +190,128 @@ def _with_derived_columns(df: pl.DataFrame) -> pl.DataFrame:
     )
 
 
-def load_hard_sales(no_cache: bool = False) -> pl.DataFrame:
+def enable_snapshot(enable: bool = True) -> None:
+    """
+    load_hard_sales()のディスクスナップショットの利用を切り替える
+
+    Args:
+        enable: Falseの場合はスナップショットを読み書きせず、常にDBから読み込む。
+    """
+    global _snapshot_enabled
+    _snapshot_enabled = enable
+
+
+def _db_fingerprint(db_path: str) -> str | None:
+    """
+    DBファイルの更新状態を表すフィンガープリントを返す。
+
+    DBファイル(およびWALファイル)のパス・更新時刻・サイズと、
+    SNAPSHOT_SCHEMA_VERSIONから計算する。DBファイルが存在しない場合はNone。
+    """
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    parts = [os.path.abspath(db_path), st.st_mtime_ns, st.st_size]
+    try:
+        wal = os.stat(db_path + "-wal")
+        parts += [wal.st_mtime_ns, wal.st_size]
+    except OSError:
+        pass
+    parts.append(SNAPSHOT_SCHEMA_VERSION)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def _db_path_key(db_path: str) -> str:
+    """DBファイルのパスから、スナップショットのファイル名に付けるキーを返す"""
+    return hashlib.sha1(os.path.abspath(db_path).encode()).hexdigest()[:12]
+
+
+def _snapshot_path(db_path: str, fingerprint: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"hard_sales_{_db_path_key(db_path)}_{fingerprint}.arrow")
+
+
+def _read_snapshot(db_path: str, fingerprint: str) -> pl.DataFrame | None:
+    """スナップショットをメモリマップで読み込む。存在しない・壊れている場合はNone。"""
+    path = _snapshot_path(db_path, fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pl.read_ipc(path, memory_map=True)
+    except (OSError, pl.exceptions.PolarsError):
+        return None
+
+
+def _snapshot_available() -> bool:
+    """現在のDBファイルに対応するスナップショットが保存されているか"""
+    if not _snapshot_enabled:
+        return False
+    db_path = ds.get_db_path()
+    fingerprint = _db_fingerprint(db_path)
+    return fingerprint is not None and os.path.exists(_snapshot_path(db_path, fingerprint))
+
+
+def _write_snapshot(df: pl.DataFrame, db_path: str, fingerprint: str) -> None:
+    """
+    スナップショットをArrow IPC(非圧縮)で書き出し、同じDBファイルの古いスナップショットを削除する。
+    (別のDBファイルのスナップショットは残すので、DBを切り替えても読み込み直しにならない)
+    スナップショットはあくまでキャッシュなので、書き込みに失敗しても例外は出さない。
+    """
+    path = _snapshot_path(db_path, fingerprint)
+    pattern = os.path.join(SNAPSHOT_DIR, f"hard_sales_{_db_path_key(db_path)}_*.arrow")
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.write_ipc(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)  # 書きかけのファイルを読まれないようにする
+        for old_path in glob.glob(pattern):
+            if old_path != path:
+                os.remove(old_path)
+    except OSError:
+        pass
+
+
+def load_hard_sales(
+    no_cache: bool = False,
+    copy: bool = True,
+    compact: bool = False,
+    hw: List[str] | None = None,
+    begin: datetime | date | None = None,
+    end: datetime | date | None = None,
+    columns: List[str] | None = None,
+) -> pl.DataFrame:
     """
     sqlite3を使用してデータベースからハードウェア販売データを読み込む関数。
     日付関係のカラムをdate型に変換し、整数カラムを適切なサイズにキャストして返す。
 
+    一度計算したDataFrameはSNAPSHOT_DIRにArrow IPC形式のスナップショットとして保存され、
+    DBファイルが更新されていなければ、次回以降のプロセスではDBを読まずにスナップショットを
+    メモリマップで読み込む。
+
+    copy=Falseを指定すると、キャッシュを複製せずに読み取り専用のFrozenDataFrameとして返す。
+    filter()やselect()など新しいDataFrameを返す操作だけを行う場合はこちらで十分であり、
+    チャートやレポートの関数は内部でこちらを使う。
+
+    compact=Trueを指定すると、compact_hard_sales()で変換した省メモリ版のDataFrameを返す。
+
+    hw, begin, end, columnsのいずれかを指定すると、その範囲だけを新しいDataFrameとして返す。
+    全件のキャッシュやスナップショットがあればそれを絞り込み、無ければ指定範囲だけを
+    DBから読み込む(全件のキャッシュは作らない)。
+    DBのgamehard_salesテーブルにdatabase/update/refresh_analysis.pyが計算した派生カラムが
+    保存されていて、そのバージョンがDERIVED_SCHEMA_VERSIONと一致する場合は、
+    指定範囲の行を派生カラムごと読み込むだけで済む。古いDBでは、移動平均(最大52週)・
+    前週差・年次累計が全件読み込みと同じ値になるよう、beginより前の51週分と
+    beginと同じ年の行を一緒に読み込んで計算し、計算後に取り除く。
+
     Args:
-        no_cache: Trueの場合はグローバルキャッシュを破棄し、DBから再読み込みする。
+        no_cache: Trueの場合はグローバルキャッシュとスナップショットを破棄し、DBから再読み込みする。
+        copy: Trueの場合は呼び出し側が自由に変更できる複製を返す。
+              Falseの場合はキャッシュを共有する読み取り専用のDataFrameを返す。
+        compact: Trueの場合はcompact_hard_sales()の形式で返す。
+        hw: 読み込むハードのリスト。Noneの場合は全ハード
+        begin: 読み込む期間の開始日(report_date >= begin の行)。Noneの場合は最初から
+        end: 読み込む期間の終了日(report_date <= end の行)。Noneの場合は最後まで
+        columns: 返すカラムのリスト。Noneの場合は全カラム
 
     Returns:
         pl.DataFrame: ハードウェア販売データのDataFrame。
@@ -150,39 +356,681 @@ def load_hard_sales(no_cache: bool = False) -> pl.DataFrame:
         - yday (Int16): report_dateの日がその年の何日目か（1-366）
         - yweek (Int16): report_dateがその年の何番目の日曜日か（1-53）
     """
-    global _hard_sales_cache, _all_hw_list, _all_maker_list
+    global _hard_sales_cache, _hard_sales_compact_cache, _hard_sales_watermark, _hard_sales_info
+    global _all_hw_list, _all_maker_list
+
+    if hw is not None or begin is not None or end is not None or columns is not None:
+        df = _load_hard_sales_range(
+            no_cache, hw, _as_date(begin, is_begin=True), _as_date(end)
+        )
+        if columns is not None:
+            df = df.select(columns)
+        return compact_hard_sales(df) if compact else df
 
     if no_cache:
         _hard_sales_cache = None
+        _hard_sales_compact_cache = None
+        _hard_sales_watermark = None
+        _hard_sales_info = None
         _all_hw_list = None
         _all_maker_list = None
+        _notify_cache_listeners()
     elif _hard_sales_cache is not None:
-        return _hard_sales_cache.clone()
+        return _share_cache(copy, compact)
+
+    db_path = ds.get_db_path()
+    fingerprint = _db_fingerprint(db_path) if _snapshot_enabled else None
+    df = None
+    if fingerprint is not None and not no_cache:
+        df = _read_snapshot(db_path, fingerprint)
+
+    with ds.connect() as conn:
+        watermark = _read_watermark(conn)
+        info = _read_hard_info(conn)
+        if df is None:
+            # SQLクエリを実行してデータをDataFrameに読み込む
+            # (_with_derived_columns()がweekly_id順に並べ替えるのでORDER BYは付けない)
+            # 全件の場合は、保存された派生カラムをSQLiteから転送するより計算する方が速い
+            query = "SELECT * FROM hard_sales;"
+            raw_df = ds.read_sql(query, conn, schema=_RAW_SCHEMA)
+    if df is None:
+        df = _with_derived_columns(raw_df)
+        if fingerprint is not None:
+            _write_snapshot(df, db_path, fingerprint)
+
+    _set_cache(df)
+    _hard_sales_watermark = watermark
+    _hard_sales_info = info
+    return _share_cache(copy, compact)
+
+
+def _set_cache(df: pl.DataFrame) -> None:
+    """_hard_sales_cacheを置き換え、data_version()を進める"""
+    global _hard_sales_cache, _hard_sales_compact_cache, _data_version
+
+    _hard_sales_cache = freeze(df)
+    _hard_sales_compact_cache = None
+    _cache_buffers.clear()
+    _data_version += 1
+    _notify_cache_listeners()
+
+
+def _notify_cache_listeners() -> None:
+    """_cache_listenersに登録された関数を呼び出す"""
+    for listener in _cache_listeners:
+        listener()
+
+
+def data_version() -> int:
+    """
+    load_hard_sales()のキャッシュのバージョンを返す関数。
+
+    キャッシュをDBやスナップショットから読み込み直す、またはrefresh_hard_sales()で
+    更新するたびに値が増える。キャッシュから計算した結果を保持する側は、
+    この値が変わったら保持している結果を破棄すること。
+
+    Returns:
+        int: キャッシュのバージョン
+    """
+    return _data_version
+
+
+def frame_version(df: pl.DataFrame | pl.LazyFrame, columns: List[str]) -> int | None:
+    """
+    dfのcolumnsがload_hard_sales()のキャッシュと同じデータであれば、data_version()を返す関数。
+
+    load_hard_sales()の戻り値(copy=Trueの複製を含む)はキャッシュとカラムのメモリを共有しているので、
+    columnsの各カラムがキャッシュと同じメモリを指していれば、値を比較せずに同じデータと判定できる。
+    フィルタや値の変更をしたDataFrame、compact=Trueの戻り値、LazyFrameの場合はNoneを返す。
+
+    Args:
+        df: 判定するDataFrame
+        columns: 比較するカラムのリスト
+
+    Returns:
+        int | None: キャッシュと同じデータであればdata_version()、そうでなければNone
+    """
+    cache = _hard_sales_cache
+    if cache is None or not isinstance(df, pl.DataFrame):
+        return None
+    if df is cache:
+        return _data_version
+    if df.height != cache.height:
+        return None
+    series = dict(zip(df.columns, df.get_columns()))
+    cache_columns = set(cache.columns)
+    for column in columns:
+        if column not in series or column not in cache_columns:
+            return None
+        if column not in _cache_buffers:
+            _cache_buffers[column] = _column_buffers(cache.get_column(column))
+        buffers = _cache_buffers[column]
+        if buffers is None or _column_buffers(series[column]) != buffers:
+            return None
+    return _data_version
+
+
+def _column_buffers(series: pl.Series) -> tuple | None:
+    """Seriesが参照しているメモリのアドレスとオフセット・長さを返す(複数チャンクの場合はNone)"""
+    if series.n_chunks() != 1:
+        return None
+    if series.dtype == pl.Utf8:
+        array = series.to_arrow(compat_level=pl.CompatLevel.newest())
+        addresses = tuple(0 if b is None else b.address for b in array.buffers())
+        return (addresses, array.offset, len(array))
+    return series._get_buffer_info()
+
+
+def _share_cache(copy: bool, compact: bool = False) -> pl.DataFrame:
+    """
+    キャッシュしたDataFrameを、copyに応じて複製または読み取り専用のまま返す。
+    compact=Trueの場合はcompact_hard_sales()で変換したものを返す(変換結果もキャッシュする)。
+    """
+    global _hard_sales_compact_cache
+
+    df = _hard_sales_cache
+    if compact:
+        if _hard_sales_compact_cache is None:
+            _hard_sales_compact_cache = freeze(compact_hard_sales(_hard_sales_cache))
+        df = _hard_sales_compact_cache
+    return df.clone() if copy else df
+
+
+def _as_date(value: datetime | date | None, is_begin: bool = False) -> date | None:
+    """
+    datetimeをdateに揃える(report_dateとの比較に使う)。
+
+    Date型のreport_dateはdatetimeと0時として比較されるので、開始日(is_begin=True)の
+    0時でないdatetimeは翌日にする(date_filterやSalesMatrix.calendar_view()と同じ範囲になる)。
+    """
+    if isinstance(value, datetime):
+        if is_begin and value.time() != time():
+            return value.date() + timedelta(days=1)
+        return value.date()
+    return value
+
+
+def _load_hard_sales_range(
+    no_cache: bool, hw: List[str] | None, begin: date | None, end: date | None
+) -> pl.DataFrame:
+    """
+    load_hard_sales()のhw, begin, end指定時の読み込み。
+
+    全件のキャッシュ(またはスナップショット)があれば絞り込むだけにする。
+    無ければ、DBに派生カラムが保存されていれば指定範囲だけを読み込み、
+    保存されていなければhw毎のウォームアップ開始日以降を読み込んで派生カラムを計算する。
+    """
+    if not no_cache and (
+        _hard_sales_cache is not None
+        or (hw is None and begin is None)
+        or _snapshot_available()
+    ):
+        df = load_hard_sales(copy=False)
+    elif hw is None and begin is None:
+        df = load_hard_sales(no_cache=True, copy=False)
+    else:
+        with ds.connect() as conn:
+            if _has_derived_columns(conn):
+                df = _read_stored_rows(conn, hw, begin, end)
+            else:
+                since = _warmup_since(conn, hw, begin, end)
+                df = _with_derived_columns(_read_hard_sales_rows(conn, since, end))
+
+    if hw is not None:
+        df = df.filter(pl.col("hw").is_in(hw))
+    if begin is not None:
+        df = df.filter(pl.col("report_date") >= begin)
+    if end is not None:
+        df = df.filter(pl.col("report_date") <= end)
+    return df
+
+
+def _warmup_since(
+    conn: sqlite3.Connection,
+    hw: List[str] | None,
+    begin: date | None,
+    end: date | None,
+) -> dict[str, str | None]:
+    """
+    派生カラムの計算に必要な、hw毎の読み込み開始日を返す。
+
+    beginより前の_WARMUP_WEEKS行目とbeginの年の1月1日のうち早い方を開始日とする。
+    hwがNoneの場合は、begin〜endに行があるハードだけを対象にする。
+    beginがNoneの場合は全期間(開始日None)を返す。
+    """
+    if begin is None:
+        return {h: None for h in hw}
+    if hw is None:
+        end_filter = " AND report_date <= ?" if end is not None else ""
+        params = [begin.isoformat()] + ([end.isoformat()] if end is not None else [])
+        hw = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT hw FROM gamehard_weekly"
+                f" WHERE report_date >= ?{end_filter};",
+                params,
+            ).fetchall()
+        ]
+
+    hw_filter = f" AND hw IN ({', '.join('?' * len(hw))})"
+    params = [begin.isoformat(), *hw]
+    rows = conn.execute(
+        "SELECT hw, MIN(report_date) FROM ("
+        " SELECT hw, report_date,"
+        "  ROW_NUMBER() OVER (PARTITION BY hw ORDER BY report_date DESC) AS rn"
+        f" FROM gamehard_weekly WHERE report_date < ?{hw_filter}"
+        f") WHERE rn <= {_WARMUP_WEEKS} GROUP BY hw;",
+        params,
+    ).fetchall()
+    year_start = date(begin.year, 1, 1).isoformat()
+    starts = {h: min(d, year_start) for h, d in rows}
+    return {h: starts.get(h, year_start) for h in hw}
+
+
+def _has_derived_columns(conn: sqlite3.Connection) -> bool:
+    """gamehard_salesテーブルに、DERIVED_SCHEMA_VERSIONの派生カラムが保存されているか"""
+    try:
+        row = conn.execute("SELECT schema_version FROM gamehard_sales LIMIT 1;").fetchone()
+    except sqlite3.OperationalError:
+        # gamehard_salesテーブル(またはschema_versionカラム)が無い古いDB
+        return False
+    return row is not None and row[0] == DERIVED_SCHEMA_VERSION
+
+
+def _read_stored_rows(
+    conn: sqlite3.Connection,
+    hw: List[str] | None,
+    begin: date | None,
+    end: date | None,
+) -> pl.DataFrame:
+    """
+    gamehard_salesテーブルから、派生カラム計算済みの行をhw, begin〜endで絞り込んで読み込む。
+    (hw, report_date)と(report_date)のインデックスで対象行だけを読む。
+    """
+    conditions = []
+    params: list = []
+    if hw is not None:
+        conditions.append(f"hw IN ({', '.join('?' * len(hw))})")
+        params.extend(hw)
+    if begin is not None:
+        conditions.append("report_date >= ?")
+        params.append(begin.isoformat())
+    if end is not None:
+        conditions.append("report_date <= ?")
+        params.append(end.isoformat())
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    # ORDER BYを付けるとSQLite側で全カラムを一旦書き出してから並べ替えるので、Polarsで並べ替える
+    return ds.read_sql(
+        f"SELECT {', '.join(_HARD_SALES_SCHEMA)} FROM gamehard_sales{where};",
+        conn,
+        params,
+        schema=_HARD_SALES_SCHEMA,
+    ).sort("weekly_id")
+
+
+def _read_hard_sales_rows(
+    conn: sqlite3.Connection,
+    since: dict[str, str | None],
+    end: date | None = None,
+    stored: bool = False,
+) -> pl.DataFrame:
+    """
+    hard_salesビューから、hw毎にsince[hw]以降の行を読み込む。
+    since[hw]がNoneの場合はそのハードの全期間を読み込む。
+    stored=Trueの場合はgamehard_salesテーブルから派生カラムも含めて読み込む。
+    """
+    conditions = []
+    params: list = []
+    for hw, start in since.items():
+        if start is None:
+            conditions.append("(hw = ?)")
+            params.append(hw)
+        else:
+            conditions.append("(hw = ? AND report_date >= ?)")
+            params.extend([hw, start])
+    where = " OR ".join(conditions) or "0"
+    if end is not None:
+        where = f"({where}) AND report_date <= ?"
+        params.append(end.isoformat())
+    # _read_stored_rows()と同じく、ORDER BYは付けずにPolarsで並べ替える
+    if stored:
+        return ds.read_sql(
+            f"SELECT {', '.join(_HARD_SALES_SCHEMA)} FROM gamehard_sales WHERE {where};",
+            conn,
+            params,
+            schema=_HARD_SALES_SCHEMA,
+        ).sort("weekly_id")
+    return ds.read_sql(
+        f"SELECT * FROM hard_sales WHERE {where};",
+        conn,
+        params,
+        schema=_RAW_SCHEMA,
+    ).sort("weekly_id")
+
+
+def _stores_update_at(conn: sqlite3.Connection) -> bool:
+    """gamehard_salesテーブルに、元の行の gamehard_weekly.update_at が保存されているか"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(gamehard_sales);")]
+    return "update_at" in columns
+
+
+def _read_watermark(conn: sqlite3.Connection) -> str | None:
+    """
+    hard_salesビューに現れる行の update_at の最大値を返す。
+
+    gamehard_salesテーブルに保存されたupdate_atを読むので、gamehard_weeklyを更新してから
+    gamehard_salesを再構築するまでの間に読み込んでも、まだ反映されていない行の時刻は含まれない。
+    """
+    if _stores_update_at(conn):
+        query = "SELECT MAX(update_at) FROM gamehard_sales;"
+    else:
+        # gamehard_salesテーブルが無い古いDBでは、hard_salesビューは結合なので結合元から求める
+        query = (
+            "SELECT MAX(gw.update_at) FROM gamehard_weekly gw"
+            " INNER JOIN gamehard_weekly_analysis gwa ON gw.id = gwa.id;"
+        )
+    row = conn.execute(query).fetchone()
+    return row[0] if row else None
+
+
+def _read_hard_info(conn: sqlite3.Connection) -> dict[str, tuple]:
+    """
+    hard_salesビューに現れるハード毎の(launch_date, maker_name, full_name)を返す。
+
+    gamehard_infoではなくhard_salesから読むので、gamehard_salesを再構築するまでの間に
+    gamehard_infoを変更しても、まだ反映されていない値は含まれない。
+    """
+    rows = conn.execute(
+        "SELECT DISTINCT hw, launch_date, maker_name, full_name FROM hard_sales;"
+    ).fetchall()
+    return {hw: tuple(values) for hw, *values in rows}
+
+
+def _info_changed(previous: dict[str, tuple], current: dict[str, tuple]) -> bool:
+    """前回読み込んだハードの情報が変わったか、ハードが無くなったか(新しいハードは変更としない)"""
+    return any(current.get(hw) != values for hw, values in previous.items())
+
+
+def _read_changes(conn: sqlite3.Connection, watermark: str) -> list[tuple[str, str]]:
+    """update_atがwatermark以降の行について、hw毎の最も古いreport_dateを返す"""
+    table = "gamehard_sales" if _stores_update_at(conn) else "gamehard_weekly"
+    # update_atは秒単位なので、同じ時刻の行も取りこぼさないよう >= で比較する
+    return conn.execute(
+        f"SELECT hw, MIN(report_date) FROM {table} WHERE update_at >= ? GROUP BY hw;",
+        (watermark,),
+    ).fetchall()
+
+
+def _splice_hard_sales(
+    base_df: pl.DataFrame,
+    raw_df: pl.DataFrame,
+    since: dict[str, datetime],
+    derived: bool = False,
+) -> pl.DataFrame:
+    """
+    派生カラム計算済みのbase_dfに、hard_salesビューから読み込んだraw_dfを差し込む。
+
+    since[hw]以降の行をraw_dfで置き換え、派生カラムは置き換えた範囲だけを再計算する。
+    移動平均(最大52週)と年次累計が正しくなるよう、since[hw]直前の51週分と
+    同じ年の行をウォームアップとして一緒に計算し、計算後に取り除く。
+
+    Args:
+        base_df: _with_derived_columns()適用済みのDataFrame
+        raw_df: hard_salesビューから読み込んだ、since[hw]以降の全行
+        since: hw毎の差し替え開始日
+        derived: Trueの場合、raw_dfはgamehard_salesテーブルから読み込んだ派生カラム計算済みの行
+                 なので、再計算せずにそのまま差し込む
+    """
+    since_df = pl.DataFrame(
+        {"hw": list(since.keys()), "since": list(since.values())},
+        schema={"hw": pl.Utf8, "since": pl.Date},
+    )
+    base_df = base_df.join(since_df, on="hw", how="left")
+    replaced = pl.col("since").is_not_null() & (pl.col("report_date") >= pl.col("since"))
+    kept_df = base_df.filter(~replaced).drop("since")
+    if derived:
+        return pl.concat([kept_df, raw_df.select(kept_df.columns)]).sort("weekly_id")
+
+    warmup_df = (
+        base_df.filter(pl.col("since").is_not_null() & ~replaced)
+        .sort("weekly_id")
+        .filter(
+            (pl.int_range(pl.len()).reverse().over("hw") < _WARMUP_WEEKS)
+            | (pl.col("year") == pl.col("since").dt.year())
+        )
+        .select(raw_df.columns)
+    )
+    spliced_df = (
+        _with_derived_columns(
+            pl.concat([warmup_df, _cast_raw_columns(raw_df)], how="vertical_relaxed")
+        )
+        .join(since_df, on="hw", how="left")
+        .filter(pl.col("report_date") >= pl.col("since"))
+        .drop("since")
+    )
+    return pl.concat([kept_df, spliced_df.select(kept_df.columns)]).sort("weekly_id")
+
+
+def refresh_hard_sales(copy: bool = True) -> pl.DataFrame:
+    """
+    前回の読み込み以降にDBで追加・更新された行だけを読み込んで、キャッシュを更新する関数。
+
+    gamehard_salesテーブルに保存された gamehard_weekly.update_at を前回読み込み時点と比較して
+    変更のあったハードを調べ、そのハードの変更日以降の行だけをhard_salesビューから読み込む。
+    派生カラムも変更日以降の範囲だけを再計算する(DBに保存されていればそれを使う)ため、週次更新の数行であれば
+    load_hard_sales(no_cache=True)よりはるかに速い。
+
+    gamehard_infoの発売日・メーカー名・正式名称の変更はupdate_atに現れず、delta_week・index_*などの
+    全行に影響するので、hard_salesに現れるハード毎の値を前回読み込み時点と比較し、
+    変わっていればload_hard_sales(no_cache=True)で全件を読み直す。
+    キャッシュが無い場合も全件を読み込む。
+
+    行が削除された場合は差分で追えないので、load_hard_sales(no_cache=True)で全件を読み直すこと。
+
+    Args:
+        copy: load_hard_sales()のcopyと同じ
+
+    Returns:
+        pl.DataFrame: 更新後のload_hard_sales()と同じDataFrame
+    """
+    global _hard_sales_cache, _hard_sales_compact_cache, _hard_sales_watermark, _hard_sales_info
+    global _all_hw_list, _all_maker_list
+
+    if _hard_sales_cache is None or _hard_sales_watermark is None or _hard_sales_info is None:
+        return load_hard_sales(no_cache=True, copy=copy)
+
+    with ds.connect() as conn:
+        info = _read_hard_info(conn)
+        info_changed = _info_changed(_hard_sales_info, info)
+        changes = [] if info_changed else _read_changes(conn, _hard_sales_watermark)
+        if changes:
+            # 過去の行が修正された場合、それ以降のsum_unitsも変わるので変更日以降を全て読み込む
+            stored = _has_derived_columns(conn)
+            raw_df = _read_hard_sales_rows(conn, dict(changes), stored=stored)
+            watermark = _read_watermark(conn)
+    if info_changed:
+        # 発売日などの変更は全行の派生カラムに影響するので、差分ではなく全件を読み直す
+        return load_hard_sales(no_cache=True, copy=copy)
+    if not changes:
+        return _share_cache(copy)
+
+    since = {hw: datetime.strptime(d, "%Y-%m-%d").date() for hw, d in changes}
+
+    previous_state = _latest_state_cache if _latest_state_version == _data_version else None
+    _set_cache(_splice_hard_sales(_hard_sales_cache, raw_df, since, derived=stored))
+    if previous_state is not None:
+        _update_latest_state(previous_state, list(since.keys()))
+    _hard_sales_watermark = watermark
+    _hard_sales_info = info
+    _all_hw_list = None
+    _all_maker_list = None
+
+    db_path = ds.get_db_path()
+    fingerprint = _db_fingerprint(db_path) if _snapshot_enabled else None
+    if fingerprint is not None:
+        _write_snapshot(_hard_sales_cache, db_path, fingerprint)
+    return _share_cache(copy)
+
+
+def load_hard_sales_lazy(no_cache: bool = False) -> pl.LazyFrame:
+    """
+    load_hard_sales()と同じデータをLazyFrameとして返す関数。
+
+    hard_sales_filter / hard_sales_long / hard_sales_pivot の関数にLazyFrameを渡すと
+    LazyFrameが返るため、複数の関数を連結した処理を最後のcollect()で一度に実行でき、
+    projection/predicate pushdownによって不要なカラム・行の処理が省かれる。
+
+    Args:
+        no_cache: Trueの場合はグローバルキャッシュを破棄し、DBから再読み込みする。
+
+    Returns:
+        pl.LazyFrame: load_hard_sales()の戻り値と同じカラム構成のLazyFrame
+
+    Example:
+        >>> lf = load_hard_sales_lazy()
+        >>> lf = hsp.pivot_monthly_sales(lf, hw=["NSW", "PS5"], begin=datetime(2024, 1, 1))
+        >>> df = lf.collect()
+    """
+    if no_cache or _hard_sales_cache is None:
+        load_hard_sales(no_cache=no_cache, copy=False)
+    # LazyFrameは元のDataFrameを変更しないので、キャッシュを複製せずに共有する
+    return _hard_sales_cache.lazy()
+
+
+# compact_hard_sales()で削除し、expand_hard_sales()で復元するカラム
+# (キーのカラムの直後に、値のカラムを元のカラム順で復元する)
+_COMPACT_DROPPED_COLUMNS = {
+    "begin_date": ["end_date"],
+    "fiscal_month": ["index_week", "index_month", "index_year"],
+}
+
+
+def _enum_categories(values: List[str], order: List[str]) -> List[str]:
+    """orderの順に並べ、orderに無い値は末尾に名前順で追加したEnumのカテゴリを返す"""
+    unknown = sorted(set(values) - set(order))
+    return order + unknown
+
+
+def compact_hard_sales(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    load_hard_sales()のDataFrameを省メモリ形式に変換する関数。
+
+    - hw, maker_name, full_name をpl.Enumに変換する。カテゴリはHARD_ORDER/MAKER_ORDERの順
+      (full_nameはhwの順)で、順序に無い値は末尾に追加する。
+      そのため、これらのカラムでのsort/group_byは文字列ではなく整数の比較になり、
+      sortの結果はHARD_ORDER/MAKER_ORDERの順になる。
+    - quarter, fiscal_quarter を整数(年 * 10 + 四半期番号、例: "2024Q1" => 20241)に変換する。
+    - 他のカラムから計算できる end_date(=report_date), index_*(=delta_* + 1) を削除する。
+
+    削除したカラムや文字列のカラムが必要な関数に渡す場合は、expand_hard_sales()で元に戻すこと。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame(一部のカラムだけをselectしたものでもよい)
+
+    Returns:
+        pl.DataFrame: 省メモリ形式のDataFrame
+
+        DataFrameのカラム詳細(load_hard_sales()からの変更点):
+        - hw (Enum): ゲームハードの識別子
+        - maker_name (Enum): メーカー名
+        - full_name (Enum): ゲームハードの正式名称
+        - quarter (Int16): report_dateの四半期（例: 20241）
+        - fiscal_quarter (Int16): report_dateの会計四半期（例: 20254）
+        - end_date, index_week, index_month, index_year: 削除
+    """
+    exprs = []
+    if "hw" in df.columns:
+        hw_enum = pl.Enum(_enum_categories(df["hw"].unique().to_list(), hi.HARD_ORDER))
+        exprs.append(pl.col("hw").cast(hw_enum))
+        if "full_name" in df.columns:
+            names = (
+                df.select(pl.col("hw").cast(hw_enum), "full_name")
+                .unique()
+                .sort("hw", "full_name")
+                .get_column("full_name")
+                .unique(maintain_order=True)
+                .to_list()
+            )
+            exprs.append(pl.col("full_name").cast(pl.Enum(names)))
+    if "maker_name" in df.columns:
+        maker_enum = pl.Enum(
+            _enum_categories(df["maker_name"].unique().to_list(), hi.MAKER_ORDER)
+        )
+        exprs.append(pl.col("maker_name").cast(maker_enum))
+    for col in ["quarter", "fiscal_quarter"]:
+        if col in df.columns:
+            exprs.append(
+                pl.col(col)
+                .str.replace("F?Q", "")
+                .cast(pl.Int16)
+                .alias(col)
+            )
+    dropped = [c for cols in _COMPACT_DROPPED_COLUMNS.values() for c in cols]
+    return df.with_columns(exprs).drop(dropped, strict=False)
+
+
+def expand_hard_sales(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    compact_hard_sales()で変換したDataFrameを、load_hard_sales()と同じ形式に戻す関数。
+
+    Args:
+        df: compact_hard_sales()の戻り値のDataFrame
 
-    # SQLite3データベースに接続
-    conn = sqlite3.connect(DB_PATH)
-    # SQLクエリを実行してデータをDataFrameに読み込む
-    query = "SELECT * FROM hard_sales ORDER BY weekly_id;"
-    df = pl.read_database(query, conn)
+    Returns:
+        pl.DataFrame: load_hard_sales()と同じカラム構成・型のDataFrame
+    """
+    exprs = [
+        pl.col(col).cast(pl.Utf8)
+        for col in ["hw", "maker_name", "full_name"]
+        if col in df.columns and isinstance(df.schema[col], pl.Enum)
+    ]
+    for col, label in [("quarter", "Q"), ("fiscal_quarter", "FQ")]:
+        if col in df.columns and df.schema[col].is_integer():
+            exprs.append(
+                (
+                    (pl.col(col) // 10).cast(pl.Utf8)
+                    + label
+                    + (pl.col(col) % 10).cast(pl.Utf8)
+                ).alias(col)
+            )
+    if "report_date" in df.columns:
+        exprs.append(pl.col("report_date").alias("end_date"))
+    for unit, dtype in [("week", pl.Int32), ("month", pl.Int16), ("year", pl.Int16)]:
+        if f"delta_{unit}" in df.columns:
+            exprs.append((pl.col(f"delta_{unit}") + 1).cast(dtype).alias(f"index_{unit}"))
+
+    columns = []
+    for col in df.columns:
+        columns.append(col)
+        columns.extend(_COMPACT_DROPPED_COLUMNS.get(col, []))
+    result = df.with_columns(exprs)
+    return result.select([c for c in columns if c in result.columns])
+
+
+def _compute_latest_state(df: pl.DataFrame) -> pl.DataFrame:
+    """dfのハード毎の最新の状態(latest_state()の形式)を計算する"""
+    return (
+        df.with_columns(last_report_date=pl.col("report_date").max().over("hw"))
+        .sort(["hw", "sum_units", "report_date"])
+        .group_by("hw", maintain_order=True)
+        .last()
+        .sort("sum_units", descending=True)
+    )
 
-    # 接続を閉じる
-    conn.close()
 
-    df = _with_derived_columns(df)
-    _hard_sales_cache = df
-    return df.clone()
+def _update_latest_state(previous: pl.DataFrame, changed_hw: List[str]) -> None:
+    """更新前の最新の状態のうち、changed_hwの行だけを_hard_sales_cacheから計算し直す"""
+    global _latest_state_cache, _latest_state_version
+
+    changed_df = _hard_sales_cache.filter(pl.col("hw").is_in(changed_hw))
+    _latest_state_cache = freeze(
+        pl.concat(
+            [previous.filter(~pl.col("hw").is_in(changed_hw)), _compute_latest_state(changed_df)]
+        ).sort("sum_units", descending=True)
+    )
+    _latest_state_version = _data_version
+
+
+def latest_state() -> FrozenDataFrame:
+    """
+    load_hard_sales()のキャッシュの、ハード毎の最新の状態を返す関数。
+
+    データのバージョン(data_version())毎に一度だけ計算し、refresh_hard_sales()で
+    週が追加された場合は変更のあったハードの行だけを計算し直す。
+    extract_total()やcurrent_report_date()、get_active_hw()などはキャッシュと同じデータに対して
+    全体を走査する代わりにこの結果を使う。
+
+    Returns:
+        FrozenDataFrame: ハード毎に1行、累計販売台数の降順に並べたDataFrame(読み取り専用)
+
+        DataFrameのカラム詳細:
+        - hw (String): ゲームハードの識別子
+        - load_hard_sales()のhw以外のカラム: 累計販売台数(sum_units)が最大の行(同じ場合は最新の行)の値
+        - last_report_date (Date): そのハードの最新のreport_date
+    """
+    global _latest_state_cache, _latest_state_version
+
+    df = load_hard_sales(copy=False)
+    if _latest_state_version != _data_version or _latest_state_cache is None:
+        _latest_state_cache = freeze(_compute_latest_state(df))
+        _latest_state_version = _data_version
+    return _latest_state_cache
 
 
 def current_report_date(df: pl.DataFrame) -> datetime:
     """
     DataFrameから最新の報告日を取得する関数。
 
+    dfがload_hard_sales()の戻り値であれば、latest_state()から求める。
+
     Args:
         df: load_hard_sales()の戻り値のDataFrame
 
     Returns:
         datetime: 最新の報告日
     """
+    if frame_version(df, ["report_date"]) is not None:
+        return latest_state()["last_report_date"].max()  # type: ignore[return-value]
     return df.select(pl.col("report_date").max()).item()
 
 
@@ -199,6 +1047,24 @@ def get_hw(df: pl.DataFrame) -> List[str]:
     return hi.sort_hard(df.select(["hw"]).unique().to_series(0).to_list())
 
 
+def _latest_active(since: datetime, column: str) -> List[str]:
+    """
+    latest_state()から、since以降に販売データがあるハードのcolumnの値を重複なく返す。
+    ハード毎の最新のreport_dateがsince以降であれば、since以降の行がある。
+    (Date型のカラムとdatetimeの比較と同じく、report_dateは0時として比較する)
+    """
+    state = latest_state()
+    return list(
+        dict.fromkeys(
+            value
+            for value, last_date in zip(
+                state[column].to_list(), state["last_report_date"].to_list()
+            )
+            if datetime.combine(last_date, time()) >= since
+        )
+    )
+
+
 def get_active_hw(days: int = 365) -> List[str]:
     """
     直近1年間のデータを元にアクティブなハードウェア名のリストを取得する。
@@ -206,9 +1072,11 @@ def get_active_hw(days: int = 365) -> List[str]:
     Returns:
         List[str]: アクティブなハードウェア名のリスト
     """
-    base_df = load_hard_sales()
+    base_df = load_hard_sales(copy=False)
     now = datetime.now()
     one_year_ago = now - timedelta(days=days)
+    if frame_version(base_df, ["hw", "report_date"]) is not None:
+        return hi.sort_hard(_latest_active(one_year_ago, "hw"))
     recent_df = base_df.filter(pl.col("report_date") >= one_year_ago)
     active_hw = get_hw(recent_df)
     return active_hw
@@ -225,7 +1093,7 @@ def get_hw_all(true_all: bool = False) -> List[str]:
     if _all_hw_list is not None:
         return _all_hw_list
 
-    base_df = load_hard_sales()
+    base_df = load_hard_sales(copy=False)
     _all_hw_list = get_hw(base_df)
     remove_hw_list = ["PKS", "PS", "NeoGeoP", "SATURN", "GB"]
     if not true_all:
@@ -257,9 +1125,11 @@ def get_active_maker(days: int = 365) -> List[str]:
     Returns:
         List[str]: アクティブなメーカー名のリスト
     """
-    base_df = load_hard_sales()
+    base_df = load_hard_sales(copy=False)
     now = datetime.now()
     one_year_ago = now - timedelta(days=days)
+    if frame_version(base_df, ["hw", "report_date", "maker_name"]) is not None:
+        return hi.sort_maker(_latest_active(one_year_ago, "maker_name"))
     recent_df = base_df.filter(pl.col("report_date") >= one_year_ago)
     active_maker = get_maker(recent_df)
     return active_maker
@@ -276,6 +1146,6 @@ def get_maker_all() -> List[str]:
     if _all_maker_list is not None:
         return _all_maker_list
 
-    base_df = load_hard_sales()
+    base_df = load_hard_sales(copy=False)
     _all_maker_list = get_maker(base_df)
     return _all_maker_list
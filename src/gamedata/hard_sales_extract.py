@@ -1,8 +1,15 @@
-from datetime import datetime, timedelta, date
+from datetime import datetime, time, timedelta, date
 import polars as pl
 from typing import Any, Dict, List
 
 from . import hard_sales as hs
+from . import hard_sales_filter as hsf
+from . import milestone as ms
+from . import rolling_stats as rs
+from . import sales_cube as sc
+from . import sales_lookup as sl
+from .memo import memoize
+from .mode import Mode
 
 
 def extract_week_reached_units(df: pl.DataFrame, threshold_units: int) -> pl.DataFrame:
@@ -57,6 +64,13 @@ def extract_week_reached_units(df: pl.DataFrame, threshold_units: int) -> pl.Dat
         - yday (Int16): report_dateの日がその年の何日目か（1-366）
         - yweek (Int16): report_dateがその年の何番目の日曜日か（1-53）
     """
+    # load_hard_sales()のキャッシュと同じデータであれば、データのバージョン毎に作る索引から引く
+    index = ms.index_for(df)
+    if index is not None:
+        result = index.reached(threshold_units)
+        columns = ["hw", *(c for c in df.columns if c != "hw")]
+        return result if result.columns == columns else result.select(columns)
+
     # ハードごとに累計販売台数が閾値を超えた最初の週を取得
     result = (
         df.sort(["hw", "report_date"])
@@ -69,12 +83,82 @@ def extract_week_reached_units(df: pl.DataFrame, threshold_units: int) -> pl.Dat
     return result
 
 
+def milestone_table(df: pl.DataFrame, step: int = ms.DEFAULT_STEP) -> pl.DataFrame:
+    """
+    ハードごとに累計販売台数がstepの倍数に到達した最初の週の一覧を返す関数。
+
+    dfがload_hard_sales()の戻り値であれば、データのバージョン毎・step毎に一度だけ計算した結果を返す。
+    特定の台数の到達週は threshold_units で、到達までの週数の順位は index_week で絞り込み・並べ替えて求められる。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame
+        step: 累計販売台数の刻み(デフォルト: 100000)
+
+    Returns:
+        pl.DataFrame: ハード・閾値の順に並べたDataFrame。各ハードが到達した閾値のみを含む。
+
+        DataFrameのカラム詳細:
+        - threshold_units (Int64): 閾値となる累計販売台数(stepの倍数)
+        - hw (String): ゲームハードの識別子
+        - report_date (Date): 閾値に到達した週の集計終了日
+        - delta_week (Int32): 閾値に到達した週が発売日から何週間後か
+        - index_week (Int32): 閾値に到達した週が発売から何週目か（1始まり）
+        - sum_units (Int64): 閾値に到達した週の累計販売台数
+    """
+    index = ms.index_for(df) or ms.MilestoneIndex(df)
+    return index.milestones(step).select(pl.all())
+
+
+def rolling(
+    df: pl.DataFrame,
+    stats: List[str] = ["mean"],
+    windows: List[int] = list(rs.DEFAULT_WINDOWS),
+    by: str | None = "hw",
+    value: str = "units",
+) -> pl.DataFrame:
+    """
+    dfに、byの値毎にreport_dateの順に並べたvalueの移動統計量のカラムを追加して返す関数。
+
+    statsとwindowsのすべての組み合わせのカラムを1回のselect()でまとめて計算する。
+    dfがload_hard_sales()の戻り値であれば、データのバージョン毎・(統計量, 週数)毎に一度だけ計算した結果を使う。
+    例えば rolling(df, ["mean", "std"], [4]) で、4週移動平均からの乖離とそのばらつきを求められる。
+    load_hard_sales()のma4w/ma13w/ma52wは、units_mean4w/units_mean13w/units_mean52wを
+    整数に丸めた値(同じ式で計算する)。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame
+        stats: 統計量のリスト(デフォルト: ["mean"])
+               - "mean": 移動平均
+               - "sum": 移動合計
+               - "std": 移動標準偏差(不偏)
+               - "min" / "max": 移動最小値 / 移動最大値
+               - "ewm": 週数をspanとする指数移動平均
+        windows: 移動統計量をとる週数のリスト(デフォルト: [4, 13, 52])
+        by: 移動統計量を区切るカラム(デフォルト: "hw")。Noneの場合はdf全体をreport_dateの順に並べる
+        value: 移動統計量をとるカラム(デフォルト: "units")
+
+    Returns:
+        pl.DataFrame: dfに移動統計量のカラムを、statsの順・windowsの順に追加したDataFrame
+
+        追加するカラムの詳細:
+        - {value}_{stat}{window}w (例: units_mean4w): 直近window週のvalueの統計量。
+          sum/min/maxはvalueと同じ型、それ以外はFloat64。window週に満たない行はnull
+
+    Raises:
+        ValueError: statsにSTATS以外の値がある場合、windowsに0以下の値がある場合
+    """
+    roller = rs.stats_for(df, by, value) or rs.RollingStats(df)
+    return df.with_columns(roller.columns(stats, windows, by=by, value=value))
+
+
 def extract_by_date(
     df: pl.DataFrame, target_date: datetime | date, hw: List[str] | None = None
 ) -> pl.DataFrame:
     """
     指定された日付の週に該当するデータを抽出する関数。
 
+    extract_by_dates()で日付を1つだけ指定した場合と同じ行を返す(target_dateのカラムは付けない)。
+
     Args:
         df: load_hard_sales()の戻り値のDataFrame（begin_date, end_date, report_dateはDate型に変換済み）
         target_date: 抽出したい日付のdatetime型､またはdate型
@@ -123,15 +207,65 @@ def extract_by_date(
         - yweek (Int16): report_dateがその年の何番目の日曜日か（1-53）
 
     """
-    # target_dateがbegin_dateからend_dateの範囲にある行を抽出
-    filtered_df = df.filter(
-        (pl.col("begin_date") <= target_date) & (pl.col("end_date") >= target_date)
-    )
+    # extract_by_dates()の日付が1つの場合と同じ(target_dateのカラムは付けない)
+    _, row = _week_positions(df, _target_dates([target_date]), hw)
+    return df[row]
 
-    # hw_namesが指定されている場合は、さらにフィルタリング
-    if hw:
-        filtered_df = filtered_df.filter(pl.col("hw").is_in(hw))
-    return filtered_df
+
+def _target_dates(dates: List[date | datetime] | pl.Series) -> pl.Series:
+    """
+    日付のリストをtarget_dateのSeriesにする。
+
+    datetimeを含む場合は、Date型のカラムとdatetimeを比較したときと同じになるよう、
+    dateを0時のdatetimeにしてDatetime型にそろえる。
+    """
+    if isinstance(dates, pl.Series):
+        return dates.alias("target_date")
+    if any(isinstance(d, datetime) for d in dates):
+        values = [d if isinstance(d, datetime) else datetime.combine(d, time()) for d in dates]
+        return pl.Series("target_date", values, dtype=pl.Datetime("us"))
+    return pl.Series("target_date", dates, dtype=pl.Date)
+
+
+def _week_positions(
+    df: pl.DataFrame, targets: pl.Series, hw: List[str] | None
+) -> tuple[Any, Any]:
+    """targetsの各日付を含む週の(targetsでの位置, dfでの行の位置)を返す"""
+    # load_hard_sales()のキャッシュと同じデータであれば、データのバージョン毎に作る索引を使う
+    intervals = sl.intervals_for(df) or sl.WeekIntervals(df)
+    return intervals.positions(targets, hw)
+
+
+def extract_by_dates(
+    df: pl.DataFrame,
+    dates: List[date | datetime] | pl.Series,
+    hw: List[str] | None = None,
+) -> pl.DataFrame:
+    """
+    複数の日付について、それぞれの日付を含む週のデータをまとめて抽出する関数。
+
+    ハードごとにbegin_dateで並べた週から、begin_date <= 日付 となる最後の週を二分探索で求め(as-of結合)、
+    その週のend_dateが日付以降であれば該当とする。集計期間が14日の週も正しく対応づけられる。
+    dfがload_hard_sales()の戻り値であれば、並べ替えた週の索引はデータのバージョン毎に一度だけ作る。
+    イベントの日付や祝日のリストなど、任意の日付を販売週に変換するのに使う。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame（begin_date, end_date, report_dateはDate型に変換済み）
+        dates: 抽出したい日付(date型､またはdatetime型)のリスト､またはSeries
+        hw: 省略可能なハードウェア名のリスト。指定すると、そのハードウェアに限定して抽出
+
+    Returns:
+        pl.DataFrame: datesの日付ごとに、その日付がbegin_dateからend_dateの範囲にある行を抽出したDataFrame。
+                      datesの順に、同じ日付の行はdfでの順に並べる。
+                      カラムは先頭のtarget_dateと、extract_by_date()の戻り値と同じカラム。
+
+        DataFrameのカラム詳細:
+        - target_date (Date | Datetime): datesの日付(datetimeを含む場合はDatetime型)
+        - その他のカラム: dfと同じ
+    """
+    targets = _target_dates(dates)
+    target, row = _week_positions(df, targets, hw)
+    return pl.concat([targets[target].to_frame(), df[row]], how="horizontal")
 
 
 def extract_latest(df: pl.DataFrame, weeks: int = 1) -> pl.DataFrame:
@@ -247,12 +381,16 @@ def extract_total(df: pl.DataFrame, compact: bool = False) -> pl.DataFrame:
         - sum_units (Int64): report_date時点での累計販売台数
         - report_date (Date): 集計期間の末日、日曜日である
     """
-    df = (
-        df.sort(["hw", "sum_units"])  # sum_units昇順でソート
-        .group_by("hw", maintain_order=False)
-        .last()  # 最大sum_unitsの行（＝最新行）を取得
-        .sort("sum_units", descending=True)
-    )
+    if hs.frame_version(df, df.columns) is not None:
+        # load_hard_sales()のキャッシュと同じデータであれば、ハード毎の最新の状態から取り出す
+        df = hs.latest_state().select(["hw", *(c for c in df.columns if c != "hw")])
+    else:
+        df = (
+            df.sort(["hw", "sum_units"])  # sum_units昇順でソート
+            .group_by("hw", maintain_order=False)
+            .last()  # 最大sum_unitsの行（＝最新行）を取得
+            .sort("sum_units", descending=True)
+        )
     if compact:
         df = df.select(["hw", "sum_units", "report_date"])
     return df
@@ -314,104 +452,135 @@ def hard_sales_summary(
         - weeks_to_30m (int | None): 累計3000万台到達週
         - weeks_to_35m (int | None): 累計3500万台到達週
     """
-    hw_list: List[str] = hw if hw else df["hw"].unique().to_list()
+    return hard_sales_summary_table(df, hw).to_dicts()
 
-    result: List[Dict[str, Any]] = []
 
-    for h in hw_list:
-        hw_df = df.filter(pl.col("hw") == h).sort("report_date")
-        reached_week_col = (
-            "index_week" if "index_week" in hw_df.columns else "delta_week"
-        )
-        reached_week_offset = 0 if reached_week_col == "index_week" else 1
-
-        if hw_df.is_empty():
-            continue
-
-        first_row = hw_df.row(0, named=True)
-        launch_date: date = first_row["launch_date"]
-        full_name: str = first_row["full_name"]
-        maker_name: str = first_row["maker_name"]
-
-        last_report_date: date = hw_df["report_date"].max()
-        total_units: int = int(hw_df["sum_units"].max())
-        sales_weeks: int = hw_df.height
-        sales_period: timedelta = last_report_date - launch_date
-        avg_weekly_units: int = (
-            round(total_units / sales_weeks) if sales_weeks > 0 else 0
-        )
+def _max_period(lf: pl.LazyFrame, period_columns: List[str], period: pl.Expr) -> pl.LazyFrame:
+    """
+    ハード毎に、period_columnsの期間の販売台数が最大の期間と台数を返す(同数の場合は古い期間)。
 
-        # 週間最大
-        max_weekly_idx: int = int(hw_df["units"].arg_max())
-        max_weekly_units: int = int(hw_df["units"][max_weekly_idx])
-        max_weekly_date: date = hw_df["report_date"][max_weekly_idx]
+    Returns:
+        pl.LazyFrame: hw, period(期間を表す値), units(その期間の販売台数)のLazyFrame
+    """
+    return (
+        lf.group_by(["hw", *period_columns])
+        .agg(pl.col("units").sum())
+        .sort(period_columns)
+        .sort("units", descending=True, maintain_order=True)
+        .unique(subset="hw", keep="first")
+        .select("hw", period.alias("period"), pl.col("units").cast(pl.Int64))
+    )
 
-        # 月間最大
-        monthly = hw_df.group_by(["year", "month"]).agg(
-            pl.col("units").sum().alias("monthly_units")
-        )
-        max_monthly_idx: int = int(monthly["monthly_units"].arg_max())
-        max_monthly_units: int = int(monthly["monthly_units"][max_monthly_idx])
-        max_monthly_year: int = int(monthly["year"][max_monthly_idx])
-        max_monthly_month: int = int(monthly["month"][max_monthly_idx])
-        max_monthly_period: str = f"{max_monthly_year}-{max_monthly_month:02d}"
-
-        # 四半期最大
-        quarterly = hw_df.group_by("quarter").agg(
-            pl.col("units").sum().alias("quarterly_units")
-        )
-        max_quarterly_idx: int = int(quarterly["quarterly_units"].arg_max())
-        max_quarterly_units: int = int(quarterly["quarterly_units"][max_quarterly_idx])
-        max_quarterly_period: str = quarterly["quarter"][max_quarterly_idx]
-
-        # 年間最大
-        yearly = hw_df.group_by("year").agg(pl.col("units").sum().alias("yearly_units"))
-        max_yearly_idx: int = int(yearly["yearly_units"].arg_max())
-        max_yearly_units: int = int(yearly["yearly_units"][max_yearly_idx])
-        max_yearly_year: int = int(yearly["year"][max_yearly_idx])
-
-        # 発売週の販売台数 (delta_week == 0)
-        launch_week_df = hw_df.filter(pl.col("delta_week") == 0)
-        launch_week_units: int = (
-            int(launch_week_df["units"].sum()) if not launch_week_df.is_empty() else 0
-        )
 
-        summary: Dict[str, Any] = {
-            "hw": h,
-            "full_name": full_name,
-            "maker_name": maker_name,
-            "launch_date": launch_date,
-            "last_report_date": last_report_date,
-            "total_units": total_units,
-            "sales_period": sales_period,
-            "sales_weeks": sales_weeks,
-            "avg_weekly_units": avg_weekly_units,
-            "max_weekly_units": max_weekly_units,
-            "max_weekly_date": max_weekly_date,
-            "max_monthly_units": max_monthly_units,
-            "max_monthly_period": max_monthly_period,
-            "max_quarterly_units": max_quarterly_units,
-            "max_quarterly_period": max_quarterly_period,
-            "max_yearly_units": max_yearly_units,
-            "max_yearly_year": max_yearly_year,
-            "launch_week_units": launch_week_units,
-        }
-
-        # 累計台数到達週
-        for threshold, key in _REACH_THRESHOLDS:
-            reached = hw_df.filter(pl.col("sum_units") >= threshold)
-            if reached.is_empty():
-                summary[key] = None
-            else:
-                summary[key] = int(reached[reached_week_col][0]) + reached_week_offset
-
-        result.append(summary)
+@memoize
+def hard_sales_summary_table(
+    df: pl.DataFrame, hw: List[str] | None = None
+) -> pl.DataFrame:
+    """
+    hard_sales_summary()と同じサマリ情報を、1ハード1行のDataFrameで返す関数。
 
-    return result
+    ハード毎のループではなく、全ハードをまとめたgroup_byで集計する。
+    累計台数到達週は、ハード毎の累計台数の累積最大値をsearch_sorted()で二分探索して求める。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame
+        hw: HW識別子の配列。Noneや空リストの場合は全ハードの情報を返す。
+
+    Returns:
+        pl.DataFrame: hwの順(Noneの場合はdfに現れる順)に並べたサマリ情報のDataFrame。
+                      dfに含まれないハードの行は含まない。
+
+        DataFrameのカラム詳細:
+        - hard_sales_summary()の辞書のキーと同じ名前のカラム
+          (日付はDate、sales_periodはDuration、台数と週数はInt64、期間はString)
+    """
+    hw_list: List[str] = hw if hw else df["hw"].unique(maintain_order=True).to_list()
+    lf = df.lazy()
+    if hw:
+        lf = lf.filter(pl.col("hw").is_in(hw_list))
+
+    reached_week_col = "index_week" if "index_week" in df.columns else "delta_week"
+    reached_week_offset = 0 if reached_week_col == "index_week" else 1
+    thresholds = pl.Series([threshold for threshold, _ in _REACH_THRESHOLDS], dtype=pl.Int64)
+
+    summary = (
+        lf.sort(["hw", "report_date"])
+        .group_by("hw")
+        .agg(
+            pl.col("full_name").first(),
+            pl.col("maker_name").first(),
+            pl.col("launch_date").first(),
+            pl.col("report_date").max().alias("last_report_date"),
+            pl.col("sum_units").max().cast(pl.Int64).alias("total_units"),
+            pl.len().cast(pl.Int64).alias("sales_weeks"),
+            pl.col("units").max().cast(pl.Int64).alias("max_weekly_units"),
+            pl.col("report_date").get(pl.col("units").arg_max()).alias("max_weekly_date"),
+            pl.col("units")
+            .filter(pl.col("delta_week") == 0)
+            .sum()
+            .cast(pl.Int64)
+            .alias("launch_week_units"),
+            # 累計台数が閾値に初めて到達した行の週。到達していない場合は末尾に足したnullを指す
+            pl.col(reached_week_col)
+            .cast(pl.Int64)
+            .append(pl.lit(None, dtype=pl.Int64))
+            .gather(pl.col("sum_units").cum_max().search_sorted(thresholds, side="left"))
+            .alias("reached_weeks"),
+        )
+    )
+
+    monthly = _max_period(
+        lf,
+        ["year", "month"],
+        pl.format("{}-{}", pl.col("year"), pl.col("month").cast(pl.Utf8).str.zfill(2)),
+    )
+    quarterly = _max_period(lf, ["quarter"], pl.col("quarter"))
+    yearly = _max_period(lf, ["year"], pl.col("year").cast(pl.Int64))
+
+    return (
+        pl.LazyFrame({"hw": hw_list}, schema={"hw": pl.Utf8})
+        .join(summary, on="hw", how="inner", maintain_order="left")
+        .join(monthly, on="hw", how="left", maintain_order="left")
+        .rename({"period": "max_monthly_period", "units": "max_monthly_units"})
+        .join(quarterly, on="hw", how="left", maintain_order="left")
+        .rename({"period": "max_quarterly_period", "units": "max_quarterly_units"})
+        .join(yearly, on="hw", how="left", maintain_order="left")
+        .rename({"period": "max_yearly_year", "units": "max_yearly_units"})
+        .select(
+            "hw",
+            "full_name",
+            "maker_name",
+            "launch_date",
+            "last_report_date",
+            "total_units",
+            (pl.col("last_report_date") - pl.col("launch_date")).alias("sales_period"),
+            "sales_weeks",
+            (pl.col("total_units") / pl.col("sales_weeks"))
+            .round(0)
+            .cast(pl.Int64)
+            .alias("avg_weekly_units"),
+            "max_weekly_units",
+            "max_weekly_date",
+            "max_monthly_units",
+            "max_monthly_period",
+            "max_quarterly_units",
+            "max_quarterly_period",
+            "max_yearly_units",
+            "max_yearly_year",
+            "launch_week_units",
+            *[
+                (pl.col("reached_weeks").list.get(i) + reached_week_offset).alias(key)
+                for i, (_, key) in enumerate(_REACH_THRESHOLDS)
+            ],
+        )
+        .collect()
+    )
 
 
 def maker_sales_summary(
-    df: pl.DataFrame, makers: List[str] | None = None
+    df: pl.DataFrame,
+    makers: List[str] | None = None,
+    period_totals: Dict[str, pl.DataFrame] | None = None,
 ) -> List[Dict[str, Any]]:
     """
     各ゲームハードメーカーのサマリ情報を辞書の配列で返す関数。
@@ -419,6 +588,7 @@ def maker_sales_summary(
     Args:
         df: load_hard_sales()の戻り値のDataFrame
         makers: メーカー名の配列。Noneや空リストの場合は全メーカーの情報を返す。
+        period_totals: 集計済みの期間毎・メーカー毎の販売台数(maker_sales_summary_table()を参照)
 
     Returns:
         List[dict]: 各メーカーのサマリ情報を含む辞書の配列。
@@ -440,94 +610,178 @@ def maker_sales_summary(
         - max_yearly_year (int): 年間の最大販売台数を記録した年
         - max_yearly_hw (List[str]): 年間最大時のハード構成
     """
-    maker_list: List[str] = makers if makers else df["maker_name"].unique().to_list()
+    return maker_sales_summary_table(df, makers, period_totals).to_dicts()
+
+
+# maker_sales_summary()で最大値を求める期間の粒度: (期間のカラム, 結果のカラム名の接頭辞, 期間を表す値)
+_MAKER_PERIODS: List[tuple[Mode, List[str], str, pl.Expr]] = [
+    (Mode.WEEK, ["report_date"], "max_weekly", pl.col("report_date")),
+    (
+        Mode.MONTH,
+        ["year", "month"],
+        "max_monthly",
+        pl.format("{}-{}", pl.col("year"), pl.col("month").cast(pl.Utf8).str.zfill(2)),
+    ),
+    (Mode.QUARTER, ["quarter"], "max_quarterly", pl.col("quarter")),
+    (Mode.YEAR, ["year"], "max_yearly", pl.col("year").cast(pl.Int64)),
+]
 
-    result: List[Dict[str, Any]] = []
 
-    for maker in maker_list:
-        maker_df = df.filter(pl.col("maker_name") == maker)
+def _maker_period_totals(
+    df: pl.DataFrame,
+    mode: Mode,
+    period_columns: List[str],
+    period_totals: Dict[str, pl.DataFrame] | None,
+) -> pl.LazyFrame:
+    """
+    期間毎・メーカー毎の販売台数(period_columns, maker_name, units)を返す。
 
-        if maker_df.is_empty():
-            continue
+    period_totalsに集計済みの結果があればそれを、dfがload_hard_sales()のキャッシュと同じデータであれば
+    SalesCubeの集計結果を使い、どちらも無ければdfを集計する。
+    """
+    if period_totals is not None and mode.value in period_totals:
+        totals = period_totals[mode.value]
+        units_column = hsf.UNITS_COLUMNS[mode]
+        if units_column in totals.columns:
+            totals = totals.rename({units_column: "units"})
+        return totals.lazy().select([*period_columns, "maker_name", "units"])
+    cube = sc.cube_for(df)
+    if cube is not None:
+        return cube.table(mode.value, "maker_name").lazy().select(
+            [*period_columns, "maker_name", "units"]
+        )
+    return df.lazy().group_by([*period_columns, "maker_name"]).agg(pl.col("units").sum())
 
-        # このメーカーの全HW識別子
-        hw_list: List[str] = maker_df["hw"].unique().sort().to_list()
 
-        # 累計販売台数 (各HWの最大sum_unitsの合計)
-        total_units: int = int(
-            maker_df.sort(["hw", "sum_units"])
-            .group_by("hw", maintain_order=False)
-            .last()
-            .select("sum_units")
-            .sum()
-            .item()
-        )
+@memoize
+def maker_sales_summary_table(
+    df: pl.DataFrame,
+    makers: List[str] | None = None,
+    period_totals: Dict[str, pl.DataFrame] | None = None,
+) -> pl.DataFrame:
+    """
+    maker_sales_summary()と同じサマリ情報を、1メーカー1行のDataFrameで返す関数。
 
-        # 週間最大: report_dateごとに集計
-        weekly = maker_df.group_by("report_date").agg(
-            pl.col("units").sum().alias("weekly_total"),
-            pl.col("hw").unique().sort().alias("hw_composition"),
-        )
-        max_weekly_idx: int = int(weekly["weekly_total"].arg_max())
-        max_weekly_units: int = int(weekly["weekly_total"][max_weekly_idx])
-        max_weekly_date: date = weekly["report_date"][max_weekly_idx]
-        max_weekly_hw: List[str] = weekly["hw_composition"][max_weekly_idx].to_list()
-
-        # 月間最大: year+monthごとに集計
-        monthly = maker_df.group_by(["year", "month"]).agg(
-            pl.col("units").sum().alias("monthly_total"),
-            pl.col("hw").unique().sort().alias("hw_composition"),
+    メーカー毎のループではなく、粒度毎に期間×メーカーの販売台数から最大の期間をウィンドウ関数で選び、
+    その期間のハード構成だけを元のDataFrameから求める。期間毎の販売台数は、period_totalsを指定すれば
+    それを使い、dfがload_hard_sales()の戻り値であればsales_cubeの集計結果を使う。
+    最大値が同じ期間が複数ある場合は古い期間を選ぶ。
+
+    Args:
+        df: load_hard_sales()の戻り値のDataFrame
+        makers: メーカー名の配列。Noneや空リストの場合は全メーカーの情報を返す。
+        period_totals: "week", "month", "quarter", "year"をキーとする、集計済みの期間毎・メーカー毎の
+            販売台数の辞書。値はhsf.periodic_sales(df, mode, key="maker_name")の戻り値、または
+            期間のカラム・maker_name・unitsを含むDataFrame。キーが無い粒度はdfから集計する。
+
+    Returns:
+        pl.DataFrame: makersの順(Noneの場合はdfに現れる順)に並べたサマリ情報のDataFrame。
+                      dfに含まれないメーカーの行は含まない。
+
+        DataFrameのカラム詳細:
+        - maker_sales_summary()の辞書のキーと同じ名前のカラム
+          (日付はDate、台数はInt64、期間はString、ハードの配列はList(String))
+    """
+    maker_list: List[str] = (
+        makers if makers else df["maker_name"].unique(maintain_order=True).to_list()
+    )
+    lf = df.lazy()
+    if makers:
+        lf = lf.filter(pl.col("maker_name").is_in(maker_list))
+
+    # 累計販売台数 (各HWの最大sum_unitsの合計)
+    result = (
+        pl.LazyFrame({"maker_name": maker_list}, schema={"maker_name": pl.Utf8})
+        .join(
+            lf.group_by(["maker_name", "hw"])
+            .agg(pl.col("sum_units").max())
+            .group_by("maker_name")
+            .agg(
+                pl.col("hw").sort().alias("hw_list"),
+                pl.col("sum_units").sum().cast(pl.Int64).alias("total_units"),
+            ),
+            on="maker_name",
+            how="inner",
+            maintain_order="left",
         )
-        max_monthly_idx: int = int(monthly["monthly_total"].arg_max())
-        max_monthly_units: int = int(monthly["monthly_total"][max_monthly_idx])
-        max_monthly_year: int = int(monthly["year"][max_monthly_idx])
-        max_monthly_month: int = int(monthly["month"][max_monthly_idx])
-        max_monthly_period: str = f"{max_monthly_year}-{max_monthly_month:02d}"
-        max_monthly_hw: List[str] = monthly["hw_composition"][max_monthly_idx].to_list()
-
-        # 四半期最大
-        quarterly = maker_df.group_by("quarter").agg(
-            pl.col("units").sum().alias("quarterly_total"),
-            pl.col("hw").unique().sort().alias("hw_composition"),
+    )
+
+    for mode, period_columns, prefix, period in _MAKER_PERIODS:
+        totals = _maker_period_totals(df, mode, period_columns, period_totals)
+        if makers:
+            totals = totals.filter(pl.col("maker_name").is_in(maker_list))
+        # メーカー毎に販売台数が最大の期間(同数の場合は古い期間)を選ぶ
+        best = (
+            totals.sort(period_columns)
+            .filter(pl.col("units") == pl.col("units").max().over("maker_name"))
+            .filter(pl.int_range(pl.len()).over("maker_name") == 0)
         )
-        max_quarterly_idx: int = int(quarterly["quarterly_total"].arg_max())
-        max_quarterly_units: int = int(quarterly["quarterly_total"][max_quarterly_idx])
-        max_quarterly_period: str = quarterly["quarter"][max_quarterly_idx]
-        max_quarterly_hw: List[str] = quarterly["hw_composition"][
-            max_quarterly_idx
-        ].to_list()
-
-        # 年間最大
-        yearly = maker_df.group_by("year").agg(
-            pl.col("units").sum().alias("yearly_total"),
-            pl.col("hw").unique().sort().alias("hw_composition"),
+        composition = (
+            lf.join(best, on=["maker_name", *period_columns], how="semi")
+            .group_by("maker_name")
+            .agg(pl.col("hw").unique().sort().alias(f"{prefix}_hw"))
         )
-        max_yearly_idx: int = int(yearly["yearly_total"].arg_max())
-        max_yearly_units: int = int(yearly["yearly_total"][max_yearly_idx])
-        max_yearly_year: int = int(yearly["year"][max_yearly_idx])
-        max_yearly_hw: List[str] = yearly["hw_composition"][max_yearly_idx].to_list()
-
-        result.append(
-            {
-                "maker_name": maker,
-                "hw_list": hw_list,
-                "total_units": total_units,
-                "max_weekly_units": max_weekly_units,
-                "max_weekly_date": max_weekly_date,
-                "max_weekly_hw": max_weekly_hw,
-                "max_monthly_units": max_monthly_units,
-                "max_monthly_period": max_monthly_period,
-                "max_monthly_hw": max_monthly_hw,
-                "max_quarterly_units": max_quarterly_units,
-                "max_quarterly_period": max_quarterly_period,
-                "max_quarterly_hw": max_quarterly_hw,
-                "max_yearly_units": max_yearly_units,
-                "max_yearly_year": max_yearly_year,
-                "max_yearly_hw": max_yearly_hw,
-            }
+        period_name = "date" if mode == Mode.WEEK else "year" if mode == Mode.YEAR else "period"
+        result = result.join(
+            best.select(
+                "maker_name",
+                pl.col("units").cast(pl.Int64).alias(f"{prefix}_units"),
+                period.alias(f"{prefix}_{period_name}"),
+            ).join(composition, on="maker_name", how="left"),
+            on="maker_name",
+            how="left",
+            maintain_order="left",
         )
 
-    return result
+    return result.collect()
+
+
+def sales_values(requests: List[Dict[str, Any]] | pl.DataFrame) -> pl.DataFrame:
+    """複数のハード・週の販売台数（週間と累計）をまとめて取得する関数。
+
+    load_hard_sales()のデータからデータのバージョン毎に一度だけ作る索引
+    （(hw, index_week)の辞書と、ハード毎の集計期間の配列）を引くので、
+    DataFrame全体を検索し直さずに数百件の指定をまとめて解決できる。
+
+    Args:
+        requests: 取得する週の指定のリスト、またはDataFrame。各要素（各行）は以下のキーを持つ。
+            - hw: ゲームハードの識別子
+            - report_date: 対象とする集計日（その日を含む週のデータを取得）。省略可
+            - index_week: 発売からの週番号（1始まり）。負の値なら最新週。省略可
+            report_date と index_week はどちらか一方のみを指定する。
+
+    Returns:
+        pl.DataFrame: requestsと同じ順で1件1行のDataFrame。
+                      該当する週がない行は hw 以外のカラムがnullになる。
+
+        DataFrameのカラム詳細:
+        - hw (String): ゲームハードの識別子
+        - report_date (Date): 該当した週の集計終了日
+        - index_week (Int32): 該当した週が発売から何週目か（1始まり）
+        - units (Int64): 週次販売台数
+        - sum_units (Int64): report_date時点での累計販売台数
+
+    Raises:
+        ValueError: report_date と index_week の両方が指定された、
+                   または両方が指定されていない要素がある場合。
+    """
+    if isinstance(requests, pl.DataFrame):
+        requests = requests.to_dicts()
+
+    lookup = sl.get_sales_lookup()
+    hws = []
+    positions = []
+    for request in requests:
+        report_date = request.get("report_date")
+        index_week = request.get("index_week")
+        if report_date is not None and index_week is not None:
+            raise ValueError("report_date と index_week は同時に指定できません。")
+        if report_date is None and index_week is None:
+            raise ValueError("report_date または index_week のいずれかを指定してください。")
+        hws.append(request["hw"])
+        positions.append(lookup.position(request["hw"], report_date, index_week))
+
+    return lookup.rows(positions).with_columns(pl.Series("hw", hws, dtype=pl.String))
 
 
 def sales_value(
@@ -538,6 +792,8 @@ def sales_value(
 ) -> int:
     """特定のハードウェアの販売台数（週間または累計）を取得する関数。
 
+    sales_values() で1件だけ取得した結果を返す。
+
     Args:
         hw: ゲームハードウェアの識別子。
         report_date: 対象とする集計日（その週のデータを取得）。
@@ -553,31 +809,20 @@ def sales_value(
 
     Raises:
         ValueError: `report_date` と `index_week` の両方が指定された場合、
-                   または両方が指定されていない（None）場合。
+                   または両方が指定されていない（None）場合、
+                   または該当する週のデータがない場合。
     """
     if report_date is not None and index_week is not None:
         raise ValueError("report_date と index_week は同時に指定できません。")
-
-    df_all = hs.load_hard_sales()
-
-    if report_date:
-        df = extract_by_date(df=df_all, hw=[hw], target_date=report_date)
-
-    elif index_week:
-        if index_week < 0:
-            df = (
-                df_all.filter(pl.col("hw") == hw)
-                .sort(pl.col("index_week"), descending=True)
-                .head(1)
-            )
-        else:
-            df = df_all.filter(
-                (pl.col("hw") == hw) & (pl.col("index_week") == index_week)
-            )
-    else:
+    if not report_date and not index_week:
         raise ValueError("report_date または index_week のいずれかを指定してください。")
 
+    df = sales_values([{"hw": hw, "report_date": report_date, "index_week": index_week}])
+
     column_name = "units"
     if cumulative:
         column_name = "sum_units"
-    return df.select(pl.col(column_name)).item()  # 単一の値を取得
+    value = df[column_name][0]
+    if value is None:
+        raise ValueError(f"{hw} の該当する週のデータがありません。")
+    return value
@@ -1,16 +1,37 @@
 from datetime import datetime, date
+from typing import TypeVar
 import polars as pl
 
+from . import sales_cube as sc
+from .memo import memoize
+from .mode import Mode, parse_mode
+
+# 各関数はDataFrameとLazyFrameのどちらも受け付け、入力と同じ型で結果を返す。
+# LazyFrameを渡した場合は関数を連結した処理全体が最後のcollect()で一度だけ実行される。
+# load_hard_sales()の戻り値をそのまま渡した場合は、毎回group_byする代わりに
+# sales_cube.SalesCubeの集計結果(データのバージョン毎に粒度毎に一度だけ計算する)を切り出して返す。
+FrameT = TypeVar("FrameT", pl.DataFrame, pl.LazyFrame)
+
+# periodic_sales()のmode毎の販売台数のカラム名
+UNITS_COLUMNS = {
+    Mode.WEEK: "weekly_units",
+    Mode.MONTH: "monthly_units",
+    Mode.QUARTER: "quarterly_units",
+    Mode.FISCAL_QUARTER: "quarterly_units",
+    Mode.YEAR: "yearly_units",
+    Mode.FISCAL_YEAR: "yearly_units",
+}
+
 
 def date_filter(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     日付でDataFrameをフィルタリングする内部関数。
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
     Returns:
@@ -29,17 +50,100 @@ def date_filter(
     return df
 
 
+def _aggregate_sales(
+    src_df: FrameT,
+    granularity: str,
+    key_column: str,
+    units_column: str,
+    begin: datetime | date | None = None,
+    end: datetime | date | None = None,
+) -> FrameT:
+    """
+    src_dfをgranularityの期間毎・key_column毎に集計し、期間順・販売台数の多い順に並べて返す。
+
+    累計販売台数(sum_units)はkey_column毎に期間順のウィンドウで計算するので、並べ替えは最後の1回だけ行う。
+    load_hard_sales()の戻り値が渡された場合はSalesCubeの集計結果を使う。
+    """
+    order = sc.PERIOD_ORDER[granularity]
+    cube = sc.cube_for(src_df)
+    if cube is not None:
+        df = cube.sales(granularity, key_column, begin, end).rename({"units": units_column})
+    else:
+        df = (
+            date_filter(src_df, begin=begin, end=end)
+            .group_by([*sc.PERIOD_COLUMNS[granularity], key_column])
+            .agg(pl.col("units").sum().alias(units_column))
+            .with_columns(
+                sum_units=pl.col(units_column).cum_sum().over(key_column, order_by=order)
+            )
+        )
+    return df.sort(
+        by=[*order, units_column], descending=[False] * len(order) + [True]
+    )
+
+
+@memoize
+def periodic_sales(
+    src_df: FrameT,
+    mode: str | Mode,
+    key: str = "hw",
+    begin: datetime | date | None = None,
+    end: datetime | date | None = None,
+) -> FrameT:
+    """
+    modeで指定した期間毎の販売台数と、その期間までの累計販売台数（sum_units）を集計して返す。
+
+    weekly_sales()などの各関数はこの関数を呼び出す。会計年度・会計四半期毎の集計にも使える。
+    begin, endを指定した場合はその範囲の週だけを集計するので、sum_unitsはbegin以降の累計になる。
+
+    Args:
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
+        mode: 集計の単位（Modeまたは"week", "month", "quarter", "year", "fq", "fy"などparse_mode()が受け付ける文字列）
+        key: 集計のキー。"hw"の場合はハード毎、"maker_name"の場合はメーカー毎に集計
+        begin: 集計開始日
+        end: 集計終了日
+
+    Returns:
+        pl.DataFrame: 期間毎の販売台数とsum_unitsを含む、期間順・販売台数の多い順のDataFrame
+
+        DataFrameのカラム詳細:
+        - 期間のカラム: modeにより以下のとおり
+            - week: report_date (Date)
+            - month: year (Int16), month (Int16)
+            - quarter: quarter (String), fiscal_quarter (String), year (Int16),
+              fiscal_year (Int16), q_num (Int8), fq_num (Int8)
+            - fiscal_quarter: fiscal_quarter (String), fiscal_year (Int16), fq_num (Int8)
+            - year: year (Int16)
+            - fiscal_year: fiscal_year (Int16)
+        - hw / maker_name (String): keyのカラム
+        - weekly_units / monthly_units / quarterly_units / yearly_units (Int64): 期間内の販売台数
+          (UNITS_COLUMNS[mode]。会計四半期・会計年度はquarterly_units / yearly_units)
+        - sum_units (Int64): その期間時点での累計販売台数
+    """
+    mode_enum = mode if isinstance(mode, Mode) else parse_mode(mode)
+    if key not in sc.KEY_COLUMNS:
+        raise ValueError(f"key must be one of {sc.KEY_COLUMNS}: {key}")
+    return _aggregate_sales(
+        src_df, mode_enum.value, key, UNITS_COLUMNS[mode_enum], begin=begin, end=end
+    )
+
+
+def _key_column(maker_mode: bool) -> str:
+    """maker_modeに対応する集計のキーのカラム名を返す"""
+    return "maker_name" if maker_mode else "hw"
+
+
 def weekly_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
     maker_mode: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     週毎の販売台数と、その週までの累計販売台数（sum_units）を集計して返す。
 
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
         maker_mode: Trueの場合、メーカー毎に集計。Falseの場合、ハード毎に集計。
@@ -54,34 +158,20 @@ def weekly_sales(
         - weekly_units (Int64): 週次販売台数
         - sum_units (Int64): report_date時点での累計販売台数
     """
-    df = date_filter(src_df, begin=begin, end=end)
-
-    # 週ごとの販売台数を集計
-    if maker_mode:
-        key_column = "maker_name"
-    else:
-        key_column = "hw"
-
-    weekly_sales = (
-        df.group_by(["report_date", key_column])
-        .agg(pl.col("units").sum().alias("weekly_units"))
-        .sort([key_column, "report_date"])
-        .with_columns(sum_units=pl.col("weekly_units").cum_sum().over(key_column))
-    ).sort(by=["report_date", "weekly_units"], descending=[False, True])
-    return weekly_sales
+    return periodic_sales(src_df, Mode.WEEK, _key_column(maker_mode), begin=begin, end=end)
 
 
 def monthly_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
     maker_mode: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     月毎の販売台数と、その月までの累計販売台数（sum_units）を集計して返す。
 
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
         maker_mode: Trueの場合、メーカー毎に集計。Falseの場合、ハード毎に集計。
@@ -97,34 +187,20 @@ def monthly_sales(
         - monthly_units (Int64): 月次販売台数
         - sum_units (Int64): その月時点での累計販売台数
     """
-    df = date_filter(src_df, begin=begin, end=end)
-
-    # 月ごとの販売台数を集計
-    if maker_mode:
-        key_column = "maker_name"
-    else:
-        key_column = "hw"
-
-    monthly_sales = (
-        df.group_by(["year", "month", key_column])
-        .agg(pl.col("units").sum().alias("monthly_units"))
-        .sort([key_column, "year", "month"])
-        .with_columns(sum_units=pl.col("monthly_units").cum_sum().over(key_column))
-    ).sort(by=["year", "month", "monthly_units"], descending=[False, False, True])
-    return monthly_sales
+    return periodic_sales(src_df, Mode.MONTH, _key_column(maker_mode), begin=begin, end=end)
 
 
 def quarterly_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
     maker_mode: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     四半期毎の販売台数と、その四半期までの累計販売台数（sum_units）を集計して返す。
 
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
         maker_mode: Trueの場合、メーカー毎に集計。Falseの場合、ハード毎に集計。
@@ -144,46 +220,20 @@ def quarterly_sales(
         - quarterly_units (Int64): 四半期販売台数
         - sum_units (Int64): その四半期時点での累計販売台数
     """
-    df = date_filter(src_df, begin=begin, end=end)
-
-    # 四半期ごとの販売台数を集計
-    if maker_mode:
-        key_column = "maker_name"
-    else:
-        key_column = "hw"
-
-    # quarterカラムから年と四半期番号を抽出
-    quarterly_sales = (
-        df.group_by(
-            [
-                "quarter",
-                "fiscal_quarter",
-                "year",
-                "fiscal_year",
-                "q_num",
-                "fq_num",
-                key_column,
-            ]
-        )
-        .agg(pl.col("units").sum().alias("quarterly_units"))
-        .sort([key_column, "year", "q_num"])
-        .with_columns(sum_units=pl.col("quarterly_units").cum_sum().over(key_column))
-        .sort(by=["year", "q_num", "quarterly_units"], descending=[False, False, True])
-    )
-    return quarterly_sales
+    return periodic_sales(src_df, Mode.QUARTER, _key_column(maker_mode), begin=begin, end=end)
 
 
 def yearly_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
     maker_mode: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     年毎の販売台数と、その年までの累計販売台数（sum_units）を集計して返す。
 
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
         maker_mode: Trueの場合、メーカー毎に集計。Falseの場合、ハード毎に集計。
@@ -198,35 +248,49 @@ def yearly_sales(
         - yearly_units (Int64): 年次販売台数
         - sum_units (Int64): その年時点での累計販売台数
     """
-    df = date_filter(src_df, begin=begin, end=end)
+    return periodic_sales(src_df, Mode.YEAR, _key_column(maker_mode), begin=begin, end=end)
 
-    # 年ごとの販売台数を集計
-    if maker_mode:
-        key_column = "maker_name"
-    else:
-        key_column = "hw"
-
-    yearly_sales = (
-        df.group_by(["year", key_column])
-        .agg(pl.col("units").sum().alias("yearly_units"))
-        .sort([key_column, "year"])
-        .with_columns(sum_units=pl.col("yearly_units").cum_sum().over(key_column))
-        .sort(by=["year", "yearly_units"], descending=[False, True])
-    )
 
-    return yearly_sales
+def fiscal_yearly_sales(
+    src_df: FrameT,
+    begin: datetime | date | None = None,
+    end: datetime | date | None = None,
+    maker_mode: bool = False,
+) -> FrameT:
+    """
+    会計年度(4月始まり)毎の販売台数と、その年度までの累計販売台数（sum_units）を集計して返す。
+
+    Args:
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
+        begin: 集計開始日
+        end: 集計終了日
+        maker_mode: Trueの場合、メーカー毎に集計。Falseの場合、ハード毎に集計。
+
+    Returns:
+        pl.DataFrame: 会計年度毎の販売台数（yearly_units）と累計販売台数（sum_units）を含むDataFrame
+
+        DataFrameのカラム詳細:
+        - fiscal_year (Int16): 4月始まりの会計年度
+        - hw (String): ゲームハードの識別子 (maker_mode=Falseの場合)
+        - maker_name (String): メーカー名 (maker_mode=Trueの場合)
+        - yearly_units (Int64): 会計年度の販売台数
+        - sum_units (Int64): その会計年度時点での累計販売台数
+    """
+    return periodic_sales(
+        src_df, Mode.FISCAL_YEAR, _key_column(maker_mode), begin=begin, end=end
+    )
 
 
 def yearly_maker_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     年毎、メーカー毎の販売台数を集計して返す。
 
     Args:
-        src_df: load_hard_sales()の戻り値のDataFrame
+        src_df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin: 集計開始日
         end: 集計終了日
 
@@ -243,12 +307,13 @@ def yearly_maker_sales(
     return df.drop("sum_units")
 
 
-def delta_yearly_sales(df: pl.DataFrame) -> pl.DataFrame:
+@memoize
+def delta_yearly_sales(df: FrameT) -> FrameT:
     """
     販売開始からの経過年毎の販売台数と、その経過年までの累計販売台数（sum_units）を集計して返す。
 
     Args:
-        df: load_hard_sales()の戻り値のDataFrame
+        df: load_hard_sales()の戻り値のDataFrame、またはload_hard_sales_lazy()のLazyFrame
 
     Returns:
         pl.DataFrame: 経過年毎の販売台数（yearly_units）と累計販売台数（sum_units）を含むDataFrame
@@ -259,12 +324,4 @@ def delta_yearly_sales(df: pl.DataFrame) -> pl.DataFrame:
         - yearly_units (Int64): 経過年次販売台数
         - sum_units (Int64): その経過年時点での累計販売台数
     """
-    # 年ごとの販売台数を集計
-    delta_yearly_sales = (
-        df.group_by(["delta_year", "hw"])
-        .agg(pl.col("units").sum().alias("yearly_units"))
-        .sort(["hw", "delta_year"])
-        .with_columns(pl.col("yearly_units").cum_sum().over("hw").alias("sum_units"))
-        .sort(by=["delta_year", "yearly_units"], descending=[False, True])
-    )
-    return delta_yearly_sales
+    return _aggregate_sales(df, "delta_year", "hw", "yearly_units")
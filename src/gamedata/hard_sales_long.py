@@ -1,25 +1,27 @@
-from datetime import datetime, date
+from datetime import datetime, date, time
 import polars as pl
 from typing import List
 
 # プロジェクト内モジュール
-from . import hard_sales as hs
 from . import hard_sales_filter as hsf
 from . import hard_info as hi
+from .hard_sales_filter import FrameT
+from .memo import memoize
 from .mode import Mode, parse_mode
 
 
+@memoize
 def sales_long(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの週単位の販売台数をlong形式で返す。
 
     Args:
-        src_df: load_hard_sales()で取得したDataFrame
+        src_df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -36,17 +38,18 @@ def sales_long(
     return df.sort("report_date")
 
 
+@memoize
 def monthly_sales_long(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの月単位の販売台数をlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -73,17 +76,18 @@ def monthly_sales_long(
     ).sort("year_month")
 
 
+@memoize
 def quarterly_sales_long(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの四半期単位の販売台数をlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -118,17 +122,18 @@ def quarterly_sales_long(
     ).sort("quarter")
 
 
+@memoize
 def yearly_sales_long(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの年単位の販売台数をlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -148,19 +153,20 @@ def yearly_sales_long(
     return df.sort("year")
 
 
+@memoize
 def cumulative_sales_long(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | None = None,
     end: datetime | None = None,
     mode: str = "week",
     full_name: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの累計販売台数をlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -208,19 +214,20 @@ def cumulative_sales_long(
     return long_df
 
 
+@memoize
 def sales_by_delta_long(
-    df: pl.DataFrame,
+    df: FrameT,
     mode: str = "week",
     begin: int | None = None,
     end: int | None = None,
     hw: List[str] = [],
     full_name: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの販売台数を発売日からの経過期間をインデックスとしたlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         mode: "week"、"month"または"year"を指定。週単位の集計なら"week"、月単位の集計なら"month"、年単位の集計なら"year"を指定。
         begin: 集計開始（経過期間の最小値）
         end: 集計終了（経過期間の最大値）
@@ -270,15 +277,58 @@ def sales_by_delta_long(
     )
 
 
+def _periods_frame(hw_periods: List[dict] | pl.DataFrame) -> pl.DataFrame:
+    """
+    sales_with_offset_long()のhw_periodsを、period_no, period_hw, begin, labelのDataFrameにする。
+    beginにdatetimeが含まれる場合はすべてDatetime型(dateは0時)、そうでなければDate型にする。
+    """
+    if isinstance(hw_periods, pl.DataFrame):
+        # labelのカラムが無い・値がnullの期間は、辞書でlabelを省略した場合と同じラベルにする
+        hw_periods = [
+            {key: value for key, value in period.items() if value is not None}
+            for period in hw_periods.to_dicts()
+        ]
+    begins = [period["begin"] for period in hw_periods]
+    begin_dtype = pl.Date
+    if any(isinstance(begin, datetime) for begin in begins):
+        begin_dtype = pl.Datetime("us")
+        begins = [
+            begin if isinstance(begin, datetime) else datetime.combine(begin, time())
+            for begin in begins
+        ]
+    return pl.DataFrame(
+        {
+            "period_no": list(range(len(hw_periods))),
+            "period_hw": [period["hw"] for period in hw_periods],
+            "begin": begins,
+            "label": [
+                period.get(
+                    "label", f"{period['hw']}:{period['begin'].strftime('%Y.%m.%d')}〜"
+                )
+                for period in hw_periods
+            ],
+        },
+        schema={
+            "period_no": pl.UInt32,
+            "period_hw": pl.Utf8,
+            "begin": begin_dtype,
+            "label": pl.Utf8,
+        },
+    )
+
+
+@memoize
 def sales_with_offset_long(
-    src_df: pl.DataFrame, hw_periods: List[dict], end: int = 52
-) -> pl.DataFrame:
+    src_df: FrameT, hw_periods: List[dict] | pl.DataFrame, end: int = 52
+) -> FrameT:
     """
     複数のハードウェアの異なる期間のデータを、各期間の開始点を揃えたlong形式で返す。
 
+    期間の一覧とsrc_dfを1回の結合でまとめて揃えるので、期間の数が多くても速い。
+
     Args:
-        src_df: load_hard_sales()で取得したDataFrame
-        hw_periods: 各ハードウェアの期間設定のリスト
+        src_df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
+        hw_periods: 各ハードウェアの期間設定のリスト、またはhw, begin, (label)のカラムを持つDataFrame
             各要素は以下のキーを持つ辞書:
             - 'hw' (str, required): ハードウェアの識別子
             - 'begin' (datetime, required): 集計開始日
@@ -295,45 +345,41 @@ def sales_with_offset_long(
         - hw (String): ゲームハードの識別子
         - label (String): ハードウェアのラベル
     """
-    all_data = []
-
-    for period in hw_periods:
-        hw = period["hw"]
-        begin = period["begin"]
-        default_label = f"{hw}:{begin.strftime('%Y.%m.%d')}〜"
-        label = period.get("label", default_label)
+    periods = _periods_frame(hw_periods)
+    if isinstance(src_df, pl.LazyFrame):
+        periods = periods.lazy()
 
-        hw_df = src_df.filter(pl.col("hw") == hw)
-        hw_df = hw_df.filter(pl.col("report_date") >= begin)
-        hw_df = hw_df.sort("report_date").head(end)
-
-        hw_df = hw_df.with_columns(
-            offset_week=((pl.col("report_date") - begin).dt.total_days() / 7).cast(
+    # 期間毎に、そのハードの集計開始日以降の行をreport_dateの順に数え、先頭からend週分を残す
+    return (
+        src_df.select("hw", "report_date", "units")
+        .join(periods, left_on=pl.col("hw").cast(pl.Utf8), right_on="period_hw")
+        .filter(pl.col("report_date") >= pl.col("begin"))
+        .filter(
+            pl.int_range(pl.len()).over("period_no", order_by="report_date") < end
+        )
+        .with_columns(
+            offset_week=((pl.col("report_date") - pl.col("begin")).dt.total_days() / 7).cast(
                 pl.Int32
             )
         )
-
-        hw_df = hw_df.select(
-            ["offset_week", "units", "report_date", "hw"]
-        ).with_columns(label=pl.lit(label))
-
-        all_data.append(hw_df)
-
-    return pl.concat(all_data).sort("offset_week")
+        .sort(["offset_week", "period_no", "report_date"])
+        .select(["offset_week", "units", "report_date", "hw", "label"])
+    )
 
 
+@memoize
 def yearly_cumulative_long(
-    df: pl.DataFrame,
+    df: FrameT,
     year: int = 2026,
     hw: List[str] = [],
     begin: int = 1,
     end: int = 366,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     複数のハードウェアの同じ年の年次累積データをlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         year: 対象年
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始（年次累積の最小値、1から始まる）
@@ -356,17 +402,20 @@ def yearly_cumulative_long(
     return df
 
 
+@memoize
 def yearly_cumulative_by_hwy_long(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     hw_years: list[tuple[str, int]],
     begin: int = 1,
     end: int = 366,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     複数のハードウェアの異なる年の年次累積データをlong形式で返す。
 
+    (hw, year)の一覧をDataFrameにしてsrc_dfと1回だけ結合するので、比較する年の数によらず1回の走査で済む。
+
     Args:
-        src_df: load_hard_sales()で取得したDataFrame
+        src_df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw_years: 各ハードウェアの年次設定のリスト
             各要素は(hw, year)のタプル形式で、hwはハードウェアの識別子、yearは対象年を指定する。
              例えば[("NS2", 2024), ("PS5", 2020)]のように指定する。
@@ -381,36 +430,47 @@ def yearly_cumulative_by_hwy_long(
         - load_hard_sales()の全カラム: 指定ハード・指定年・指定yday範囲でフィルタリングした年次累積販売データ
         - label (String): ハードウェアのラベル（"{hw}:{year}"の形式）
     """
-    all_data = []
-
-    for hw, year in hw_years:
-        hw_df = (
-            src_df.filter(pl.col("hw") == hw)
-            .filter(pl.col("year") == year)
-            .filter(pl.col("yday") >= begin)
-            .filter(pl.col("yday") <= end)
+    keys = pl.DataFrame(
+        {
+            "key_no": list(range(len(hw_years))),
+            "key_hw": [hw for hw, _ in hw_years],
+            "key_year": [year for _, year in hw_years],
+        },
+        schema={"key_no": pl.UInt32, "key_hw": pl.Utf8, "key_year": pl.Int64},
+    ).with_columns(
+        label=pl.concat_str(
+            [pl.col("key_hw"), pl.lit(":"), pl.col("key_year").cast(pl.Utf8)]
         )
-        label = f"{hw}:{year}"
-        hw_df = hw_df.with_columns(
-            label=pl.lit(label),
-        )
-        all_data.append(hw_df)
+    )
+    if isinstance(src_df, pl.LazyFrame):
+        keys = keys.lazy()
 
-    return pl.concat(all_data).sort("yday")
+    # (hw, year)の一覧と1回だけ結合し、yday・一覧の順に並べる
+    return (
+        src_df.filter(pl.col("yday").is_between(begin, end))
+        .join(
+            keys,
+            left_on=[pl.col("hw").cast(pl.Utf8), pl.col("year").cast(pl.Int64)],
+            right_on=["key_hw", "key_year"],
+        )
+        .sort(["yday", "key_no"])
+        .drop("key_no", "key_hw", "key_year")
+    )
 
 
+@memoize
 def cumulative_sales_by_delta_long(
-    df: pl.DataFrame,
+    df: FrameT,
     mode: str = "week",
     hw: List[str] = [],
     begin: int | None = None,
     end: int | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの累計販売台数を発売日からの経過期間をインデックスとしたlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         mode: "week"、"month"または"year"を指定。週単位の集計なら"week"、月単位の集計なら"month"、年単位の集計なら"year"を指定。
         hw: 対象ハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始（経過期間の最小値）
@@ -457,14 +517,15 @@ def cumulative_sales_by_delta_long(
     )
 
 
+@memoize
 def maker_long(
-    df: pl.DataFrame, begin_year: int | None = None, end_year: int | None = None
-) -> pl.DataFrame:
+    df: FrameT, begin_year: int | None = None, end_year: int | None = None
+) -> FrameT:
     """
     ハードウェアのメーカー別年次販売台数をlong形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         begin_year: 開始年（デフォルト: None）
         end_year: 終了年（デフォルト: None）
 
@@ -488,26 +549,72 @@ def maker_long(
         ),
     )
     df = df.with_columns(yearly_pct=pl.col("yearly_ratio") * 100)
-    maker_list = hs.get_maker(df)
-    df = df.sort(
-        by=[
-            "year",
-            pl.col(name="maker_name").cast(dtype=pl.Enum(categories=maker_list)),
-        ]
+    # MAKER_ORDER順に並べる(LazyFrameでも使えるよう、順位を式で計算する)
+    maker_order = hi.get_maker_order()
+    maker_rank = pl.col("maker_name").replace_strict(
+        {maker: i for i, maker in enumerate(maker_order)},
+        default=len(maker_order),
+        return_dtype=pl.Int32,
     )
+    df = df.sort(by=["year", maker_rank, "maker_name"])
     return df.select(
         ["year", "maker_name", "yearly_units", "yearly_ratio", "yearly_pct"]
     )
 
 
+def all_pairs(hw: List[str]) -> list[tuple[str, str]]:
+    """
+    hwのすべてのハードの組み合わせを、cumsum_diffs_long()/sales_pase_diffs_long()のcmplistの形式で返す。
+
+    Args:
+        hw: ハードウェアシンボルのリスト
+
+    Returns:
+        list[tuple[str, str]]: hwの異なる2つのハードの(hw_new, hw_old)の全ての順列
+    """
+    return [(hw_new, hw_old) for hw_new in hw for hw_old in hw if hw_new != hw_old]
+
+
+def _join_pairs(
+    df: FrameT, cmplist: list[tuple[str, str]], on: str, columns: List[str]
+) -> FrameT:
+    """
+    cmplistの(hw_new, hw_old)のペア毎に、onの値が同じhw_newの行とhw_oldの行を横に並べたDataFrameを返す。
+
+    ペアの数によらず、ペアの一覧とdfとの2回の結合でまとめて並べる(対象のハードの行は結合で絞り込む)。
+    columnsのカラムは、hw_newの値を{column}_new、hw_oldの値を{column}_oldとする。
+    pair_noはcmplistでのペアの位置。
+    """
+    pairs = pl.DataFrame(
+        {
+            "pair_no": list(range(len(cmplist))),
+            "hw_new": [hw_new for hw_new, _ in cmplist],
+            "hw_old": [hw_old for _, hw_old in cmplist],
+        },
+        schema={"pair_no": pl.UInt32, "hw_new": pl.Utf8, "hw_old": pl.Utf8},
+    )
+    base = df.select(pl.col("hw").cast(pl.Utf8), on, *columns)
+    if isinstance(df, pl.LazyFrame):
+        pairs = pairs.lazy()
+
+    def rename(role: str) -> FrameT:
+        return base.rename({"hw": f"hw_{role}", **{c: f"{c}_{role}" for c in columns}})
+
+    return pairs.join(rename("old"), on="hw_old").join(rename("new"), on=["hw_new", on])
+
+
+@memoize
 def cumsum_diffs_long(
-    df: pl.DataFrame, cmplist: list[tuple[str, str]], include_comeback: bool = False
-) -> pl.DataFrame:
+    df: FrameT, cmplist: list[tuple[str, str]], include_comeback: bool = False
+) -> FrameT:
     """
     複数のハードウェア間の(カレンダー上の)同時期の累計販売台数の差分を計算してDataFrameで返す。
 
+    すべてのペアの差分を、ペアの一覧との結合で一度に計算する。
+    全てのハードの組み合わせを比較する場合は、cmplistにall_pairs(hw)を指定する。
+
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         cmplist: 比較するハードウェアのペアのリスト。各タプルは(hw_new, hw_old)の形式で、
                  ハードウェアシンボルのペアを指定する。
                  例えば[("NS2", "PS5"), ("NSW", "PS4")]のように指定する。
@@ -519,7 +626,7 @@ def cumsum_diffs_long(
                  デフォルトはFalseで、逆転を想定していない｡が､これは完璧に実態に沿っているので問題ない｡
 
     Returns:
-        pl.DataFrame: 各ペアの差分を列として持つDataFrame
+        pl.DataFrame: 各ペアの差分を列として持つDataFrame。index_week、cmplistの順、report_dateの順に並べる
         - index_week: int: 週番号(1から始まる)
         - report_date: datetime: 集計日
         - hw_new: str : NSW, NS2などの､後から追いかけるマシン
@@ -529,81 +636,51 @@ def cumsum_diffs_long(
         - sum_units_new: int: new_hwの累計値
         - sum_units_old: int: old_hwの累計値
     """
-    dfs = []
-
-    def filter_hw_and_rename(df: pl.DataFrame, hw: str, role: str) -> pl.DataFrame:
-        return (
-            df.filter(pl.col("hw") == hw)
-            .select(["hw", "report_date", "sum_units", "index_week"])
-            .rename(
-                {
-                    "hw": f"hw_{role}",
-                    "sum_units": f"sum_units_{role}",
-                    "index_week": f"index_week_{role}",
-                }
-            )
+    # report_dateで結合し、cumsum_diffを計算
+    df_pair = _join_pairs(
+        df, cmplist, on="report_date", columns=["sum_units", "index_week"]
+    ).with_columns(
+        (pl.col("sum_units_old") - pl.col("sum_units_new")).alias("cumsum_diff")
+    )
+    if not include_comeback:
+        # ペア毎に、cumsum_diffが初めて0未満になった集計日までを残す
+        first_negative_date = (
+            pl.col("report_date").filter(pl.col("cumsum_diff") < 0).min().over("pair_no")
         )
-
-    for hw_new, hw_old in cmplist:
-        # old側のデータを抽出
-        df_old = filter_hw_and_rename(df, hw_old, "old")
-        # new側のデータを抽出
-        df_new = filter_hw_and_rename(df, hw_new, "new")
-
-        # report_dateで結合（old左、new右）
-        df_pair = df_old.join(df_new, on="report_date", how="inner")
-
-        # cumsum_diffを計算
-        df_pair = df_pair.with_columns(
-            [(pl.col("sum_units_old") - pl.col("sum_units_new")).alias("cumsum_diff")]
+        df_pair = df_pair.filter(
+            first_negative_date.is_null()
+            | (pl.col("report_date") <= first_negative_date)
         )
-        df_pair = df_pair.sort("report_date")
-        if not include_comeback:
-            negative_rows = df_pair.filter(pl.col("cumsum_diff") < 0)
-            if negative_rows.shape[0] > 0:
-                negative_rows = negative_rows.select(pl.col("report_date")).min()
-                df_pair = df_pair.filter(pl.col("report_date") <= negative_rows.item())
-
-        # pair_nameを作成
-        df_pair = df_pair.with_columns(
+
+    return (
+        df_pair.sort(["index_week_new", "pair_no", "report_date"])
+        .select(
+            "report_date",
+            "hw_new",
+            "hw_old",
             pl.concat_str(
                 [pl.col("hw_new"), pl.lit("_"), pl.col("hw_old"), pl.lit("差")]
-            ).alias("pair_name")
+            ).alias("pair_name"),
+            "cumsum_diff",
+            "sum_units_new",
+            "sum_units_old",
+            pl.col("index_week_new").alias("index_week"),
         )
-
-        # カラムを再配置
-        df_pair = df_pair.select(
-            [
-                "report_date",
-                "hw_new",
-                "hw_old",
-                "pair_name",
-                "cumsum_diff",
-                "sum_units_new",
-                "sum_units_old",
-                "index_week_new",
-            ]
-        ).rename({"index_week_new": "index_week"})
-
-        dfs.append(df_pair)
-
-    # すべてのペアのdataframeを結合
-    result = pl.concat(dfs)
-
-    # index_weekでソート
-    result = result.sort("index_week")
-
-    return result
+    )
 
 
+@memoize
 def sales_pase_diffs_long(
-    df: pl.DataFrame, cmplist: list[tuple[str, str]]
-) -> pl.DataFrame:
+    df: FrameT, cmplist: list[tuple[str, str]]
+) -> FrameT:
     """
     複数のハードウェア間の累計販売台数の差分を計算してDataFrameで返す。
 
+    すべてのペアの差分を、ペアの一覧との結合で一度に計算する。
+    全てのハードの組み合わせを比較する場合は、cmplistにall_pairs(hw)を指定する。
+
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         cmplist: 比較するハードウェアのペアのリスト。各タプルは(hw_new, hw_old)の形式で、
                  ハードウェアシンボルのペアを指定する。
                 例えば[("PS5", "PS4"), ("PS5", "PS3")]のように指定する。
@@ -612,7 +689,7 @@ def sales_pase_diffs_long(
                  PS3と比べて､どの程度早く(あるいは遅く)普及しているかの経緯をを分析できる。
 
     Returns:
-        pl.DataFrame: 各ペアの差分を列として持つDataFrame
+        pl.DataFrame: 各ペアの差分を列として持つDataFrame。index_week、cmplistの順に並べる
         - index_week: int: 週番号(1から始まる)
         - hw_old: str : 比較対象となる古いマシン
         - hw_new: str : 普及状況を分析したいマシン
@@ -623,64 +700,21 @@ def sales_pase_diffs_long(
         - report_date_new: datetime: hw_newのreport_date
         - report_date_old: datetime: hw_oldのreport_date
     """
-    dfs = []
-
-    def filter_hw_and_rename(df, hw, role):
-        return (
-            df.filter(pl.col("hw") == hw)
-            .select(["hw", "index_week", "report_date", "sum_units"])
-            .rename(
-                {
-                    "hw": f"hw_{role}",
-                    "report_date": f"report_date_{role}",
-                    "sum_units": f"sum_units_{role}",
-                }
-            )
-        )
-
-    for hw_new, hw_old in cmplist:
-        # old側のデータを抽出
-        df_old = filter_hw_and_rename(df, hw_old, "old")
-        # new側のデータを抽出
-        df_new = filter_hw_and_rename(df, hw_new, "new")
-
-        # index_weekで結合（old左、new右）
-        df_pair = df_old.join(df_new, on="index_week", how="inner")
-
-        # pase_diffを計算
-        df_pair = df_pair.with_columns(
-            [(pl.col("sum_units_new") - pl.col("sum_units_old")).alias("pase_diff")]
-        )
-        df_pair = df_pair.sort("index_week")
-
-        # pair_nameを作成
-        df_pair = df_pair.with_columns(
+    # index_weekで結合し、pase_diffを計算
+    return (
+        _join_pairs(df, cmplist, on="index_week", columns=["report_date", "sum_units"])
+        .sort(["index_week", "pair_no"])
+        .select(
+            "index_week",
+            "hw_new",
+            "hw_old",
             pl.concat_str(
                 [pl.col("hw_new"), pl.lit("_"), pl.col("hw_old"), pl.lit("差")]
-            ).alias("pair_name")
-        )
-
-        # カラムを再配置
-        df_pair = df_pair.select(
-            [
-                "index_week",
-                "hw_new",
-                "hw_old",
-                "pair_name",
-                "pase_diff",
-                "sum_units_new",
-                "sum_units_old",
-                "report_date_new",
-                "report_date_old",
-            ]
+            ).alias("pair_name"),
+            (pl.col("sum_units_new") - pl.col("sum_units_old")).alias("pase_diff"),
+            "sum_units_new",
+            "sum_units_old",
+            "report_date_new",
+            "report_date_old",
         )
-
-        dfs.append(df_pair)
-
-    # すべてのペアのdataframeを結合
-    result = pl.concat(dfs)
-
-    # index_weekでソート
-    result = result.sort("index_week")
-
-    return result
+    )
@@ -1,9 +1,12 @@
 from datetime import datetime, date, timedelta
+import numpy as np
 import polars as pl
 from typing import List
 
 # プロジェクト内モジュール
 from . import hard_sales_filter as hsf
+from . import sales_matrix as sm
+from .hard_sales_filter import FrameT
 from .hard_sales_long import (
     sales_long,
     monthly_sales_long,
@@ -18,17 +21,30 @@ from .hard_sales_long import (
 from .mode import Mode, parse_mode
 
 
+def _pivot(long_df: FrameT, index: str, on: str, values: str) -> FrameT:
+    """
+    long形式のデータをindexでソートしたピボットテーブルに変換する。
+
+    ピボット後のカラムはデータの値で決まるため、LazyFrameはここで一度だけcollectし、
+    結果をLazyFrameに戻して返す。
+    """
+    if isinstance(long_df, pl.LazyFrame):
+        return _pivot(long_df.collect(), index=index, on=on, values=values).lazy()
+    return long_df.pivot(
+        index=index, on=on, values=values, aggregate_function="last"
+    ).sort(index)
+
 def pivot_sales(
-    src_df: pl.DataFrame,
+    src_df: FrameT,
     hw: List[str] = [],
     begin: datetime | date | None = None,
     end: datetime | date | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの週単位の販売台数をピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -40,23 +56,24 @@ def pivot_sales(
         - report_date (Date): 集計期間の末日（日曜日）
         - 各hw (Int64): ゲームハード別の週次販売台数
     """
+    matrix = sm.matrix_for(src_df)
+    if matrix is not None:
+        return matrix.calendar_view("units", hw=hw, begin=begin, end=end)
     df = sales_long(src_df, hw=hw, begin=begin, end=end)
-    return df.pivot(
-        index="report_date", on="hw", values="units", aggregate_function="last"
-    ).sort("report_date")
+    return _pivot(df, index="report_date", on="hw", values="units")
 
 
 def pivot_monthly_sales(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | None = None,
     end: datetime | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの月単位の販売台数をピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -69,22 +86,20 @@ def pivot_monthly_sales(
         - 各hw (Int64): ゲームハード別の月次販売台数
     """
     long_df = monthly_sales_long(df, hw=hw, begin=begin, end=end)
-    return long_df.pivot(
-        index="month", on="hw", values="monthly_units", aggregate_function="last"
-    ).sort(by="month")
+    return _pivot(long_df, index="month", on="hw", values="monthly_units")
 
 
 def pivot_quarterly_sales(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | None = None,
     end: datetime | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの四半期単位の販売台数をピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -97,22 +112,20 @@ def pivot_quarterly_sales(
         - 各hw (Int64): ゲームハード別の四半期販売台数
     """
     long_df = quarterly_sales_long(df, hw=hw, begin=begin, end=end)
-    return long_df.pivot(
-        index="quarter", on="hw", values="quarterly_units", aggregate_function="last"
-    ).sort(by="quarter")
+    return _pivot(long_df, index="quarter", on="hw", values="quarterly_units")
 
 
 def pivot_yearly_sales(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | None = None,
     end: datetime | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの年単位の販売台数をピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -125,24 +138,22 @@ def pivot_yearly_sales(
         - 各hw (Int64): ゲームハード別の年次販売台数
     """
     long_df = yearly_sales_long(df, hw=hw, begin=begin, end=end)
-    return long_df.pivot(
-        index="year", on="hw", values="yearly_units", aggregate_function="last"
-    ).sort(by="year")
+    return _pivot(long_df, index="year", on="hw", values="yearly_units")
 
 
 def pivot_cumulative_sales(
-    df: pl.DataFrame,
+    df: FrameT,
     hw: List[str] = [],
     begin: datetime | None = None,
     end: datetime | None = None,
     mode: str = "week",
     full_name: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの累計販売台数をピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始日
         end: 集計終了日
@@ -156,31 +167,29 @@ def pivot_cumulative_sales(
         - report_date (Date): 集計期間の末日（日曜日）
         - 各hw/full_name (Int64): ゲームハード別の累計販売台数
     """
+    matrix = sm.matrix_for(df)
+    if matrix is not None and parse_mode(mode) == Mode.WEEK and not full_name:
+        return matrix.calendar_view("sum_units", hw=hw, begin=begin, end=end)
     long_df = cumulative_sales_long(
         df, hw=hw, begin=begin, end=end, mode=mode, full_name=full_name
     )
     columns_name = "full_name" if full_name else "hw"
-    return long_df.pivot(
-        index="report_date",
-        on=columns_name,
-        values="sum_units",
-        aggregate_function="last",
-    ).sort("report_date")
+    return _pivot(long_df, index="report_date", on=columns_name, values="sum_units")
 
 
 def pivot_sales_by_delta(
-    df: pl.DataFrame,
+    df: FrameT,
     mode: str = "week",
     begin: int | None = None,
     end: int | None = None,
     hw: List[str] = [],
     full_name: bool = False,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの販売台数を発売日からの経過状況をカラム、hwを列、unitsを値とするピボットテーブル形式で返す。
 
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         mode: "week"、"month"または"year"を指定。週単位の集計なら"week"、月単位の集計なら"month"、年単位の集計なら"year"を指定。
         begin: 集計開始（経過期間の最小値）
         end: 集計終了（経過期間の最大値）
@@ -196,6 +205,9 @@ def pivot_sales_by_delta(
         - delta_year (Int16): 発売年からの経過年数（modeが"year"の場合）
         - 各hw/full_name (Int64): ゲームハード別の販売台数
     """
+    matrix = sm.matrix_for(df)
+    if matrix is not None and parse_mode(mode) == Mode.WEEK and not full_name:
+        return matrix.delta_view("units", hw=hw, begin=begin, end=end)
     long_df = sales_by_delta_long(
         df, mode=mode, begin=begin, end=end, hw=hw, full_name=full_name
     )
@@ -209,20 +221,18 @@ def pivot_sales_by_delta(
     else:
         raise ValueError("modeは'week', 'month', 'year'のいずれかを指定してください。")
     on_columns = "full_name" if full_name else "hw"
-    return long_df.pivot(
-        index=index_col, on=on_columns, values="units", aggregate_function="last"
-    ).sort(by=[index_col])
+    return _pivot(long_df, index=index_col, on=on_columns, values="units")
 
 
 def pivot_sales_with_offset(
-    src_df: pl.DataFrame, hw_periods: List[dict], end: int = 52
-) -> pl.DataFrame:
+    src_df: FrameT, hw_periods: List[dict] | pl.DataFrame, end: int = 52
+) -> FrameT:
     """
     複数のハードウェアの異なる期間のデータを、各期間の開始点を揃えてピボットテーブル形式で返す。
 
     Args:
-        src_df: load_hard_sales()で取得したDataFrame
-        hw_periods: 各ハードウェアの期間設定のリスト
+        src_df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
+        hw_periods: 各ハードウェアの期間設定のリスト、またはhw, begin, (label)のカラムを持つDataFrame
             各要素は以下のキーを持つ辞書:
             - 'hw' (str, required): ハードウェアの識別子
             - 'begin' (datetime, required): 集計開始日
@@ -245,22 +255,20 @@ def pivot_sales_with_offset(
         >>> result = pivot_sales_with_offset(df, hw_periods)
     """
     long_df = sales_with_offset_long(src_df, hw_periods, end=end)
-    return long_df.pivot(
-        index="offset_week", on="label", values="units", aggregate_function="last"
-    ).sort("offset_week")
+    return _pivot(long_df, index="offset_week", on="label", values="units")
 
 
 def pivot_cumulative_sales_by_delta(
-    df: pl.DataFrame,
+    df: FrameT,
     mode: str = "week",
     hw: List[str] = [],
     begin: int | None = None,
     end: int | None = None,
-) -> pl.DataFrame:
+) -> FrameT:
     """
     ハードウェアの累計販売台数を発売日からの経過状況をカラム、hwを列、sum_unitsを値とするピボットテーブル形式で返す。
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         mode: "week"、"month"または"year"を指定。週単位の集計なら"week"、月単位の集計なら"month"、年単位の集計なら"year"を指定。
         hw: プロットしたいハードウェア名のリスト。[]の場合は全ハードウェアを対象
         begin: 集計開始（経過期間の最小値）
@@ -275,6 +283,9 @@ def pivot_cumulative_sales_by_delta(
         - delta_year (Int16): 発売年からの経過年数（modeが"year"の場合）
         - 各hw (Int64): ゲームハード別の累計販売台数
     """
+    matrix = sm.matrix_for(df)
+    if matrix is not None and parse_mode(mode) == Mode.WEEK:
+        return matrix.delta_view("sum_units", hw=hw, begin=begin, end=end)
     long_df = cumulative_sales_by_delta_long(df, mode=mode, hw=hw, begin=begin, end=end)
     mode_enum = parse_mode(mode)
     if mode_enum == Mode.WEEK:
@@ -285,14 +296,12 @@ def pivot_cumulative_sales_by_delta(
         index_col = "delta_year"
     else:
         raise ValueError("modeは'week', 'month', 'year'のいずれかを指定してください。")
-    return long_df.pivot(
-        index=index_col, on="hw", values="sum_units", aggregate_function="last"
-    ).sort(by=[index_col])
+    return _pivot(long_df, index=index_col, on="hw", values="sum_units")
 
 
 def pivot_maker(
-    df: pl.DataFrame, begin_year: int | None = None, end_year: int | None = None
-) -> pl.DataFrame:
+    df: FrameT, begin_year: int | None = None, end_year: int | None = None
+) -> FrameT:
     """
     ハードウェアのメーカー別販売データをピボットテーブル形式に変換する
 
@@ -315,13 +324,11 @@ def pivot_maker(
         - 各maker_name (Int64): メーカー別の年次販売台数（Nintendo, SONY, Microsoft, SEGA等）
     """
     long_df = maker_long(df, begin_year=begin_year, end_year=end_year)
-    pivot_df = long_df.pivot(
-        index="year", on="maker_name", values="yearly_units", aggregate_function="last"
-    )
+    pivot_df = _pivot(long_df, index="year", on="maker_name", values="yearly_units")
 
     # カラムの順序を調整
     desired_order = ["Nintendo", "SONY", "Microsoft", "SEGA"]
-    existing_columns = pivot_df.columns
+    existing_columns = pivot_df.collect_schema().names()
 
     # 指定した順序でカラムを並べ替え
     ordered_columns = ["year"]  # indexカラムを先頭に
@@ -338,12 +345,16 @@ def pivot_maker(
     return pivot_df.select(ordered_columns).sort("year")
 
 
-def cumsum_diffs(df: pl.DataFrame, cmplist: list[tuple[str, str]]) -> pl.DataFrame:
+def cumsum_diffs(df: FrameT, cmplist: list[tuple[str, str]]) -> FrameT:
     """
     複数のハードウェア間の累計販売台数の差分を計算してDataFrameで返す。
 
+    すべてのペアのハードの累計販売台数を1つのピボットテーブルにし、ペア毎の差分は配列の演算で求める。
+    各ペアの差分は、base_hwに値がある週(最初の週の1つ前の週はbase_hwを0台とする)のうち、
+    差分が-10000以上の週を詰めて並べたもの。ペアによって週数が異なる場合、短い方の残りはnullになる。
+
     Args:
-        df: load_hard_sales()で取得したDataFrame
+        df: load_hard_sales()で取得したDataFrame、またはload_hard_sales_lazy()のLazyFrame
         cmplist: 比較するハードウェアのペアのリスト。各タプルは(base_hw, cmp_hw)の形式で、
                  cmp_hwの累計販売台数からbase_hwの累計販売台数を引いた差分を計算する。
 
@@ -355,62 +366,38 @@ def cumsum_diffs(df: pl.DataFrame, cmplist: list[tuple[str, str]]) -> pl.DataFra
         - 各"{cmp_hw}_{base_hw}差" (Int64): 各ペアの累計販売台数の差分
                    例: "PS5_NSW差"は、PS5の累計販売台数からNSWの累計販売台数を引いた値
     """
+    if isinstance(df, pl.LazyFrame):
+        return cumsum_diffs(df.collect(), cmplist).lazy()
+
+    # すべてのペアのハードの累計販売台数を1つのピボットテーブルにまとめる
+    pivot_df = pivot_cumulative_sales(
+        df, hw=list(dict.fromkeys(hw for pair in cmplist for hw in pair))
+    )
+    # ハード毎の累計販売台数(nullは0)と、値があるかどうかの配列
+    values = {
+        hw: (pivot_df[hw].fill_null(0).to_numpy(), pivot_df[hw].is_not_null().to_numpy())
+        for hw in pivot_df.columns[1:]
+    }
 
-    def cumsum_diff_frame(df: pl.DataFrame, base_hw: str, cmp_hw: str) -> pl.DataFrame:
-        """base_hwとcmp_hwの週販差分を計算したDataFrameを返す"""
-        pivot_df = pivot_cumulative_sales(df, hw=[base_hw, cmp_hw])
-
-        # base_hw列の値がnullでない最初の行の1つ前の行のbase_hw列を0に設定
-        # polarsではwith_row_indexで行番号を追加してから処理
-        pivot_df = pivot_df.with_row_index("row_nr")
-
-        # base_hwがnullでない最初の行番号を取得
-        first_valid_row = (
-            pivot_df.filter(pl.col(base_hw).is_not_null()).select("row_nr").head(1)
-        )
-
-        if first_valid_row.height > 0:
-            first_row_nr = first_valid_row.item(0, 0)
-            if first_row_nr > 0:
-                prior_row_nr = first_row_nr - 1
-                # その1つ前の行のbase_hwを0に設定
-                pivot_df = pivot_df.with_columns(
-                    pl.when(pl.col("row_nr") == prior_row_nr)
-                    .then(0)
-                    .otherwise(pl.col(base_hw))
-                    .alias(base_hw)
-                )
-
-        # base_hwがnullでない行を抽出し、差分を計算
-        diff_col_name = f"{cmp_hw}_{base_hw}差"
-        pivot_df = pivot_df.filter(pl.col(base_hw).is_not_null()).with_columns(
-            (pl.col(cmp_hw) - pl.col(base_hw)).alias(diff_col_name)
-        )
-        pivot_df = pivot_df.filter(pl.col(diff_col_name) >= -10000).select(
-            ["row_nr", diff_col_name]
-        )
-
-        # 行番号を0から振り直す
-        pivot_df = (
-            pivot_df.with_row_index("new_row_nr")
-            .drop("row_nr")
-            .rename({"new_row_nr": "row_nr"})
-        )
-
-        return pivot_df
-
-    diff_dfs = []
+    diffs = []
     for base_hw, cmp_hw in cmplist:
-        diff_df = cumsum_diff_frame(df, base_hw, cmp_hw)
-        diff_dfs.append(diff_df)
-
-    # 最初のDataFrameをベースに、他のDataFrameをrow_nrで結合
-    result_df = diff_dfs[0]
-    for diff_df in diff_dfs[1:]:
-        result_df = result_df.join(diff_df, on="row_nr", how="outer")
-
-    # 行番号を0から振り直す
-    result_df = result_df.with_row_index("weeks").drop("row_nr")
-    if "row_nr_right" in result_df.columns:
-        result_df = result_df.drop("row_nr_right")
-    return result_df
+        base, base_valid = (a.copy() for a in values[base_hw])
+        cmp, cmp_valid = values[cmp_hw]
+        # 2つのハードのどちらかに値がある行だけが、ペアのピボットテーブルの行になる
+        in_pair = base_valid | cmp_valid
+        # base_hwの値がある最初の行の1つ前の行のbase_hwは0とする
+        valid_rows = np.flatnonzero(base_valid)
+        if valid_rows.size > 0:
+            prior_rows = np.flatnonzero(in_pair[: valid_rows[0]])
+            if prior_rows.size > 0:
+                base[prior_rows[-1]] = 0
+                base_valid[prior_rows[-1]] = True
+        diff = cmp - base
+        keep = base_valid & cmp_valid & (diff >= -10000)
+        diffs.append(pl.Series(f"{cmp_hw}_{base_hw}差", diff[keep], dtype=pl.Int64))
+
+    # ペア毎に残した行を詰めて週番号を0から振り、短い系列はnullで埋めて1つのDataFrameにする
+    height = max(diff.len() for diff in diffs)
+    return pl.DataFrame(
+        [diff.extend_constant(None, height - diff.len()) for diff in diffs]
+    ).with_row_index("weeks")
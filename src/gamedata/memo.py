@@ -0,0 +1,168 @@
+# hard_sales_filter / hard_sales_long の関数の結果を保持して再利用する(メモ化する)ためのモジュール
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Hashable, TypeVar
+
+import polars as pl
+
+from . import hard_sales as hs
+from .frozen import freeze
+
+# 保持する結果の数の既定値
+DEFAULT_MAXSIZE = 128
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_memo_enabled: bool = False
+_maxsize: int = DEFAULT_MAXSIZE
+# キーは(関数名, hs.data_version(), 引数)。最後に使った結果が末尾になるよう並べる
+_entries: OrderedDict[tuple, Any] = OrderedDict()
+_hits: int = 0
+_misses: int = 0
+_lock = threading.Lock()
+
+
+class _Unhashable(Exception):
+    """キーにできない引数が渡された(メモ化せずに関数を実行する)"""
+
+
+def enable_memo(enable: bool = True, maxsize: int | None = None) -> None:
+    """
+    memoize()を付けた関数の結果の保持(メモ化)を有効・無効にする関数。既定では無効。
+
+    有効にすると、load_hard_sales()の戻り値(copy=Trueの複製を含む)と同じ引数で呼び出された関数は、
+    2回目以降は保持している結果を返す。保持する結果は最後に使った順に最大maxsize件で、
+    超えた分は最も長く使っていないものから破棄する。load_hard_sales(no_cache=True)や
+    refresh_hard_sales()でデータが変わると、保持している結果はすべて破棄される。
+    無効にした場合も保持している結果を破棄する。
+
+    Args:
+        enable: Trueで有効、Falseで無効
+        maxsize: 保持する結果の最大数。Noneの場合は変更しない
+    """
+    global _memo_enabled, _maxsize
+
+    with _lock:
+        _memo_enabled = enable
+        if maxsize is not None:
+            _maxsize = maxsize
+    clear_memo()
+
+
+def clear_memo() -> None:
+    """
+    保持している結果をすべて破棄する関数。ヒット・ミスの回数も0に戻す。
+
+    ハード情報(gamehard_info)など、販売データ以外の入力を変更した場合に呼び出す。
+    """
+    global _hits, _misses
+
+    with _lock:
+        _entries.clear()
+        _hits = 0
+        _misses = 0
+
+
+def memo_info() -> dict[str, Any]:
+    """
+    メモ化の状態を返す関数。
+
+    Returns:
+        dict: 以下のキーを持つ辞書
+        - enabled (bool): メモ化が有効か
+        - hits (int): 保持している結果を返した回数
+        - misses (int): 関数を実行して結果を保持した回数
+        - size (int): 保持している結果の数
+        - maxsize (int): 保持する結果の最大数
+    """
+    with _lock:
+        return {
+            "enabled": _memo_enabled,
+            "hits": _hits,
+            "misses": _misses,
+            "size": len(_entries),
+            "maxsize": _maxsize,
+        }
+
+
+def _invalidate() -> None:
+    """load_hard_sales()のキャッシュが破棄・更新されたときに、保持している結果を破棄する"""
+    with _lock:
+        _entries.clear()
+
+
+hs._cache_listeners.append(_invalidate)
+
+
+def _normalize(value: Any) -> Hashable:
+    """引数をキーに使える値に変換する(listはtupleに、dictは並べ替えたtupleにする)"""
+    if isinstance(value, (pl.DataFrame, pl.LazyFrame, pl.Series)):
+        raise _Unhashable
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_normalize(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _normalize(v)) for k, v in value.items())))
+    if isinstance(value, (set, frozenset)):
+        return ("set", frozenset(_normalize(v) for v in value))
+    if isinstance(value, date):
+        # datetimeとdateは等しくならないので、型も含めて区別する
+        return (type(value).__name__, value)
+    try:
+        hash(value)
+    except TypeError:
+        raise _Unhashable from None
+    return value
+
+
+def memoize(fn: F) -> F:
+    """
+    load_hard_sales()のDataFrameを第1引数に取る関数の結果を、enable_memo()で有効にした場合に保持するデコレータ。
+
+    結果は(関数, hs.data_version(), 第1引数のカラム, 第1引数以外の引数)をキーにして保持する。
+    キャッシュの一部のカラムを選んだ・並べ替えたDataFrameは、キャッシュ全体とは別の結果として保持する。
+    第1引数がload_hard_sales()のキャッシュと同じデータでない場合(絞り込んだDataFrameやLazyFrame)や、
+    キーにできない引数がある場合は、保持せずにそのまま関数を実行する。
+    保持した結果は読み取り専用にしておき、呼び出し元には複製(clone())を返す。
+    """
+    signature = inspect.signature(fn)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        global _hits, _misses
+
+        if not _memo_enabled:
+            return fn(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        (df, *rest) = bound.arguments.values()
+        version = hs.frame_version(df, df.columns) if isinstance(df, pl.DataFrame) else None
+        if version is None:
+            return fn(*args, **kwargs)
+        try:
+            key = (name, version, tuple(df.columns), tuple(_normalize(value) for value in rest))
+        except _Unhashable:
+            return fn(*args, **kwargs)
+
+        with _lock:
+            if key in _entries:
+                _entries.move_to_end(key)
+                _hits += 1
+                result = _entries[key]
+                return result.clone() if isinstance(result, pl.DataFrame) else result
+
+        result = fn(*args, **kwargs)
+        stored = freeze(result) if isinstance(result, pl.DataFrame) else result
+        with _lock:
+            _misses += 1
+            if version == hs.data_version():
+                _entries[key] = stored
+                while len(_entries) > _maxsize:
+                    _entries.popitem(last=False)
+        return result
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,168 @@
+# ハード毎に累計販売台数が各閾値に初めて到達した週を引くための索引(マイルストーン)を保持するモジュール
+
+import polars as pl
+
+from . import hard_sales as hs
+from .frozen import FrozenDataFrame, freeze
+
+# milestones()で到達週を求める累計販売台数の刻みの既定値
+DEFAULT_STEP = 100_000
+# milestones()の結果に含める行のカラム
+MILESTONE_COLUMNS = ["hw", "report_date", "delta_week", "index_week", "sum_units"]
+
+_milestone_index: "MilestoneIndex | None" = None
+
+
+class MilestoneIndex:
+    """
+    load_hard_sales()のDataFrameから、ハード毎に累計販売台数がある台数に初めて到達した週を
+    二分探索で引くための索引を保持するクラス。
+
+    元のDataFrameをハード・report_dateの順に並べ、ハード毎の累計販売台数の累積最大値を
+    「ハードの番号 × 間隔 + 累積最大値」という1本の昇順の配列にしておく。
+    これにより、すべてのハードの到達週を1回のsearch_sorted()で求められる。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+        # extract_week_reached_units()のgroup_by("hw")の結果と同じく、hwを先頭のカラムにしておく
+        self._rows: FrozenDataFrame = freeze(
+            df.select("hw", pl.exclude("hw")).sort(["hw", "report_date"])
+        )
+        # 補正で累計販売台数が減る週があっても、最初に到達した週を求められるように累積最大値を使う
+        reach = self._rows.select(pl.col("sum_units").cum_max().over("hw"))["sum_units"]
+        hw_no = self._rows.select(
+            (pl.col("hw") != pl.col("hw").shift()).fill_null(True).cum_sum() - 1
+        )["hw"]
+        self._base: int = reach.min() if reach.len() > 0 else 0  # type: ignore[assignment]
+        top: int = reach.max() if reach.len() > 0 else 0  # type: ignore[assignment]
+        # 同じハードの閾値が次のハードの範囲に入らないよう、最大値+1の閾値まで収まる間隔にする
+        self._span: int = top - self._base + 2
+        self._keys = (hw_no.cast(pl.Int64) * self._span + (reach - self._base)).alias("key")
+        ends = hw_no.value_counts(sort=False).sort("hw")
+        self._hw_count = ends.height
+        self._ends = ends["count"].cast(pl.Int64).cum_sum()
+        self._hw_no = pl.int_range(self._hw_count, dtype=pl.Int64, eager=True)
+        self._max_reach = reach.gather(self._ends - 1) if self._hw_count > 0 else reach
+        self._milestones: dict[int, FrozenDataFrame] = {}
+
+    def _positions(self, hw_no: pl.Series, threshold_units: pl.Series | int) -> pl.Series:
+        """
+        ハードの番号毎に、累計販売台数がthreshold_unitsに到達した行の位置を返す。
+        到達していないハードは、次のハードの先頭(self._ends)の位置になる。
+        """
+        target = threshold_units - self._base
+        if isinstance(target, pl.Series):
+            target = target.clip(0, self._span - 1)
+        else:
+            target = min(max(target, 0), self._span - 1)
+        return self._keys.search_sorted(hw_no * self._span + target, side="left")
+
+    def reached(self, threshold_units: int) -> pl.DataFrame:
+        """
+        累計販売台数がthreshold_unitsに到達した最初の週の行を、ハード毎に返す。
+
+        Args:
+            threshold_units: 閾値となる累計販売台数
+
+        Returns:
+            pl.DataFrame: ハード毎に到達した最初の週の行をreport_dateの順に並べたDataFrame。
+                          カラムは元のDataFrameのhwを先頭に移したもの。
+                          どのハードも到達していなければ空DataFrameを返す。
+        """
+        position = self._positions(self._hw_no, threshold_units)
+        return self._rows[position.filter(position < self._ends)].sort("report_date")
+
+    def milestones(self, step: int = DEFAULT_STEP) -> FrozenDataFrame:
+        """
+        累計販売台数がstepの倍数に到達した最初の週の一覧を返す。結果はstep毎に一度だけ計算して保持する。
+
+        Args:
+            step: 累計販売台数の刻み(例: 100000なら10万台毎)
+
+        Returns:
+            FrozenDataFrame: ハード・閾値の順に並べたDataFrame(読み取り専用)。
+                             各ハードが到達した閾値のみを含む。
+
+            DataFrameのカラム詳細:
+            - threshold_units (Int64): 閾値となる累計販売台数(stepの倍数)
+            - hw (String): ゲームハードの識別子
+            - report_date (Date): 閾値に到達した週の集計終了日
+            - delta_week (Int32): 閾値に到達した週が発売日から何週間後か
+            - index_week (Int32): 閾値に到達した週が発売から何週目か（1始まり）
+            - sum_units (Int64): 閾値に到達した週の累計販売台数
+        """
+        if step <= 0:
+            raise ValueError(f"step must be positive: {step}")
+        if step not in self._milestones:
+            thresholds = (
+                pl.DataFrame(
+                    {
+                        "hw_no": self._hw_no,
+                        "threshold_units": self._max_reach,
+                    }
+                )
+                .with_columns(
+                    pl.int_ranges(
+                        step, pl.col("threshold_units") + 1, step, dtype=pl.Int64
+                    ).alias("threshold_units")
+                )
+                .explode("threshold_units")
+                .drop_nulls("threshold_units")
+            )
+            # 各ハードが到達した閾値のみなので、すべての位置がそのハードの行を指す
+            position = self._positions(thresholds["hw_no"], thresholds["threshold_units"])
+            self._milestones[step] = freeze(
+                pl.concat(
+                    [
+                        thresholds.select("threshold_units"),
+                        self._rows.select(MILESTONE_COLUMNS)[position],
+                    ],
+                    how="horizontal",
+                )
+            )
+        return self._milestones[step]
+
+
+def get_milestone_index() -> MilestoneIndex:
+    """
+    load_hard_sales()のキャッシュから作ったMilestoneIndexを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じMilestoneIndexを返すので、
+    索引はデータのバージョン毎に一度だけ作られる。
+
+    Returns:
+        MilestoneIndex: load_hard_sales()のデータの索引
+    """
+    global _milestone_index
+
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if (
+        _milestone_index is None
+        or _milestone_index.version != version
+        or _milestone_index._df is not df
+    ):
+        _milestone_index = MilestoneIndex(df, version)
+    return _milestone_index
+
+
+def index_for(src_df: pl.DataFrame) -> MilestoneIndex | None:
+    """
+    src_dfがload_hard_sales()のキャッシュと同じデータであれば、そのMilestoneIndexを返す関数。
+
+    Args:
+        src_df: hard_sales_extractの関数に渡されたDataFrame
+
+    Returns:
+        MilestoneIndex | None: キャッシュと同じデータであればMilestoneIndex、そうでなければNone
+    """
+    if hs.frame_version(src_df, src_df.columns) is None:
+        return None
+    return get_milestone_index()
@@ -0,0 +1,114 @@
+# load_hard_sales()のデータについて、ハード毎の移動統計量(移動平均・移動合計など)を必要な分だけ計算して保持するモジュール
+
+import polars as pl
+
+from . import hard_sales as hs
+
+# columns()で計算できる統計量
+STATS = ("mean", "sum", "std", "min", "max", "ewm")
+# columns()で対象とする週数の既定値(load_hard_sales()のma4w/ma13w/ma52wと同じ)
+DEFAULT_WINDOWS = (4, 13, 52)
+
+_rolling_stats: "RollingStats | None" = None
+
+
+def column_name(value: str, stat: str, window: int) -> str:
+    """移動統計量のカラム名(例: units_mean4w)を返す"""
+    return f"{value}_{stat}{window}w"
+
+
+def _stat_expr(value: str, stat: str, window: int, by: str | None) -> pl.Expr:
+    """byの値毎にreport_dateの順に並べたvalueの移動統計量を、元の行の順に返す式"""
+    return hs._rolling_expr(value, stat, window, by).alias(column_name(value, stat, window))
+
+
+class RollingStats:
+    """
+    load_hard_sales()のDataFrameについて、byの値毎(既定はハード毎)にreport_dateの順に並べた
+    移動統計量のカラムを、要求された分だけ計算して保持するクラス。
+
+    まだ計算していない(統計量, 週数)の組み合わせは1回のselect()でまとめて計算し、
+    以降は同じカラムを返す。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+        self._columns: dict[tuple[str, str, int, str | None], pl.Series] = {}
+
+    def columns(
+        self,
+        stats: list[str],
+        windows: list[int],
+        by: str | None = "hw",
+        value: str = "units",
+    ) -> list[pl.Series]:
+        """
+        statsとwindowsのすべての組み合わせの移動統計量を、statsの順・windowsの順に返す。
+
+        Args:
+            stats: 統計量のリスト(STATSのいずれか)
+            windows: 移動統計量をとる週数のリスト
+            by: 移動統計量を区切るカラム。Noneの場合はDataFrame全体をreport_dateの順に並べる
+            value: 移動統計量をとるカラム
+
+        Returns:
+            list[pl.Series]: 元のDataFrameの行の順に並べた移動統計量のSeries。
+                             名前はcolumn_name()で、週数に満たない行はnull
+        """
+        for stat in stats:
+            if stat not in STATS:
+                raise ValueError(f"unknown stat: {stat} (expected one of {STATS})")
+        for window in windows:
+            if window <= 0:
+                raise ValueError(f"window must be positive: {window}")
+
+        keys = [(value, stat, window, by) for stat in stats for window in windows]
+        missing = list(dict.fromkeys(key for key in keys if key not in self._columns))
+        if missing:
+            computed = self._df.select(_stat_expr(*key) for key in missing)
+            self._columns.update(zip(missing, computed.get_columns()))
+        return [self._columns[key] for key in keys]
+
+
+def get_rolling_stats() -> RollingStats:
+    """
+    load_hard_sales()のキャッシュに対するRollingStatsを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じRollingStatsを返すので、
+    各移動統計量はデータのバージョン毎に一度だけ計算される。
+
+    Returns:
+        RollingStats: load_hard_sales()のデータの移動統計量
+    """
+    global _rolling_stats
+
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if _rolling_stats is None or _rolling_stats.version != version or _rolling_stats._df is not df:
+        _rolling_stats = RollingStats(df, version)
+    return _rolling_stats
+
+
+def stats_for(src_df: pl.DataFrame, by: str | None, value: str) -> RollingStats | None:
+    """
+    src_dfのby, report_date, valueがload_hard_sales()のキャッシュと同じデータであれば、
+    キャッシュに対するRollingStatsを返す関数。
+
+    Args:
+        src_df: hard_sales_extractの関数に渡されたDataFrame
+        by: 移動統計量を区切るカラム
+        value: 移動統計量をとるカラム
+
+    Returns:
+        RollingStats | None: キャッシュと同じデータであればRollingStats、そうでなければNone
+    """
+    columns = ["report_date", value] if by is None else [by, "report_date", value]
+    if hs.frame_version(src_df, columns) is None:
+        return None
+    return get_rolling_stats()
@@ -0,0 +1,180 @@
+# load_hard_sales()のデータを期間×ハード/メーカー毎に集計した結果(キューブ)を保持するモジュール
+
+from datetime import date, datetime
+
+import polars as pl
+
+from . import hard_sales as hs
+from .frozen import FrozenDataFrame, freeze
+
+# 集計の粒度と、その期間を表すカラム(集計結果にはこの順で含まれる)
+PERIOD_COLUMNS = {
+    "week": ["report_date"],
+    "month": ["year", "month"],
+    "quarter": ["quarter", "fiscal_quarter", "year", "fiscal_year", "q_num", "fq_num"],
+    "fiscal_quarter": ["fiscal_quarter", "fiscal_year", "fq_num"],
+    "year": ["year"],
+    "fiscal_year": ["fiscal_year"],
+    "delta_year": ["delta_year"],
+}
+# 期間を古い順に並べるためのカラム
+PERIOD_ORDER = {
+    "week": ["report_date"],
+    "month": ["year", "month"],
+    "quarter": ["year", "q_num"],
+    "fiscal_quarter": ["fiscal_year", "fq_num"],
+    "year": ["year"],
+    "fiscal_year": ["fiscal_year"],
+    "delta_year": ["delta_year"],
+}
+# 集計のキーにできるカラム
+KEY_COLUMNS = ("hw", "maker_name")
+# 週単位の集計結果に含める期間のカラム(report_dateから決まるもの)
+_CALENDAR_COLUMNS = [
+    "year", "month", "quarter", "fiscal_quarter", "fiscal_year", "q_num", "fq_num"
+]
+# キューブの計算に使うカラム(hs.frame_version()でキャッシュと同じデータかを判定する)
+SOURCE_COLUMNS = sorted(
+    {"units", "report_date", *KEY_COLUMNS, *(c for cols in PERIOD_COLUMNS.values() for c in cols)}
+)
+
+_sales_cube: "SalesCube | None" = None
+
+
+class SalesCube:
+    """
+    load_hard_sales()のDataFrameを、期間の粒度×キー(hw/maker_name)毎に集計した結果を保持するクラス。
+
+    元のDataFrameはキー毎に一度だけ週単位に集計し、月・四半期・年などの粒度はその週単位の
+    集計結果から集計する。集計結果は粒度×キーの組み合わせ毎に、最初に必要になったときに
+    一度だけ計算して保持する。hard_sales_filterの各関数は、load_hard_sales()の戻り値が
+    渡された場合に毎回group_byする代わりにこのクラスの集計結果を切り出して使う。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+        self._weekly: dict[str, FrozenDataFrame] = {}
+        self._tables: dict[tuple[str, str], FrozenDataFrame] = {}
+
+    def _weekly_units(self, key_column: str) -> FrozenDataFrame:
+        """週毎・キー毎の販売台数(delta_year以外の期間のカラムを含む)を返す"""
+        if key_column not in self._weekly:
+            self._weekly[key_column] = freeze(
+                self._df.group_by(["report_date", *_CALENDAR_COLUMNS, key_column])
+                .agg(pl.col("units").sum())
+                .sort([key_column, "report_date"])
+            )
+        return self._weekly[key_column]
+
+    def _aggregate(
+        self, df: pl.DataFrame, granularity: str, key_column: str
+    ) -> pl.DataFrame:
+        """dfを期間毎・キー毎に集計し、キー毎の累計販売台数(sum_units)を加える"""
+        columns = [*PERIOD_COLUMNS[granularity], key_column]
+        if granularity == "week":
+            df = df.select([*columns, "units"])
+        else:
+            df = (
+                df.group_by(columns)
+                .agg(pl.col("units").sum())
+                .sort([key_column, *PERIOD_ORDER[granularity]])
+            )
+        return df.with_columns(sum_units=pl.col("units").cum_sum().over(key_column))
+
+    def table(self, granularity: str, key_column: str) -> FrozenDataFrame:
+        """
+        全期間の期間毎・キー毎の集計結果を返す。
+
+        Args:
+            granularity: 集計の粒度(PERIOD_COLUMNSのキー)
+            key_column: 集計のキー("hw" または "maker_name")
+
+        Returns:
+            FrozenDataFrame: キー・期間の順に並べた集計結果(読み取り専用)
+
+            DataFrameのカラム詳細:
+            - PERIOD_COLUMNS[granularity]のカラム: 期間
+            - hw / maker_name (String): key_columnのカラム
+            - units (Int64): 期間内の販売台数
+            - sum_units (Int64): その期間時点での累計販売台数
+        """
+        cache_key = (granularity, key_column)
+        if cache_key not in self._tables:
+            # delta_yearはハード毎に異なるので、週単位の集計を経由せずに元のDataFrameから集計する
+            source = self._df if granularity == "delta_year" else self._weekly_units(key_column)
+            self._tables[cache_key] = freeze(self._aggregate(source, granularity, key_column))
+        return self._tables[cache_key]
+
+    def sales(
+        self,
+        granularity: str,
+        key_column: str,
+        begin: datetime | date | None = None,
+        end: datetime | date | None = None,
+    ) -> pl.DataFrame:
+        """
+        begin〜endの期間毎・キー毎の販売台数と、begin以降の累計販売台数を返す。
+
+        report_dateでbegin〜endに絞り込んでから集計した場合と同じ結果になる。
+        begin, endを指定しない場合はtable()の集計結果を、指定した場合は
+        週単位の集計結果を絞り込んでから集計し直したものを返す。
+
+        Args:
+            granularity: 集計の粒度(PERIOD_COLUMNSのキー)
+            key_column: 集計のキー("hw" または "maker_name")
+            begin: 集計開始日
+            end: 集計終了日
+
+        Returns:
+            pl.DataFrame: キー・期間の順に並べた、期間のカラム・key_column・units・sum_unitsのDataFrame
+        """
+        if begin is None and end is None:
+            return self.table(granularity, key_column).select(pl.all())
+
+        source = self._df if granularity == "delta_year" else self._weekly_units(key_column)
+        condition = pl.lit(True)
+        if begin is not None:
+            condition = condition & (pl.col("report_date") >= begin)
+        if end is not None:
+            condition = condition & (pl.col("report_date") <= end)
+        return self._aggregate(source.filter(condition), granularity, key_column)
+
+
+def get_sales_cube() -> SalesCube:
+    """
+    load_hard_sales()のキャッシュから作ったSalesCubeを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じSalesCubeを返すので、
+    各粒度の集計はデータのバージョン毎に一度だけ計算される。
+
+    Returns:
+        SalesCube: load_hard_sales()のデータの集計結果
+    """
+    global _sales_cube
+
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if _sales_cube is None or _sales_cube.version != version or _sales_cube._df is not df:
+        _sales_cube = SalesCube(df, version)
+    return _sales_cube
+
+
+def cube_for(src_df: pl.DataFrame | pl.LazyFrame) -> SalesCube | None:
+    """
+    src_dfがload_hard_sales()のキャッシュと同じデータであれば、そのSalesCubeを返す関数。
+
+    Args:
+        src_df: hard_sales_filterの関数に渡されたDataFrame、またはLazyFrame
+
+    Returns:
+        SalesCube | None: キャッシュと同じデータであればSalesCube、そうでなければNone
+    """
+    if hs.frame_version(src_df, SOURCE_COLUMNS) is None:
+        return None
+    return get_sales_cube()
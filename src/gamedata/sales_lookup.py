@@ -0,0 +1,227 @@
+# load_hard_sales()のデータから、ハード×週の販売台数を引くための索引を保持するモジュール
+
+from bisect import bisect_right
+from datetime import date, datetime, time
+
+import numpy as np
+import polars as pl
+
+from . import hard_sales as hs
+from .frozen import FrozenDataFrame, freeze
+
+# 索引から返す週のカラム
+LOOKUP_COLUMNS = ["hw", "report_date", "index_week", "units", "sum_units"]
+# 1日のマイクロ秒数
+_DAY_US = 86_400_000_000
+
+_sales_lookup: "SalesLookup | None" = None
+_week_intervals: "WeekIntervals | None" = None
+
+
+def _to_datetime(value: date | datetime) -> datetime:
+    """dateは0時のdatetimeにする(Date型のカラムとdatetimeの比較と同じ扱いにするため)"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time())
+
+
+class SalesLookup:
+    """
+    load_hard_sales()のDataFrameから、ハード×週の販売台数を1件ずつ引くための索引を保持するクラス。
+
+    - (hw, index_week) から行の位置を引く辞書
+    - ハード毎にbegin_dateの順に並べた集計期間(begin_date〜end_date)の配列
+
+    を持ち、report_dateを含む週は二分探索で求める。1件あたりの検索はDataFrame全体を走査しないので、
+    レポートの文中で何度も呼び出すsales_value()/sales_values()で使う。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+        weeks = df.select([*LOOKUP_COLUMNS, "begin_date", "end_date"]).sort(["hw", "begin_date"])
+        self._weeks: FrozenDataFrame = freeze(weeks.select(LOOKUP_COLUMNS))
+
+        self._week_position: dict[tuple[str, int], int] = {}
+        self._latest_position: dict[str, int] = {}
+        self._begins: dict[str, list[datetime]] = {}
+        self._ends: dict[str, list[datetime]] = {}
+        self._offsets: dict[str, int] = {}
+        index_weeks = weeks["index_week"].to_list()
+        begins = weeks["begin_date"].to_list()
+        ends = weeks["end_date"].to_list()
+        for position, (hw, index_week) in enumerate(zip(weeks["hw"].to_list(), index_weeks)):
+            self._week_position[(hw, index_week)] = position
+            latest = self._latest_position.get(hw)
+            if latest is None or index_week > index_weeks[latest]:
+                self._latest_position[hw] = position
+            if hw not in self._offsets:
+                self._offsets[hw] = position
+                self._begins[hw] = []
+                self._ends[hw] = []
+            self._begins[hw].append(_to_datetime(begins[position]))
+            self._ends[hw].append(_to_datetime(ends[position]))
+
+    def position(
+        self,
+        hw: str,
+        report_date: date | datetime | None = None,
+        index_week: int | None = None,
+    ) -> int | None:
+        """
+        report_dateを含む週、またはindex_week週目の行の位置を返す。
+
+        Args:
+            hw: ゲームハードの識別子
+            report_date: この日付がbegin_date〜end_dateに含まれる週を探す
+            index_week: 発売からの週番号（1始まり）。負の値の場合は最新週
+
+        Returns:
+            int | None: 行の位置。該当する週がなければNone
+        """
+        if report_date is not None:
+            begins = self._begins.get(hw)
+            if begins is None:
+                return None
+            target = _to_datetime(report_date)
+            i = bisect_right(begins, target) - 1
+            if i < 0 or target > self._ends[hw][i]:
+                return None
+            return self._offsets[hw] + i
+        if index_week is not None:
+            if index_week < 0:
+                return self._latest_position.get(hw)
+            return self._week_position.get((hw, index_week))
+        return None
+
+    def rows(self, positions: list[int | None]) -> pl.DataFrame:
+        """
+        position()で求めた位置の行を、positionsの順に並べたDataFrameにして返す。
+
+        Args:
+            positions: 行の位置のリスト。Noneの行はすべてのカラムがnullになる
+
+        Returns:
+            pl.DataFrame: LOOKUP_COLUMNSのカラムを持つDataFrame
+        """
+        return self._weeks[pl.Series(positions, dtype=pl.UInt32)]
+
+
+def get_sales_lookup() -> SalesLookup:
+    """
+    load_hard_sales()のキャッシュから作ったSalesLookupを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じSalesLookupを返すので、
+    索引はデータのバージョン毎に一度だけ作られる。
+
+    Returns:
+        SalesLookup: load_hard_sales()のデータの索引
+    """
+    global _sales_lookup
+
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if _sales_lookup is None or _sales_lookup.version != version or _sales_lookup._df is not df:
+        _sales_lookup = SalesLookup(df, version)
+    return _sales_lookup
+
+
+class WeekIntervals:
+    """
+    load_hard_sales()のDataFrameの各行の集計期間(begin_date〜end_date)から、
+    多数の日付を含む週をまとめて求めるための索引を保持するクラス。
+
+    行をハード・begin_dateの順に並べ、begin_dateを「ハードの番号 × 間隔 + 日数」という
+    1本の昇順の配列にしておく。日付×ハードのすべての組み合わせについて、begin_dateが
+    日付以前の最後の週を1回のsearch_sorted()で求め、その週のend_dateが日付以降かを確かめる。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+        weeks = (
+            df.select("hw", "begin_date", "end_date")
+            .with_row_index("row")
+            .sort(["hw", "begin_date"])
+        )
+        self._hw_index = {hw: i for i, hw in enumerate(weeks["hw"].unique(maintain_order=True))}
+        hw_no = (weeks["hw"] != weeks["hw"].shift()).fill_null(True).cum_sum().to_numpy() - 1
+        begin = weeks["begin_date"].to_physical().to_numpy().astype(np.int64)
+        self._end = weeks["end_date"].to_physical().to_numpy().astype(np.int64)
+        self._base = int(begin.min()) if weeks.height > 0 else 0
+        # 同じハードの日付が次のハードの範囲に入らないよう、最後のend_date+1日まで収まる間隔にする
+        top = int(self._end.max()) if weeks.height > 0 else 0
+        self._span = top - self._base + 2
+        self._hw_no = hw_no.astype(np.int64)
+        self._keys = self._hw_no * self._span + (begin - self._base)
+        self._rows = weeks["row"].to_numpy()
+
+    def positions(
+        self, targets: pl.Series, hw: list[str] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        targetsの各日付を含む週の、元のDataFrameでの行の位置を返す。
+
+        Args:
+            targets: Date型またはDatetime型の日付のSeries(Datetime型は0時のbegin_date/end_dateと比較する)
+            hw: 対象とするハードのリスト。Noneまたは空の場合はすべてのハード
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: 該当した組み合わせの(targetsでの位置, 元のDataFrameでの行の位置)。
+                                           targetsでの位置・行の位置の順に並べる
+        """
+        if targets.dtype == pl.Date:
+            value = targets.to_physical().to_numpy().astype(np.int64)
+            day, unit = value, 1
+        else:
+            value = targets.cast(pl.Datetime("us")).to_physical().to_numpy()
+            day, unit = value // _DAY_US, _DAY_US
+        if hw:
+            hw_nos = [self._hw_index[h] for h in dict.fromkeys(hw) if h in self._hw_index]
+        else:
+            hw_nos = list(self._hw_index.values())
+
+        # 日付×ハードのすべての組み合わせについて、begin_dateが日付以前の最後の週を探す
+        target = np.repeat(np.arange(len(value), dtype=np.int64), len(hw_nos))
+        probe_hw = np.tile(np.asarray(hw_nos, dtype=np.int64), len(value))
+        offset = np.clip(day[target] - self._base, -1, self._span - 1)
+        position = np.searchsorted(self._keys, probe_hw * self._span + offset, side="right") - 1
+        found = position >= 0
+        target, probe_hw, position = target[found], probe_hw[found], position[found]
+        found = (self._hw_no[position] == probe_hw) & (value[target] <= self._end[position] * unit)
+        target, row = target[found], self._rows[position[found]]
+        order = np.lexsort((row, target))
+        return target[order], row[order]
+
+
+def intervals_for(src_df: pl.DataFrame) -> WeekIntervals | None:
+    """
+    src_dfがload_hard_sales()のキャッシュと同じデータであれば、キャッシュから作ったWeekIntervalsを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じWeekIntervalsを返す。
+
+    Args:
+        src_df: hard_sales_extractの関数に渡されたDataFrame
+
+    Returns:
+        WeekIntervals | None: キャッシュと同じデータであればWeekIntervals、そうでなければNone
+    """
+    global _week_intervals
+
+    if hs.frame_version(src_df, ["hw", "begin_date", "end_date"]) is None:
+        return None
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if _week_intervals is None or _week_intervals.version != version or _week_intervals._df is not df:
+        _week_intervals = WeekIntervals(df, version)
+    return _week_intervals
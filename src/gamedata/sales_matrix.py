@@ -0,0 +1,247 @@
+# load_hard_sales()のデータを、日付×ハード・発売からの経過週×ハードの2次元配列(行列)として保持するモジュール
+
+from datetime import date, datetime, time
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+from . import hard_info as hi
+from . import hard_sales as hs
+
+_sales_matrix: "SalesMatrix | None" = None
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """arrayを書き換えられないようにして返す(polarsのDataFrameとメモリを共有するため)"""
+    array.flags.writeable = False
+    return array
+
+
+def _scatter(
+    shape: tuple[int, int], row: np.ndarray, col: np.ndarray, values: np.ndarray, add: bool
+) -> np.ndarray:
+    """
+    (row, col)の位置にvaluesを置いた列優先の行列を返す。
+    同じ位置に複数の値がある場合、addがTrueなら合計し、Falseなら最後の値を使う
+    (長形式の集計のsum_units.last()と同じ)。
+    """
+    matrix = np.zeros(shape, dtype=np.int64, order="F")
+    if add:
+        np.add.at(matrix, (row, col), values)
+    else:
+        # 重複する位置への代入はどの値が残るか決まっていないので、位置毎に最後の要素だけを代入する
+        cell = np.ravel_multi_index((row, col), shape)
+        _, first_reversed = np.unique(cell[::-1], return_index=True)
+        last = len(cell) - 1 - first_reversed
+        matrix[row[last], col[last]] = values[last]
+    return _read_only(matrix)
+
+
+def _column(values: np.ndarray, valid: np.ndarray) -> pl.Series:
+    """行列の1列(連続したメモリ)を、コピーせずにnullを含むInt64のSeriesにする"""
+    bitmap = pa.py_buffer(np.packbits(valid, bitorder="little"))
+    array = pa.Array.from_buffers(pa.int64(), len(values), [bitmap, pa.py_buffer(values)])
+    return pl.from_arrow(array)  # type: ignore[return-value]
+
+
+class SalesMatrix:
+    """
+    load_hard_sales()のDataFrameの週販(units)と累計販売台数(sum_units)を、
+    2つの軸の列優先の2次元配列として保持するクラス。
+
+    - カレンダー軸: 行はreport_date(データにある集計日の昇順)、列はハード
+    - 発売からの経過週の軸: 行はdelta_week(データにある値の昇順)、列はハード
+
+    列のハードはHARD_ORDERの順(HARD_ORDERに無いハードは名前の順で最後)に並べる。
+    値の無い位置は0で、valid / delta_validがFalseになる。
+
+    配列は読み取り専用で、同じメモリを参照するpolarsのDataFrameを持つ。
+    calendar_view()/delta_view()はそのDataFrameの行の範囲と列を切り出すので、値をコピーしない。
+    """
+
+    def __init__(self, df: pl.DataFrame, version: int | None = None):
+        """
+        Args:
+            df: load_hard_sales()の戻り値のDataFrame
+            version: dfのhs.data_version()(キャッシュと無関係なDataFrameの場合はNone)
+        """
+        self.version = version
+        self._df = df
+
+        self.hw: list[str] = hi.sort_hard(sorted(df["hw"].unique().to_list()))
+        col = (
+            df["hw"]
+            .replace_strict({hw: i for i, hw in enumerate(self.hw)}, return_dtype=pl.Int64)
+            .to_numpy()
+        )
+        units = df["units"].to_numpy()
+        sum_units = df["sum_units"].to_numpy()
+
+        # カレンダー軸
+        days, row = np.unique(
+            df["report_date"].to_physical().to_numpy().astype(np.int32), return_inverse=True
+        )
+        shape = (len(days), len(self.hw))
+        self._days = _read_only(days)
+        self.report_date: np.ndarray = _read_only(days.astype("datetime64[D]"))
+        self.units = _scatter(shape, row, col, units, add=False)
+        self.sum_units = _scatter(shape, row, col, sum_units, add=False)
+        valid = np.zeros(shape, dtype=bool, order="F")
+        valid[row, col] = True
+        self.valid: np.ndarray = _read_only(valid)
+
+        # 発売からの経過週の軸(sales_by_delta_long()と同じく、同じ週の週販は合計する)
+        delta, row = np.unique(
+            df["delta_week"].to_numpy().astype(np.int32), return_inverse=True
+        )
+        shape = (len(delta), len(self.hw))
+        self.delta_week: np.ndarray = _read_only(delta)
+        self.delta_units = _scatter(shape, row, col, units, add=True)
+        self.delta_sum_units = _scatter(shape, row, col, sum_units, add=False)
+        delta_valid = np.zeros(shape, dtype=bool, order="F")
+        delta_valid[row, col] = True
+        self.delta_valid: np.ndarray = _read_only(delta_valid)
+
+        report_date = pl.from_arrow(
+            pa.Array.from_buffers(pa.date32(), len(days), [None, pa.py_buffer(days)])
+        ).alias("report_date")
+        delta_week = pl.from_arrow(
+            pa.Array.from_buffers(pa.int32(), len(delta), [None, pa.py_buffer(delta)])
+        ).alias("delta_week")
+        self._frames: dict[tuple[str, str], pl.DataFrame] = {}
+        for values, matrix in (("units", self.units), ("sum_units", self.sum_units)):
+            self._frames[("calendar", values)] = self._frame(report_date, matrix, self.valid)
+        for values, matrix in (("units", self.delta_units), ("sum_units", self.delta_sum_units)):
+            self._frames[("delta", values)] = self._frame(delta_week, matrix, self.delta_valid)
+
+    def _frame(self, index: pl.Series, matrix: np.ndarray, valid: np.ndarray) -> pl.DataFrame:
+        """indexと、matrixの各列をハード名のカラムにしたDataFrameを返す(値はコピーしない)"""
+        return pl.DataFrame(
+            [index, *(_column(matrix[:, j], valid[:, j]).alias(hw) for j, hw in enumerate(self.hw))]
+        )
+
+    def _view(
+        self, axis: str, values: str, hw: list[str], lo: int, hi: int, valid: np.ndarray
+    ) -> pl.DataFrame:
+        """
+        軸のlo〜hi-1行目について、hwのうち値のあるハードの列と、いずれかのハードに値のある行を返す。
+        列は範囲内で最初に値のある行の順(同じ行ならハード名の順)に並べる。
+        """
+        frame = self._frames[(axis, values)]
+        index = frame.columns[0]
+        position = {h: j for j, h in enumerate(self.hw)}
+        candidates = [position[h] for h in dict.fromkeys(hw) if h in position] if hw else list(
+            range(len(self.hw))
+        )
+        window = valid[lo:hi]
+        first = {j: np.flatnonzero(window[:, j]) for j in candidates}
+        columns = sorted(
+            (j for j in candidates if first[j].size > 0),
+            key=lambda j: (first[j][0], self.hw[j]),
+        )
+        rows = window[:, columns].any(axis=1) if columns else np.zeros(hi - lo, dtype=bool)
+        selected = np.flatnonzero(rows)
+        names = [index, *(self.hw[j] for j in columns)]
+        if selected.size == 0:
+            return frame.clear().select(index)
+        begin, end = int(selected[0]), int(selected[-1]) + 1
+        if end - begin == selected.size:
+            # 値のある行が連続していれば、行の範囲を切り出すだけでコピーしない
+            return frame.slice(lo + begin, end - begin).select(names)
+        return frame.slice(lo, hi - lo).filter(pl.Series(rows)).select(names)
+
+    def calendar_view(
+        self,
+        values: str = "units",
+        hw: list[str] = [],
+        begin: datetime | date | None = None,
+        end: datetime | date | None = None,
+    ) -> pl.DataFrame:
+        """
+        report_dateを行、ハードを列とするピボットテーブルを返す(pivot_sales()/pivot_cumulative_sales()と同じ形)。
+
+        Args:
+            values: "units"(週販)または"sum_units"(累計販売台数)
+            hw: 対象のハードのリスト。[]の場合はすべてのハード
+            begin: 集計開始日(report_date >= begin の行を対象とする)
+            end: 集計終了日(report_date <= end の行を対象とする)
+
+        Returns:
+            pl.DataFrame: report_date (Date) と各ハード (Int64) のカラムを持つDataFrame
+        """
+        lo, hi = 0, len(self._days)
+        # Date型のreport_dateはdatetimeと0時として比較されるので、日数に直して探す
+        if begin is not None:
+            day = (begin.date() if isinstance(begin, datetime) else begin).toordinal()
+            day -= date(1970, 1, 1).toordinal()
+            if isinstance(begin, datetime) and begin.time() != time():
+                day += 1
+            lo = int(np.searchsorted(self._days, day, side="left"))
+        if end is not None:
+            day = (end.date() if isinstance(end, datetime) else end).toordinal()
+            day -= date(1970, 1, 1).toordinal()
+            hi = int(np.searchsorted(self._days, day, side="right"))
+        return self._view("calendar", values, hw, lo, max(lo, hi), self.valid)
+
+    def delta_view(
+        self,
+        values: str = "units",
+        hw: list[str] = [],
+        begin: int | None = None,
+        end: int | None = None,
+    ) -> pl.DataFrame:
+        """
+        delta_weekを行、ハードを列とするピボットテーブルを返す
+        (pivot_sales_by_delta()/pivot_cumulative_sales_by_delta()のmode="week"と同じ形)。
+
+        Args:
+            values: "units"(週販)または"sum_units"(累計販売台数)
+            hw: 対象のハードのリスト。[]の場合はすべてのハード
+            begin: 経過週数の最小値(0またはNoneの場合は指定なし)
+            end: 経過週数の最大値(0またはNoneの場合は指定なし)
+
+        Returns:
+            pl.DataFrame: delta_week (Int32) と各ハード (Int64) のカラムを持つDataFrame
+        """
+        lo, hi = 0, len(self.delta_week)
+        if begin:
+            lo = int(np.searchsorted(self.delta_week, begin, side="left"))
+        if end:
+            hi = int(np.searchsorted(self.delta_week, end, side="right"))
+        return self._view("delta", values, hw, lo, max(lo, hi), self.delta_valid)
+
+
+def get_sales_matrix() -> SalesMatrix:
+    """
+    load_hard_sales()のキャッシュから作ったSalesMatrixを返す関数。
+
+    キャッシュが読み込み直される・更新される(hs.data_version()が変わる)までは同じSalesMatrixを返すので、
+    行列はデータのバージョン毎に一度だけ作られる。
+
+    Returns:
+        SalesMatrix: load_hard_sales()のデータの行列
+    """
+    global _sales_matrix
+
+    df = hs.load_hard_sales(copy=False)
+    version = hs.data_version()
+    if _sales_matrix is None or _sales_matrix.version != version or _sales_matrix._df is not df:
+        _sales_matrix = SalesMatrix(df, version)
+    return _sales_matrix
+
+
+def matrix_for(src_df: pl.DataFrame | pl.LazyFrame) -> SalesMatrix | None:
+    """
+    src_dfがload_hard_sales()のキャッシュと同じデータであれば、キャッシュから作ったSalesMatrixを返す関数。
+
+    Args:
+        src_df: hard_sales_pivotの関数に渡されたDataFrame
+
+    Returns:
+        SalesMatrix | None: キャッシュと同じデータであればSalesMatrix、そうでなければNone
+    """
+    columns = ["hw", "report_date", "units", "sum_units", "delta_week"]
+    if hs.frame_version(src_df, columns) is None:
+        return None
+    return get_sales_matrix()
@@ -1,11 +1,29 @@
 """
 共有テストフィクスチャ
 """
+import importlib.util
+import sqlite3
+from collections import OrderedDict
 from datetime import date, timedelta
+from pathlib import Path
 import pytest
 import polars as pl
 
 import gamedata.hard_sales as hs
+from gamedata import datasource as ds
+from gamedata import memo
+from gamedata import milestone as ms
+from gamedata import rolling_stats as rs
+from gamedata import sales_cube as sc
+from gamedata import sales_lookup as sl
+from gamedata import sales_matrix as sm
+
+
+@pytest.fixture(autouse=True)
+def _close_pooled_connections():
+    """テストの間でプールした接続(モックを含む)を持ち越さないようにする"""
+    yield
+    ds.close_connections()
 
 
 # ---------------------------------------------------------------------------
@@ -204,3 +222,123 @@ def sample_info_df() -> pl.DataFrame:
     return pl.DataFrame(rows).with_columns(
         pl.col("launch_date").cast(pl.Date),
     )
+
+
+# ---------------------------------------------------------------------------
+# database/ のスキーマで作成した SQLite データベース
+# ---------------------------------------------------------------------------
+
+DATABASE_DIR = Path(__file__).resolve().parent.parent / "database"
+
+
+def _load_refresh_analysis():
+    spec = importlib.util.spec_from_file_location(
+        "refresh_analysis", DATABASE_DIR / "update" / "refresh_analysis.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def insert_weekly_rows(db_path: str, rows: list[tuple[str, str, int]]) -> None:
+    """(hw, report_date, units) の行を gamehard_weekly に追加し、分析テーブルと gamehard_sales を再構築する"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT OR REPLACE INTO gamehard_weekly (id, report_date, period_date, hw, units)"
+        " VALUES (?, ?, 7, ?, ?)",
+        [(f"{rd}_{hw}", rd, hw, units) for hw, rd, units in rows],
+    )
+    conn.commit()
+    conn.close()
+    _load_refresh_analysis().insert_weekly_analysis(db_path, debug_mode=False)
+
+
+@pytest.fixture
+def gamehard_db(tmp_path) -> str:
+    """create_tables.sql / update_tables.sql で作成し、NSW・PS5の週販を投入したDBのパス"""
+    db_path = str(tmp_path / "gamehard.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript((DATABASE_DIR / "create_tables.sql").read_text(encoding="utf-8"))
+    conn.executescript((DATABASE_DIR / "update_tables.sql").read_text(encoding="utf-8"))
+    conn.executemany(
+        "INSERT INTO gamehard_info VALUES (?, ?, ?, ?)",
+        [
+            ("NSW", NSW_LAUNCH.isoformat(), "Nintendo", "Nintendo Switch"),
+            ("PS5", PS5_LAUNCH.isoformat(), "SONY", "PlayStation5"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    rows = []
+    first_sunday = date(2019, 6, 2)
+    for i in range(80):
+        report_date = (first_sunday + timedelta(weeks=i)).isoformat()
+        rows.append(("NSW", report_date, 20000 + (i * 733) % 9000))
+    for i in range(20):
+        report_date = (SUNDAY_2020_11_15 + timedelta(weeks=i)).isoformat()
+        rows.append(("PS5", report_date, 15000 - i * 300))
+    insert_weekly_rows(db_path, rows)
+    return db_path
+
+
+# ---------------------------------------------------------------------------
+# hard_sales と、そのキャッシュから計算した結果を保持するモジュールのキャッシュ
+# ---------------------------------------------------------------------------
+
+# reset_caches()でNoneにするグローバル変数
+_CACHE_GLOBALS = [
+    (hs, "_hard_sales_cache"),
+    (hs, "_hard_sales_compact_cache"),
+    (hs, "_hard_sales_watermark"),
+    (hs, "_hard_sales_info"),
+    (hs, "_all_hw_list"),
+    (hs, "_all_maker_list"),
+    (hs, "_latest_state_cache"),
+    (hs, "_latest_state_version"),
+    (sc, "_sales_cube"),
+    (ms, "_milestone_index"),
+    (sl, "_sales_lookup"),
+    (sl, "_week_intervals"),
+    (rs, "_rolling_stats"),
+    (sm, "_sales_matrix"),
+]
+# fresh_cachesの終了時に元の値に戻すグローバル変数(_CACHE_GLOBALS以外)
+_SAVED_GLOBALS = [
+    (hs, "_cache_buffers"),
+    (hs, "_snapshot_enabled"),
+    (memo, "_memo_enabled"),
+    (memo, "_maxsize"),
+    (memo, "_entries"),
+    (memo, "_hits"),
+    (memo, "_misses"),
+]
+
+
+def reset_caches() -> None:
+    """hard_salesと、そのキャッシュから計算した結果を保持するモジュールのキャッシュを空にする"""
+    for module, name in _CACHE_GLOBALS:
+        setattr(module, name, None)
+    hs._cache_buffers = {}
+    memo._entries = OrderedDict()
+    memo._hits = 0
+    memo._misses = 0
+
+
+@pytest.fixture
+def fresh_caches(monkeypatch):
+    """
+    キャッシュを空にしてテストを実行し、終了時にキャッシュ・スナップショットとメモ化の設定を元に戻す。
+    テストの途中でキャッシュを空にする(別のプロセスで読み込み直す)場合は、reset_caches()を呼び出す。
+    """
+    for module, name in _CACHE_GLOBALS + _SAVED_GLOBALS:
+        monkeypatch.setattr(module, name, getattr(module, name))
+    reset_caches()
+
+
+@pytest.fixture
+def hard_sales_db(gamehard_db, fresh_caches, monkeypatch) -> str:
+    """gamehard_dbを読み込み先にし、スナップショットを使わずにキャッシュを空の状態から読み込む"""
+    monkeypatch.setattr(ds, "DB_PATH", gamehard_db)
+    hs.enable_snapshot(False)
+    return gamehard_db
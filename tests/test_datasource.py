@@ -0,0 +1,193 @@
+"""
+gamedata.datasource モジュールのテスト
+"""
+import sqlite3
+from datetime import date
+
+import polars as pl
+import pytest
+
+from gamedata import datasource as ds
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE sales (id TEXT, report_date TEXT, hw TEXT, units INTEGER, adjust INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO sales VALUES (?, ?, ?, ?, ?)",
+        [
+            ("2020-01-05_NSW", "2020-01-05", "NSW", 30000, None),
+            ("2020-01-12_NSW", "2020-01-12", "NSW", 25000, 100),
+            ("2020-01-05_PS4", "2020-01-05", "PS4", 5000, 0),
+            ("2020-01-12_PS4", "2020-01-12", "PS4", 4000, None),
+        ],
+    )
+    yield conn
+    conn.close()
+
+
+SCHEMA = {
+    "id": pl.Utf8,
+    "report_date": pl.Date,
+    "hw": pl.Utf8,
+    "units": pl.Int32,
+    "adjust": pl.Int64,
+}
+
+
+class TestReadSql:
+    def test_applies_schema(self, conn):
+        result = ds.read_sql("SELECT * FROM sales ORDER BY id;", conn, schema=SCHEMA)
+        assert result.schema == pl.Schema(SCHEMA)
+        assert result["report_date"][0] == date(2020, 1, 5)
+
+    def test_keeps_query_order_and_nulls(self, conn):
+        result = ds.read_sql("SELECT * FROM sales ORDER BY id DESC", conn, schema=SCHEMA)
+        assert result["id"].to_list() == [
+            "2020-01-12_PS4",
+            "2020-01-12_NSW",
+            "2020-01-05_PS4",
+            "2020-01-05_NSW",
+        ]
+        assert result["adjust"].to_list() == [None, 100, 0, None]
+
+    def test_infers_columns_without_schema(self, conn):
+        result = ds.read_sql("SELECT hw, units FROM sales ORDER BY id", conn)
+        assert result.schema["hw"] == pl.Utf8
+        assert result.schema["units"].is_integer()
+        assert result["units"].to_list() == [30000, 5000, 25000, 4000]
+
+    def test_params(self, conn):
+        result = ds.read_sql(
+            "SELECT * FROM sales WHERE hw = ? AND report_date >= ? ORDER BY id",
+            conn,
+            ["NSW", "2020-01-12"],
+            schema=SCHEMA,
+        )
+        assert result["id"].to_list() == ["2020-01-12_NSW"]
+
+    def test_empty_result_keeps_columns_and_types(self, conn):
+        result = ds.read_sql("SELECT * FROM sales WHERE hw = 'XSX'", conn, schema=SCHEMA)
+        assert result.height == 0
+        assert result.schema == pl.Schema(SCHEMA)
+
+    def test_quotes_and_unicode_in_text(self, conn):
+        conn.execute(
+            "INSERT INTO sales VALUES ('x', '2020-01-19', 'He said \"ゲーム\"', 1, 0)"
+        )
+        result = ds.read_sql("SELECT hw FROM sales WHERE id = 'x'", conn)
+        assert result["hw"][0] == 'He said "ゲーム"'
+
+    def test_order_by_uses_row_reader(self, conn, monkeypatch):
+        calls = []
+        read_rows = ds._read_rows
+        monkeypatch.setattr(
+            ds, "_read_rows", lambda *args: calls.append(args[0]) or read_rows(*args)
+        )
+        ds.read_sql("SELECT * FROM sales order  by id DESC", conn, schema=SCHEMA)
+        ds.read_sql("SELECT * FROM sales", conn, schema=SCHEMA)
+        assert calls == ["SELECT * FROM sales order  by id DESC"]
+
+    def test_real_values_are_exact(self, conn):
+        values = [0.1 + 0.2, 1 / 3, 12345.678901234567]
+        conn.execute("CREATE TABLE ratio (value REAL)")
+        conn.executemany("INSERT INTO ratio VALUES (?)", [(v,) for v in values])
+        result = ds.read_sql("SELECT value FROM ratio", conn, schema={"value": pl.Float64})
+        assert result["value"].to_list() == values
+
+    def test_row_reader_matches(self, conn):
+        query = "SELECT * FROM sales ORDER BY id"
+        expected = ds.read_sql(query, conn, schema=SCHEMA)
+        assert ds._read_rows(query, conn, (), SCHEMA).equals(expected)
+
+    def test_row_reader_empty_result(self, conn):
+        result = ds._read_rows("SELECT * FROM sales WHERE hw = 'XSX'", conn, (), SCHEMA)
+        assert result.height == 0
+        assert result.schema == pl.Schema(SCHEMA)
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    db_path = tmp_path / "gamehard.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE gamehard_info (id TEXT, launch_date TEXT)")
+    conn.execute("INSERT INTO gamehard_info VALUES ('NSW', '2017-03-03')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(ds, "DB_PATH", str(db_path))
+    yield db_path
+    ds.close_connections()
+
+
+class TestConnect:
+    def test_reuses_pooled_connection(self, db_file):
+        with ds.connect() as first:
+            pass
+        with ds.connect() as second:
+            pass
+        assert first is second
+
+    def test_connection_is_read_only(self, db_file):
+        with ds.connect() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO gamehard_info VALUES ('PS5', '2020-11-12')")
+
+    def test_sees_rows_written_by_other_connection(self, db_file):
+        with ds.connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM gamehard_info").fetchone()[0] == 1
+        writer = sqlite3.connect(db_file)
+        writer.execute("INSERT INTO gamehard_info VALUES ('PS5', '2020-11-12')")
+        writer.commit()
+        writer.close()
+        with ds.connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM gamehard_info").fetchone()[0] == 2
+
+    def test_set_db_path_switches_database(self, db_file, tmp_path):
+        other = tmp_path / "other.db"
+        conn = sqlite3.connect(other)
+        conn.execute("CREATE TABLE gamehard_info (id TEXT, launch_date TEXT)")
+        conn.commit()
+        conn.close()
+        with ds.connect() as first:
+            pass
+        ds.set_db_path(str(other))
+        assert ds.get_db_path() == str(other)
+        with ds.connect() as second:
+            assert second.execute("SELECT COUNT(*) FROM gamehard_info").fetchone()[0] == 0
+        assert first is not second
+
+    def test_replaced_file_opens_new_connection(self, db_file, tmp_path):
+        with ds.connect() as first:
+            pass
+        replacement = tmp_path / "new.db"
+        conn = sqlite3.connect(replacement)
+        conn.execute("CREATE TABLE gamehard_info (id TEXT, launch_date TEXT)")
+        conn.commit()
+        conn.close()
+        replacement.replace(db_file)
+        with ds.connect() as second:
+            assert second.execute("SELECT COUNT(*) FROM gamehard_info").fetchone()[0] == 0
+        assert first is not second
+
+    def test_error_in_block_discards_connection(self, db_file):
+        with pytest.raises(sqlite3.OperationalError):
+            with ds.connect() as first:
+                first.execute("SELECT * FROM missing_table")
+        with ds.connect() as second:
+            pass
+        assert first is not second
+
+    def test_concurrent_readers(self, db_file):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def read(_):
+            with ds.connect() as conn:
+                return ds.read_sql("SELECT * FROM gamehard_info", conn).height
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(read, range(32)))
+        assert results == [1] * 32
+        assert len(ds._pool) <= ds.POOL_SIZE
@@ -0,0 +1,93 @@
+"""
+gamedata.frozen モジュールのテスト
+"""
+import polars as pl
+import pytest
+
+from gamedata.frozen import FrozenDataFrame, freeze
+
+
+@pytest.fixture
+def frozen_df():
+    return freeze(pl.DataFrame({"hw": ["NSW", "PS5", "XSX"], "units": [100, 200, 300]}))
+
+
+class TestFreeze:
+    def test_returns_frozen_dataframe(self, frozen_df):
+        assert isinstance(frozen_df, FrozenDataFrame)
+        assert isinstance(frozen_df, pl.DataFrame)
+
+    def test_keeps_data(self):
+        df = pl.DataFrame({"hw": ["NSW", "PS5"], "units": [100, 200]})
+        assert freeze(df).equals(df)
+
+    def test_frozen_input_is_returned_as_is(self, frozen_df):
+        assert freeze(frozen_df) is frozen_df
+
+    def test_shares_column_buffers(self):
+        df = pl.DataFrame({"units": [100, 200, 300]})
+        frozen = freeze(df)
+        assert (
+            frozen["units"]._get_buffer_info()[0] == df["units"]._get_buffer_info()[0]
+        )
+
+
+class TestFrozenDataFrameReadOnly:
+    def test_setitem_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df[0, "units"] = 999
+
+    def test_insert_column_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.insert_column(0, pl.Series("x", [1, 2, 3]))
+
+    def test_replace_column_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.replace_column(1, pl.Series("units", [1, 2, 3]))
+
+    def test_drop_in_place_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.drop_in_place("units")
+
+    def test_extend_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.extend(frozen_df.clone())
+
+    def test_rename_columns_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.columns = ["a", "b"]
+
+    def test_in_place_stack_raises(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df.vstack(frozen_df.clone(), in_place=True)
+        with pytest.raises(TypeError):
+            frozen_df.hstack([pl.Series("x", [1, 2, 3])], in_place=True)
+
+    def test_data_is_unchanged_after_failed_mutation(self, frozen_df):
+        with pytest.raises(TypeError):
+            frozen_df[0, "units"] = 999
+        assert frozen_df["units"].to_list() == [100, 200, 300]
+        assert frozen_df.columns == ["hw", "units"]
+
+
+class TestFrozenDataFrameDerived:
+    def test_filter_returns_plain_dataframe(self, frozen_df):
+        result = frozen_df.filter(pl.col("units") > 100)
+        assert type(result) is pl.DataFrame
+        assert result.height == 2
+
+    def test_with_columns_returns_plain_dataframe(self, frozen_df):
+        result = frozen_df.with_columns(pl.col("units") * 2)
+        assert type(result) is pl.DataFrame
+        assert result["units"].to_list() == [200, 400, 600]
+
+    def test_clone_is_mutable(self, frozen_df):
+        copied = frozen_df.clone()
+        assert type(copied) is pl.DataFrame
+        copied[0, "units"] = 999
+        assert copied["units"][0] == 999
+        assert frozen_df["units"][0] == 100
+
+    def test_stack_without_in_place_is_allowed(self, frozen_df):
+        assert frozen_df.vstack(frozen_df).height == 6
+        assert frozen_df.hstack([pl.Series("x", [1, 2, 3])]).width == 3
@@ -139,7 +139,7 @@ class TestLoadHardInfo:
     def _make_mock_df(self):
         return pl.DataFrame({
             "id": ["NSW", "PS5"],
-            "launch_date": ["2017-03-03", "2020-11-12"],
+            "launch_date": [date(2017, 3, 3), date(2020, 11, 12)],
             "maker_name": ["Nintendo", "SONY"],
             "full_name": ["Nintendo Switch", "PlayStation5"],
         })
@@ -150,7 +150,7 @@ class TestLoadHardInfo:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=mock_df):
+            with patch("gamedata.datasource.read_sql", return_value=mock_df):
                 result = hi.load_hard_info()
         assert isinstance(result, pl.DataFrame)
 
@@ -160,6 +160,7 @@ class TestLoadHardInfo:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=mock_df):
+            with patch("gamedata.datasource.read_sql", return_value=mock_df) as mock_read:
                 result = hi.load_hard_info()
+        assert mock_read.call_args.kwargs["schema"]["launch_date"] == pl.Date
         assert result["launch_date"].dtype == pl.Date
@@ -1,23 +1,16 @@
 """
 gamedata.hard_sales モジュールのテスト
 """
-from datetime import date, datetime
+import sqlite3
+from datetime import date, datetime, timedelta
 from unittest.mock import patch, MagicMock
 import polars as pl
 import pytest
 
 import gamedata.hard_sales as hs
-
-
-# ---------------------------------------------------------------------------
-# テスト用ヘルパー
-# ---------------------------------------------------------------------------
-
-def _reset_globals():
-    """モジュールレベルのキャッシュをリセットする"""
-    hs._hard_sales_cache = None
-    hs._all_hw_list = None
-    hs._all_maker_list = None
+from gamedata import datasource as ds
+from conftest import _load_refresh_analysis, insert_weekly_rows, reset_caches
+from gamedata.frozen import FrozenDataFrame
 
 
 # ---------------------------------------------------------------------------
@@ -165,13 +158,8 @@ class TestDerivedColumns:
 
 
 
+@pytest.mark.usefixtures("fresh_caches")
 class TestLoadHardSales:
-    def setup_method(self):
-        _reset_globals()
-
-    def teardown_method(self):
-        _reset_globals()
-
     def _make_raw_df(self):
         return pl.DataFrame({
             "weekly_id": ["NSW-0001"],
@@ -202,7 +190,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert isinstance(result, pl.DataFrame)
 
@@ -211,7 +199,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert result["report_date"].dtype == pl.Date
         assert result["begin_date"].dtype == pl.Date
@@ -222,7 +210,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert "quarter" in result.columns
         assert result["quarter"][0] == "2020Q1"
@@ -232,7 +220,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert result["index_week"][0] == 22
         assert result["index_month"][0] == 11
@@ -259,7 +247,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert result["fiscal_year"][0] == 2021
         assert result["fq_num"][0] == 1
@@ -277,7 +265,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert result["fiscal_year"][0] == 2021
         assert result["fq_num"][0] == 1
@@ -295,7 +283,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw):
+            with patch("gamedata.datasource.read_sql", return_value=raw):
                 result = hs.load_hard_sales()
         assert result["fiscal_year"][0] == 2020
         assert result["fq_num"][0] == 4
@@ -306,7 +294,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", return_value=raw) as mock_read:
+            with patch("gamedata.datasource.read_sql", return_value=raw) as mock_read:
                 result1 = hs.load_hard_sales()
                 result2 = hs.load_hard_sales()
         assert mock_read.call_count == 1
@@ -324,7 +312,7 @@ class TestLoadHardSales:
         with patch("sqlite3.connect") as mock_connect:
             mock_conn = MagicMock()
             mock_connect.return_value = mock_conn
-            with patch("polars.read_database", side_effect=[raw1, raw2]) as mock_read:
+            with patch("gamedata.datasource.read_sql", side_effect=[raw1, raw2]) as mock_read:
                 first = hs.load_hard_sales()
                 refreshed = hs.load_hard_sales(no_cache=True)
                 cached = hs.load_hard_sales()
@@ -333,18 +321,525 @@ class TestLoadHardSales:
         assert refreshed["units"][0] == 20000
         assert cached["units"][0] == 20000
 
+    def test_copy_false_shares_read_only_cache(self):
+        raw = self._make_raw_df()
+        with patch("sqlite3.connect") as mock_connect:
+            mock_conn = MagicMock()
+            mock_connect.return_value = mock_conn
+            with patch("gamedata.datasource.read_sql", return_value=raw):
+                shared1 = hs.load_hard_sales(copy=False)
+                shared2 = hs.load_hard_sales(copy=False)
+        assert shared1 is shared2
+        assert isinstance(shared1, FrozenDataFrame)
+        with pytest.raises(TypeError):
+            shared1[0, "units"] = 0
+
+    def test_default_copy_is_mutable_and_does_not_touch_cache(self):
+        raw = self._make_raw_df()
+        with patch("sqlite3.connect") as mock_connect:
+            mock_conn = MagicMock()
+            mock_connect.return_value = mock_conn
+            with patch("gamedata.datasource.read_sql", return_value=raw):
+                private = hs.load_hard_sales()
+        assert not isinstance(private, FrozenDataFrame)
+        private[0, "units"] = 0
+        assert hs.load_hard_sales(copy=False)["units"][0] == 10000
+
+
+@pytest.mark.usefixtures("fresh_caches")
+class TestLoadHardSalesLazy:
+    def test_returns_lazyframe_of_cached_data(self, sample_sales_df):
+        hs._hard_sales_cache = sample_sales_df
+        result = hs.load_hard_sales_lazy()
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect().equals(sample_sales_df)
+
+    def test_loads_when_cache_is_empty(self, sample_sales_df):
+        def fake_load(no_cache=False, copy=True):
+            hs._hard_sales_cache = sample_sales_df
+            return sample_sales_df
+
+        with patch.object(hs, "load_hard_sales", side_effect=fake_load) as mock_load:
+            result = hs.load_hard_sales_lazy()
+        assert mock_load.call_count == 1
+        assert result.collect().height == sample_sales_df.height
+
 
 # ---------------------------------------------------------------------------
-# get_hw_all (DB モック + グローバル変数リセット)
+# compact_hard_sales / expand_hard_sales
 # ---------------------------------------------------------------------------
 
-class TestGetHwAll:
-    def setup_method(self):
-        _reset_globals()
+@pytest.mark.usefixtures("fresh_caches")
+class TestCompactHardSales:
+    def test_name_columns_are_enum_in_order(self, sample_sales_df):
+        result = hs.compact_hard_sales(sample_sales_df)
+        assert isinstance(result.schema["hw"], pl.Enum)
+        assert isinstance(result.schema["maker_name"], pl.Enum)
+        assert isinstance(result.schema["full_name"], pl.Enum)
+        assert result.sort("hw")["hw"].unique(maintain_order=True).to_list() == [
+            "NSW",
+            "PS5",
+            "XSX",
+        ]
+
+    def test_unknown_hw_is_appended_to_categories(self, sample_sales_df):
+        df = sample_sales_df.with_columns(
+            pl.when(pl.col("hw") == "XSX").then(pl.lit("ZZZ")).otherwise("hw").alias("hw")
+        )
+        categories = hs.compact_hard_sales(df).schema["hw"].categories.to_list()
+        assert categories[-1] == "ZZZ"
+        assert categories.index("NSW") < categories.index("PS5")
+
+    def test_quarter_is_integer_coded(self, sample_sales_df):
+        result = hs.compact_hard_sales(sample_sales_df)
+        row = sample_sales_df.row(0, named=True)
+        assert result.schema["quarter"] == pl.Int16
+        assert result["quarter"][0] == int(row["quarter"].replace("Q", ""))
+        assert result["fiscal_quarter"][0] == int(row["fiscal_quarter"].replace("FQ", ""))
+
+    def test_redundant_columns_are_dropped(self, sample_sales_df):
+        result = hs.compact_hard_sales(sample_sales_df)
+        for col in ["end_date", "index_week", "index_month", "index_year"]:
+            assert col not in result.columns
+        assert result.estimated_size() < sample_sales_df.estimated_size()
+
+    def test_expand_restores_original(self, sample_sales_df):
+        result = hs.expand_hard_sales(hs.compact_hard_sales(sample_sales_df))
+        assert result.equals(sample_sales_df)
+        assert result.schema == sample_sales_df.schema
+
+    def test_partial_columns(self, sample_sales_df):
+        df = sample_sales_df.select("hw", "report_date", "units")
+        result = hs.compact_hard_sales(df)
+        assert result.columns == ["hw", "report_date", "units"]
+        assert hs.expand_hard_sales(result).equals(df)
+
+    def test_load_hard_sales_compact_is_cached(self, sample_sales_df):
+        hs._hard_sales_cache = sample_sales_df
+        first = hs.load_hard_sales(copy=False, compact=True)
+        second = hs.load_hard_sales(copy=False, compact=True)
+        assert first is second
+        assert isinstance(first.schema["hw"], pl.Enum)
+        assert hs.expand_hard_sales(first).equals(sample_sales_df)
+
+
+# ---------------------------------------------------------------------------
+# load_hard_sales のディスクスナップショット
+# ---------------------------------------------------------------------------
+
+@pytest.mark.usefixtures("fresh_caches")
+class TestHardSalesSnapshot:
+    @pytest.fixture
+    def db_file(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "gamehard.db"
+        db_path.write_bytes(b"dummy")
+        monkeypatch.setattr(ds, "DB_PATH", str(db_path))
+        monkeypatch.setattr(hs, "SNAPSHOT_DIR", str(tmp_path / "cache"))
+        return db_path
+
+    def _load(self, raw):
+        with patch("sqlite3.connect") as mock_connect:
+            mock_connect.return_value = MagicMock()
+            with patch("gamedata.datasource.read_sql", return_value=raw) as mock_read:
+                result = hs.load_hard_sales()
+        return result, mock_read.call_count
+
+    def test_writes_snapshot_on_first_load(self, db_file, tmp_path):
+        self._load(TestLoadHardSales()._make_raw_df())
+        snapshots = list((tmp_path / "cache").glob("hard_sales_*.arrow"))
+        assert len(snapshots) == 1
+
+    def test_reloads_from_snapshot_without_query(self, db_file):
+        raw = TestLoadHardSales()._make_raw_df()
+        first, _ = self._load(raw)
+        reset_caches()
+        second, read_count = self._load(raw)
+        assert read_count == 0
+        assert first.equals(second)
+        assert first.schema == second.schema
+
+    def test_db_change_invalidates_snapshot(self, db_file, tmp_path):
+        raw = TestLoadHardSales()._make_raw_df()
+        self._load(raw)
+        reset_caches()
+        db_file.write_bytes(b"dummy-updated")
+        _, read_count = self._load(raw)
+        assert read_count == 1
+        snapshots = list((tmp_path / "cache").glob("hard_sales_*.arrow"))
+        assert len(snapshots) == 1
+
+    def test_other_db_keeps_snapshot(self, db_file, tmp_path, monkeypatch):
+        raw = TestLoadHardSales()._make_raw_df()
+        self._load(raw)
+        other_db = tmp_path / "other.db"
+        other_db.write_bytes(b"other")
+        monkeypatch.setattr(ds, "DB_PATH", str(other_db))
+        reset_caches()
+        self._load(raw)
+        monkeypatch.setattr(ds, "DB_PATH", str(db_file))
+        reset_caches()
+        _, read_count = self._load(raw)
+        assert read_count == 0
+        snapshots = list((tmp_path / "cache").glob("hard_sales_*.arrow"))
+        assert len(snapshots) == 2
+
+    def test_disabled_snapshot_always_queries(self, db_file, tmp_path):
+        raw = TestLoadHardSales()._make_raw_df()
+        hs.enable_snapshot(False)
+        self._load(raw)
+        reset_caches()
+        _, read_count = self._load(raw)
+        assert read_count == 1
+        assert not (tmp_path / "cache").exists()
+
+    def test_missing_db_file_has_no_fingerprint(self, tmp_path):
+        assert hs._db_fingerprint(str(tmp_path / "missing.db")) is None
+
+
+# ---------------------------------------------------------------------------
+# refresh_hard_sales (SQLite データベース)
+# ---------------------------------------------------------------------------
+
+@pytest.mark.usefixtures("hard_sales_db")
+class TestRefreshHardSales:
+    @pytest.fixture(autouse=True, params=["stored", "derived"])
+    def derived_schema(self, request, monkeypatch):
+        if request.param == "derived":
+            # DBに保存された派生カラムを使わず、読み込み時に計算する(古いDBと同じ)
+            monkeypatch.setattr(hs, "DERIVED_SCHEMA_VERSION", -1)
+
+    def _full_reload(self):
+        return hs.load_hard_sales(no_cache=True)
+
+    def test_without_cache_loads_everything(self):
+        result = hs.refresh_hard_sales()
+        assert result.height == 100
+
+    def test_no_changes_returns_same_data(self):
+        before = hs.load_hard_sales()
+        after = hs.refresh_hard_sales()
+        assert after.equals(before)
+
+    def test_no_rows_after_watermark_skips_query(self):
+        hs.load_hard_sales()
+        hs._hard_sales_watermark = "9999-12-31 00:00:00"
+        with patch("gamedata.datasource.read_sql") as mock_read:
+            hs.refresh_hard_sales()
+        assert mock_read.call_count == 0
+
+    def test_new_week_matches_full_reload(self, gamehard_db):
+        hs.load_hard_sales()
+        insert_weekly_rows(
+            gamehard_db,
+            [("NSW", "2020-12-13", 45000), ("PS5", "2021-04-04", 9000)],
+        )
+        refreshed = hs.refresh_hard_sales()
+        assert refreshed.height == 102
+        assert refreshed.equals(self._full_reload())
+
+    def test_corrected_past_week_updates_following_rows(self, gamehard_db):
+        hs.load_hard_sales()
+        insert_weekly_rows(gamehard_db, [("NSW", "2020-03-01", 99999)])
+        refreshed = hs.refresh_hard_sales()
+        expected = self._full_reload()
+        assert refreshed.equals(expected)
+        assert refreshed["sum_units"].max() == expected["sum_units"].max()
+
+    def test_refresh_before_rebuild_does_not_skip_rows(self, gamehard_db):
+        def execute(sql):
+            conn = sqlite3.connect(gamehard_db)
+            conn.execute(sql)
+            conn.commit()
+            conn.close()
+
+        execute("UPDATE gamehard_weekly SET update_at = '2000-01-01 00:00:00'")
+        rebuild = _load_refresh_analysis().insert_weekly_analysis
+        rebuild(gamehard_db, debug_mode=False)
+        hs.load_hard_sales()
+        execute(
+            "UPDATE gamehard_weekly SET units = 99999, update_at = '2000-01-02 00:00:00'"
+            " WHERE id = '2020-03-01_NSW'"
+        )
+        execute(
+            "UPDATE gamehard_weekly SET units = 9000, update_at = '2000-01-03 00:00:00'"
+            " WHERE id = '2021-01-03_PS5'"
+        )
+        # gamehard_weeklyは更新済みだが、gamehard_salesはまだ再構築されていない
+        assert hs.refresh_hard_sales().equals(self._full_reload())
+        rebuild(gamehard_db, debug_mode=False)
+        refreshed = hs.refresh_hard_sales()
+        assert refreshed.equals(self._full_reload())
+        assert 99999 in refreshed.filter(pl.col("hw") == "NSW")["units"].to_list()
+
+    def test_hard_info_edit_reloads_everything(self, gamehard_db):
+        rebuild = _load_refresh_analysis().insert_weekly_analysis
+        conn = sqlite3.connect(gamehard_db)
+        # update_atを古くして、再構築したPS5の行がupdate_atでは変更として見えないようにする
+        conn.execute("UPDATE gamehard_weekly SET update_at = '2000-01-01 00:00:00'")
+        conn.execute(
+            "UPDATE gamehard_weekly SET update_at = '2000-01-02 00:00:00'"
+            " WHERE id = '2020-03-01_NSW'"
+        )
+        conn.commit()
+        rebuild(gamehard_db, debug_mode=False)
+        hs.load_hard_sales()
+        conn.execute(
+            "UPDATE gamehard_info SET launch_date = '2020-11-08', maker_name = 'SIE'"
+            " WHERE id = 'PS5'"
+        )
+        conn.commit()
+        conn.close()
+        # gamehard_salesを再構築するまでは、hard_salesの値は変わらない
+        before = hs.refresh_hard_sales()
+        assert before.filter(pl.col("hw") == "PS5")["maker_name"].unique().to_list() == ["SONY"]
+        rebuild(gamehard_db, debug_mode=False)
+        refreshed = hs.refresh_hard_sales()
+        assert refreshed.equals(self._full_reload())
+        assert refreshed.filter(pl.col("hw") == "PS5")["maker_name"].unique().to_list() == ["SIE"]
+
+    def test_new_hw_does_not_reload_everything(self, gamehard_db):
+        hs.load_hard_sales()
+        conn = sqlite3.connect(gamehard_db)
+        conn.execute(
+            "INSERT INTO gamehard_info VALUES ('XSX', '2020-11-10', 'Microsoft', 'Xbox Series X')"
+        )
+        conn.commit()
+        conn.close()
+        insert_weekly_rows(gamehard_db, [("XSX", "2020-11-15", 8000)])
+        with patch.object(hs, "load_hard_sales", wraps=hs.load_hard_sales) as mock_load:
+            refreshed = hs.refresh_hard_sales()
+        mock_load.assert_not_called()
+        assert refreshed.equals(self._full_reload())
+
+    def test_refresh_resets_hw_list_cache(self, gamehard_db):
+        hs.load_hard_sales()
+        hs._all_hw_list = ["NSW"]
+        insert_weekly_rows(gamehard_db, [("NSW", "2020-12-13", 45000)])
+        hs.refresh_hard_sales()
+        assert hs._all_hw_list is None
+
+
+# ---------------------------------------------------------------------------
+# load_hard_sales の hw / begin / end / columns 指定 (SQLite データベース)
+# ---------------------------------------------------------------------------
 
-    def teardown_method(self):
-        _reset_globals()
+@pytest.mark.usefixtures("hard_sales_db")
+class TestLoadHardSalesRange:
+    @pytest.fixture(autouse=True, params=["stored", "derived"])
+    def derived_schema(self, request, monkeypatch):
+        if request.param == "derived":
+            # DBに保存された派生カラムを使わず、読み込み時に計算する(古いDBと同じ)
+            monkeypatch.setattr(hs, "DERIVED_SCHEMA_VERSION", -1)
+
+    def _expected(self, hw=None, begin=None, end=None):
+        df = hs.load_hard_sales(no_cache=True)
+        reset_caches()
+        if hw is not None:
+            df = df.filter(pl.col("hw").is_in(hw))
+        if begin is not None:
+            df = df.filter(pl.col("report_date") >= begin)
+        if end is not None:
+            df = df.filter(pl.col("report_date") <= end)
+        return df
+
+    def test_hw_and_begin_match_full_load(self):
+        expected = self._expected(hw=["NSW"], begin=date(2020, 9, 1))
+        result = hs.load_hard_sales(hw=["NSW"], begin=date(2020, 9, 1))
+        assert result.height > 0
+        assert result["ma52w"].null_count() == 0
+        assert result.equals(expected)
+
+    def test_begin_in_middle_of_year_keeps_yearly_sum(self):
+        expected = self._expected(hw=["NSW", "PS5"], begin=date(2020, 12, 1))
+        result = hs.load_hard_sales(hw=["NSW", "PS5"], begin=datetime(2020, 12, 1))
+        assert result.equals(expected)
+
+    def test_datetime_range_with_time(self):
+        begin, end = datetime(2021, 1, 3, 12), datetime(2021, 1, 31, 12)
+        expected = self._expected(hw=["PS5"], begin=begin, end=end)
+        result = hs.load_hard_sales(hw=["PS5"], begin=begin, end=end)
+        assert result["report_date"].min() == date(2021, 1, 10)
+        assert result["report_date"].max() == date(2021, 1, 31)
+        assert result.equals(expected)
+
+    def test_all_hw_with_begin_and_end(self):
+        expected = self._expected(begin=date(2020, 11, 1), end=date(2021, 1, 31))
+        result = hs.load_hard_sales(begin=date(2020, 11, 1), end=date(2021, 1, 31))
+        assert set(result["hw"].unique()) == {"NSW", "PS5"}
+        assert result.equals(expected)
+
+    def test_range_without_rows_is_empty(self):
+        result = hs.load_hard_sales(hw=["NSW"], begin=date(2030, 1, 1))
+        assert result.height == 0
+        assert "ma52w" in result.columns
+
+    def test_columns(self):
+        result = hs.load_hard_sales(hw=["PS5"], columns=["hw", "report_date", "units"])
+        assert result.columns == ["hw", "report_date", "units"]
+        assert result.height == 20
+
+    def test_range_load_does_not_fill_cache(self):
+        hs.load_hard_sales(hw=["PS5"], begin=date(2021, 1, 1))
+        assert hs._hard_sales_cache is None
+
+    def test_uses_full_cache_when_loaded(self):
+        hs.load_hard_sales()
+        with patch("gamedata.datasource.read_sql") as mock_read:
+            result = hs.load_hard_sales(hw=["PS5"], begin=date(2021, 1, 1))
+        assert mock_read.call_count == 0
+        assert result.height == 13
+
+
+# ---------------------------------------------------------------------------
+# DBに保存された派生カラム (SQLite データベース)
+# ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("hard_sales_db")
+class TestStoredDerivedColumns:
+    def _load_derived(self, monkeypatch, **kwargs):
+        with monkeypatch.context() as m:
+            m.setattr(hs, "DERIVED_SCHEMA_VERSION", -1)
+            df = hs.load_hard_sales(no_cache=True, **kwargs)
+        reset_caches()
+        return df
+
+    def test_range_matches_derivation(self, monkeypatch):
+        expected = self._load_derived(monkeypatch, hw=["NSW"], begin=date(2020, 9, 1))
+        result = hs.load_hard_sales(no_cache=True, hw=["NSW"], begin=date(2020, 9, 1))
+        assert result.schema == expected.schema
+        assert result.equals(expected)
+
+    def test_range_skips_derivation(self):
+        with patch.object(hs, "_with_derived_columns", side_effect=AssertionError):
+            result = hs.load_hard_sales(no_cache=True, hw=["PS5"], begin=date(2021, 1, 1))
+        assert result.height == 13
+        assert result["ma4w"].null_count() == 0
+
+    def test_refresh_skips_derivation(self, gamehard_db):
+        hs.load_hard_sales()
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 9000)])
+        with patch.object(hs, "_with_derived_columns", side_effect=AssertionError):
+            refreshed = hs.refresh_hard_sales()
+        assert refreshed.equals(hs.load_hard_sales(no_cache=True))
+
+    def test_version_mismatch_falls_back(self, monkeypatch):
+        monkeypatch.setattr(hs, "DERIVED_SCHEMA_VERSION", hs.DERIVED_SCHEMA_VERSION + 1)
+        with patch.object(
+            hs, "_with_derived_columns", wraps=hs._with_derived_columns
+        ) as mock_derive:
+            hs.load_hard_sales(no_cache=True, hw=["PS5"], begin=date(2021, 1, 1))
+        assert mock_derive.call_count == 1
+
+    def test_database_without_table(self, gamehard_db):
+        conn = sqlite3.connect(gamehard_db)
+        conn.execute("DROP TABLE gamehard_sales")
+        conn.close()
+        with ds.connect() as conn:
+            assert not hs._has_derived_columns(conn)
+            assert not hs._stores_update_at(conn)
+            assert hs._read_watermark(conn) is not None
+
+
+# ---------------------------------------------------------------------------
+# data_version / frame_version
+# ---------------------------------------------------------------------------
+
+@pytest.mark.usefixtures("hard_sales_db")
+class TestFrameVersion:
+    COLUMNS = ["report_date", "hw", "units"]
+
+    def test_reload_and_refresh_increase_version(self, gamehard_db):
+        hs.load_hard_sales()
+        loaded = hs.data_version()
+        hs.load_hard_sales()
+        assert hs.data_version() == loaded
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        hs.refresh_hard_sales()
+        refreshed = hs.data_version()
+        assert refreshed > loaded
+        hs.load_hard_sales(no_cache=True)
+        assert hs.data_version() > refreshed
+
+    def test_cache_and_copy_match(self):
+        cache = hs.load_hard_sales(copy=False)
+        assert hs.frame_version(cache, self.COLUMNS) == hs.data_version()
+        assert hs.frame_version(hs.load_hard_sales(), self.COLUMNS) == hs.data_version()
+
+    def test_changed_frames_do_not_match(self):
+        df = hs.load_hard_sales()
+        assert hs.frame_version(df.filter(pl.col("hw") == "PS5"), self.COLUMNS) is None
+        assert hs.frame_version(df.sort("units"), self.COLUMNS) is None
+        assert hs.frame_version(
+            df.with_columns(pl.col("hw").str.replace("PS5", "XSX")), self.COLUMNS
+        ) is None
+        assert hs.frame_version(df.drop("units"), self.COLUMNS) is None
+        assert hs.frame_version(df.lazy(), self.COLUMNS) is None
+
+    def test_reloaded_cache_does_not_match_old_frame(self):
+        df = hs.load_hard_sales()
+        hs.load_hard_sales(no_cache=True)
+        assert hs.frame_version(df, self.COLUMNS) is None
+
+    def test_without_cache(self, sample_sales_df):
+        assert hs.frame_version(sample_sales_df, self.COLUMNS) is None
+
+
+@pytest.mark.usefixtures("hard_sales_db")
+class TestLatestState:
+    @staticmethod
+    def _scan_total(df: pl.DataFrame) -> pl.DataFrame:
+        return (
+            df.sort(["hw", "sum_units"])
+            .group_by("hw", maintain_order=True)
+            .last()
+            .sort("sum_units", descending=True)
+        )
+
+    def test_matches_scan(self):
+        df = hs.load_hard_sales()
+        state = hs.latest_state()
+        assert isinstance(state, FrozenDataFrame)
+        assert state.drop("last_report_date").equals(self._scan_total(df))
+        assert state["last_report_date"].to_list() == [
+            df.filter(pl.col("hw") == hw)["report_date"].max() for hw in state["hw"]
+        ]
+        assert hs.latest_state() is state
+
+    def test_current_report_date(self):
+        df = hs.load_hard_sales()
+        assert hs.current_report_date(df) == df["report_date"].max()
+
+    def test_refresh_updates_state(self, gamehard_db):
+        hs.load_hard_sales()
+        hs.latest_state()
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 9000)])
+        with patch.object(
+            hs, "_compute_latest_state", side_effect=hs._compute_latest_state
+        ) as mock_compute:
+            df = hs.refresh_hard_sales()
+            state = hs.latest_state()
+        # 更新時に変更されたハードの分だけ計算し、latest_state()では計算し直さない
+        assert mock_compute.call_count == 1
+        assert state.drop("last_report_date").equals(self._scan_total(df))
+        assert state.filter(pl.col("hw") == "PS5")["report_date"].to_list() == [
+            date(2021, 4, 4)
+        ]
+
+    @pytest.mark.parametrize("days", [1, 365 * 3, 365 * 5, 365 * 30])
+    def test_active_hw_and_maker(self, days):
+        df = hs.load_hard_sales()
+        since = datetime.now() - timedelta(days=days)
+        recent = df.filter(pl.col("report_date") >= since)
+        assert hs.get_active_hw(days) == hs.get_hw(recent)
+        assert hs.get_active_maker(days) == hs.get_maker(recent)
+
+
+# ---------------------------------------------------------------------------
+# get_hw_all (DB モック + グローバル変数リセット)
+# ---------------------------------------------------------------------------
+
+@pytest.mark.usefixtures("fresh_caches")
+class TestGetHwAll:
     def test_returns_list(self, sample_sales_df):
         with patch.object(hs, "load_hard_sales", return_value=sample_sales_df):
             result = hs.get_hw_all()
@@ -398,13 +893,8 @@ class TestGetHwAll:
 # get_maker_all (DB モック + グローバル変数リセット)
 # ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("fresh_caches")
 class TestGetMakerAll:
-    def setup_method(self):
-        _reset_globals()
-
-    def teardown_method(self):
-        _reset_globals()
-
     def test_returns_list(self, sample_sales_df):
         with patch.object(hs, "load_hard_sales", return_value=sample_sales_df):
             result = hs.get_maker_all()
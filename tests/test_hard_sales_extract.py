@@ -79,6 +79,66 @@ class TestExtractByDate:
         assert result_all.height == result_all_default.height
 
 
+class TestExtractByDates:
+    """extract_by_dates 関数のテスト"""
+
+    def test_same_as_extract_by_date(self, sample_sales_df):
+        dates = [date(2021, 4, 4), date(2000, 1, 1), date(2020, 11, 10), date(2021, 4, 4)]
+        result = hse.extract_by_dates(sample_sales_df, dates)
+        assert result.columns == ["target_date", *sample_sales_df.columns]
+        expected = pl.concat(
+            [
+                hse.extract_by_date(sample_sales_df, d).select(
+                    pl.lit(d).alias("target_date"), pl.all()
+                )
+                for d in dates
+            ]
+        )
+        assert result.equals(expected)
+
+    def test_filter_by_hw(self, sample_sales_df):
+        result = hse.extract_by_dates(
+            sample_sales_df, [date(2021, 1, 1), date(2021, 4, 1)], hw=["PS5", "XXX"]
+        )
+        assert result["hw"].to_list() == ["PS5", "PS5"]
+        assert result["report_date"].to_list() == [date(2021, 1, 3), date(2021, 4, 4)]
+
+    def test_datetime(self, sample_sales_df):
+        # Date型のend_dateは0時として比較されるので、report_dateの日中はその週に含まれない
+        result = hse.extract_by_dates(
+            sample_sales_df, [datetime(2021, 4, 4), datetime(2021, 4, 4, 12), date(2021, 4, 1)]
+        )
+        assert result["target_date"].dtype == pl.Datetime("us")
+        assert result["target_date"].to_list() == [datetime(2021, 4, 4)] * 3 + [
+            datetime(2021, 4, 1)
+        ] * 3
+
+    def test_fourteen_day_period(self):
+        df = pl.DataFrame(
+            {
+                "hw": ["NSW", "NSW", "PS5", "PS5", "PS5"],
+                "begin_date": [
+                    date(2021, 1, 4), date(2021, 1, 18), date(2021, 1, 4), date(2021, 1, 11),
+                    date(2021, 1, 18),
+                ],
+                "end_date": [
+                    date(2021, 1, 17), date(2021, 1, 24), date(2021, 1, 10), date(2021, 1, 17),
+                    date(2021, 1, 24),
+                ],
+                "units": [1, 2, 3, 4, 5],
+            }
+        )
+        result = hse.extract_by_dates(df, [date(2021, 1, 12), date(2021, 1, 17)])
+        assert result.select("hw", "units").rows() == [
+            ("NSW", 1), ("PS5", 4), ("NSW", 1), ("PS5", 4)
+        ]
+
+    def test_empty_dates(self, sample_sales_df):
+        result = hse.extract_by_dates(sample_sales_df, [])
+        assert result.height == 0
+        assert result.columns == ["target_date", *sample_sales_df.columns]
+
+
 class TestExtractLatest:
     """extract_latest 関数のテスト"""
 
@@ -6,6 +6,7 @@ import polars as pl
 import pytest
 
 from gamedata import hard_sales_filter as hsf
+from gamedata.mode import Mode
 
 
 class TestDateFilter:
@@ -162,6 +163,52 @@ class TestYearlySales:
         assert result.height > 0
 
 
+class TestPeriodicSales:
+    """periodic_sales 関数のテスト"""
+
+    @pytest.mark.parametrize(
+        "mode,fn",
+        [
+            ("week", hsf.weekly_sales),
+            ("month", hsf.monthly_sales),
+            ("quarter", hsf.quarterly_sales),
+            ("year", hsf.yearly_sales),
+            ("fy", hsf.fiscal_yearly_sales),
+        ],
+    )
+    @pytest.mark.parametrize("maker_mode", [False, True])
+    def test_wrappers_match(self, sample_sales_df, mode, fn, maker_mode):
+        key = "maker_name" if maker_mode else "hw"
+        begin = date(2020, 1, 10)
+        result = hsf.periodic_sales(sample_sales_df, mode, key=key, begin=begin)
+        assert result.equals(fn(sample_sales_df, begin=begin, maker_mode=maker_mode))
+
+    def test_fiscal_year(self, sample_sales_df):
+        result = hsf.periodic_sales(sample_sales_df, Mode.FISCAL_YEAR)
+        nsw = result.filter(pl.col("hw") == "NSW")
+        assert nsw.columns == ["fiscal_year", "hw", "yearly_units", "sum_units"]
+        assert nsw["fiscal_year"].to_list() == [2020, 2021, 2022]
+        assert nsw["yearly_units"].to_list() == [55000, 110000, 15000]
+        assert nsw["sum_units"].to_list() == [55000, 165000, 180000]
+
+    def test_fiscal_quarter(self, sample_sales_df):
+        result = hsf.periodic_sales(sample_sales_df, "fq", key="maker_name")
+        assert result.columns == [
+            "fiscal_quarter", "fiscal_year", "fq_num", "maker_name", "quarterly_units", "sum_units"
+        ]
+        assert result["fiscal_quarter"].to_list()[:2] == ["2020FQ4", "2021FQ1"]
+
+    def test_sorted_by_period_and_units(self, sample_sales_df):
+        result = hsf.periodic_sales(sample_sales_df, Mode.WEEK)
+        assert result.equals(
+            result.sort(["report_date", "weekly_units"], descending=[False, True])
+        )
+
+    def test_invalid_key(self, sample_sales_df):
+        with pytest.raises(ValueError):
+            hsf.periodic_sales(sample_sales_df, Mode.YEAR, key="full_name")
+
+
 class TestYearlyMakerSales:
     """yearly_maker_sales 関数のテスト"""
 
@@ -209,3 +256,33 @@ class TestDeltaYearlySales:
         # NSW の sum_units は yearly_units の累積合計と一致するはず
         nsw = result.filter(pl.col("hw") == "NSW").sort("delta_year")
         assert nsw.height > 0
+
+
+class TestLazyFrameInput:
+    """LazyFrame を渡した場合のテスト"""
+
+    @pytest.mark.parametrize(
+        "fn",
+        [
+            hsf.weekly_sales,
+            hsf.monthly_sales,
+            hsf.quarterly_sales,
+            hsf.yearly_sales,
+        ],
+    )
+    def test_returns_lazyframe_with_same_result(self, sample_sales_df, fn):
+        begin = date(2020, 1, 1)
+        eager = fn(sample_sales_df, begin=begin)
+        lazy = fn(sample_sales_df.lazy(), begin=begin)
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().sort(eager.columns).equals(eager.sort(eager.columns))
+
+    def test_chain_collects_once(self, sample_sales_df):
+        lf = hsf.date_filter(sample_sales_df.lazy(), begin=date(2020, 11, 1))
+        result = hsf.yearly_maker_sales(lf)
+        assert isinstance(result, pl.LazyFrame)
+        assert set(result.collect()["maker_name"].to_list()) == {
+            "Nintendo",
+            "SONY",
+            "Microsoft",
+        }
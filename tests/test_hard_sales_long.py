@@ -294,6 +294,72 @@ class TestSalesWithOffsetLong:
         weeks = result["offset_week"].to_list()
         assert weeks == sorted(weeks)
 
+    def test_same_hw_different_begins(self, sample_sales_df):
+        nsw = sample_sales_df.filter(pl.col("hw") == "NSW").sort("report_date")
+        begins = nsw["report_date"].to_list()[:3]
+        hw_periods = [{"hw": "NSW", "begin": begin, "label": str(i)} for i, begin in enumerate(begins)]
+        result = lng.sales_with_offset_long(sample_sales_df, hw_periods, end=2)
+        # offset_week毎に、hw_periodsの順に並ぶ
+        assert result.head(3)["label"].to_list() == ["0", "1", "2"]
+        assert result["offset_week"].to_list() == sorted(result["offset_week"].to_list())
+        for i, begin in enumerate(begins):
+            units = result.filter(pl.col("label") == str(i))["units"].to_list()
+            assert units == nsw.filter(pl.col("report_date") >= begin)["units"].head(2).to_list()
+
+    def test_periods_frame(self, sample_sales_df):
+        hw_periods = [
+            {"hw": "NSW", "begin": date(2020, 1, 1), "label": "NSW"},
+            {"hw": "PS5", "begin": date(2021, 1, 1)},
+        ]
+        periods = pl.DataFrame(hw_periods)
+        result = lng.sales_with_offset_long(sample_sales_df, periods)
+        assert result.equals(lng.sales_with_offset_long(sample_sales_df, hw_periods))
+        assert set(result["label"].to_list()) <= {"NSW", "PS5:2021.01.01〜"}
+
+    def test_mixed_date_and_datetime(self, sample_sales_df):
+        hw_periods = [
+            {"hw": "NSW", "begin": date(2020, 1, 1), "label": "NSW"},
+            {"hw": "PS5", "begin": datetime(2021, 1, 1, 12), "label": "PS5"},
+        ]
+        result = lng.sales_with_offset_long(sample_sales_df, hw_periods)
+        expected = lng.sales_with_offset_long(sample_sales_df, hw_periods[:1])
+        assert result.filter(pl.col("label") == "NSW").equals(expected)
+
+
+class TestYearlyCumulativeByHwyLong:
+    """yearly_cumulative_by_hwy_long 関数のテスト"""
+
+    def test_rows_of_each_hw_year(self, sample_sales_df):
+        hw_years = [("NSW", 2020), ("NSW", 2021), ("PS5", 2021)]
+        result = lng.yearly_cumulative_by_hwy_long(sample_sales_df, hw_years)
+        assert result.columns == [*sample_sales_df.columns, "label"]
+        for hw, year in hw_years:
+            rows = result.filter(pl.col("label") == f"{hw}:{year}")
+            expected = sample_sales_df.filter((pl.col("hw") == hw) & (pl.col("year") == year))
+            assert rows.drop("label").sort("report_date").equals(expected.sort("report_date"))
+
+    def test_sorted_by_yday_then_list_order(self, sample_sales_df):
+        result = lng.yearly_cumulative_by_hwy_long(
+            sample_sales_df, [("PS5", 2021), ("NSW", 2021)]
+        )
+        assert result["yday"].to_list() == sorted(result["yday"].to_list())
+        assert result.head(2)["label"].to_list() == ["PS5:2021", "NSW:2021"]
+
+    def test_yday_range(self, sample_sales_df):
+        result = lng.yearly_cumulative_by_hwy_long(
+            sample_sales_df, [("NSW", 2020), ("XXX", 2020)], begin=6, end=300
+        )
+        assert result.height > 0
+        assert result["yday"].is_between(6, 300).all()
+        assert result["label"].unique().to_list() == ["NSW:2020"]
+
+    def test_lazyframe(self, sample_sales_df):
+        hw_years = [("NSW", 2020), ("PS5", 2020)]
+        eager = lng.yearly_cumulative_by_hwy_long(sample_sales_df, hw_years)
+        lazy = lng.yearly_cumulative_by_hwy_long(sample_sales_df.lazy(), hw_years)
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
+
 
 class TestCumulativeSalesByDeltaLong:
     """cumulative_sales_by_delta_long 関数のテスト"""
@@ -501,6 +567,41 @@ class TestCumSumDiffsLong:
         # サンプルデータには重複がないので、結果は空の可能性
         # これは正常な動作
 
+    def test_comeback_cut_per_pair(self):
+        # A は2週目にBに追いつかれ、Cには追いつかれない
+        dates = [date(2024, 1, 7), date(2024, 1, 14), date(2024, 1, 21)]
+        df = pl.DataFrame(
+            {
+                "report_date": dates * 3,
+                "hw": ["A"] * 3 + ["B"] * 3 + ["C"] * 3,
+                "sum_units": [100, 200, 300, 50, 250, 400, 10, 20, 30],
+                "index_week": [1, 2, 3] * 3,
+            }
+        )
+        result = lng.cumsum_diffs_long(df, [("B", "A"), ("C", "A")])
+        assert result["pair_name"].to_list() == ["B_A差", "C_A差", "B_A差", "C_A差", "C_A差"]
+        assert result["cumsum_diff"].to_list() == [50, 90, -50, 180, 270]
+        full = lng.cumsum_diffs_long(df, [("B", "A"), ("C", "A")], include_comeback=True)
+        assert full.height == 6
+
+    def test_multiple_pairs_same_as_each_pair(self, sample_sales_df):
+        cmplist = lng.all_pairs(["NSW", "PS5", "XSX"])
+        result = lng.cumsum_diffs_long(sample_sales_df, cmplist, include_comeback=True)
+        expected = pl.concat(
+            [lng.cumsum_diffs_long(sample_sales_df, [pair], include_comeback=True) for pair in cmplist]
+        ).sort("index_week", maintain_order=True)
+        assert result.equals(expected)
+
+
+class TestAllPairs:
+    def test_all_permutations(self):
+        assert lng.all_pairs(["A", "B", "C"]) == [
+            ("A", "B"), ("A", "C"), ("B", "A"), ("B", "C"), ("C", "A"), ("C", "B"),
+        ]
+
+    def test_single_hw(self):
+        assert lng.all_pairs(["A"]) == []
+
 
 class TestSalesPaseDiffsLong:
     """sales_pase_diffs_long 関数のテスト"""
@@ -688,3 +789,39 @@ class TestSalesPaseDiffsLong:
             # 異なるペアが存在することを確認
             pair_names = result["pair_name"].unique().to_list()
             assert len(pair_names) >= 1
+
+    def test_multiple_pairs_sorted_by_index_week(self):
+        df = pl.DataFrame(
+            {
+                "report_date": [date(2024, 1, d) for d in (7, 14, 7, 14, 7, 14)],
+                "hw": ["A", "A", "B", "B", "C", "C"],
+                "sum_units": [10, 20, 30, 40, 50, 60],
+                "index_week": [1, 2, 1, 2, 1, 2],
+            }
+        )
+        result = lng.sales_pase_diffs_long(df, [("A", "C"), ("A", "B")])
+        assert result["index_week"].to_list() == [1, 1, 2, 2]
+        assert result["pair_name"].to_list() == ["A_C差", "A_B差", "A_C差", "A_B差"]
+        assert result["pase_diff"].to_list() == [-40, -20, -40, -20]
+
+
+class TestLazyFrameInput:
+    """LazyFrame を渡した場合のテスト"""
+
+    def test_monthly_sales_long_returns_lazyframe(self, sample_sales_df):
+        eager = lng.monthly_sales_long(sample_sales_df, hw=["NSW"])
+        lazy = lng.monthly_sales_long(sample_sales_df.lazy(), hw=["NSW"])
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
+
+    def test_maker_long_returns_lazyframe(self, sample_sales_df):
+        eager = lng.maker_long(sample_sales_df)
+        lazy = lng.maker_long(sample_sales_df.lazy())
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
+
+    def test_cumsum_diffs_long_returns_lazyframe(self, sample_sales_df):
+        eager = lng.cumsum_diffs_long(sample_sales_df, [("PS5", "NSW")])
+        lazy = lng.cumsum_diffs_long(sample_sales_df.lazy(), [("PS5", "NSW")])
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
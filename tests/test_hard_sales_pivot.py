@@ -301,3 +301,50 @@ class TestCumsumDiffs:
         result = pv.cumsum_diffs(sample_sales_df, [("PS5", "NSW"), ("XSX", "NSW")])
         assert isinstance(result, pl.DataFrame)
         # XSX は PS5 より少ない週数しかないため 0行になる可能性があるが型はチェックする
+
+    def test_many_pairs_aligned_by_weeks(self, sample_sales_df):
+        cmplist = [("PS5", "NSW"), ("XSX", "NSW"), ("XSX", "PS5")]
+        result = pv.cumsum_diffs(sample_sales_df, cmplist)
+        assert result.columns == ["weeks", "NSW_PS5差", "NSW_XSX差", "PS5_XSX差"]
+        assert result["weeks"].to_list() == list(range(result.height))
+        # 各ペアの差分は、そのペアだけを計算した結果を先頭から詰めたもの
+        for pair in cmplist:
+            single = pv.cumsum_diffs(sample_sales_df, [pair])
+            name = single.columns[1]
+            assert result[name].head(single.height).equals(single[name])
+            assert result[name].slice(single.height).null_count() == result.height - single.height
+
+    def test_prior_week_of_base_is_zero(self):
+        df = pl.DataFrame(
+            {
+                "report_date": [date(2024, 1, d) for d in (7, 14, 21, 14, 21)],
+                "hw": ["A", "A", "A", "B", "B"],
+                "sum_units": [100, 200, 300, 50, 120],
+                "delta_week": [0, 1, 2, 0, 1],
+            }
+        )
+        result = pv.cumsum_diffs(df, [("B", "A")])
+        assert result.columns == ["weeks", "A_B差"]
+        assert result["A_B差"].to_list() == [100, 150, 180]
+
+
+class TestLazyFrameInput:
+    """LazyFrame を渡した場合のテスト"""
+
+    def test_pivot_sales_returns_lazyframe(self, sample_sales_df):
+        eager = pv.pivot_sales(sample_sales_df, hw=["NSW", "PS5"])
+        lazy = pv.pivot_sales(sample_sales_df.lazy(), hw=["NSW", "PS5"])
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().select(eager.columns).equals(eager)
+
+    def test_pivot_maker_returns_lazyframe(self, sample_sales_df):
+        eager = pv.pivot_maker(sample_sales_df)
+        lazy = pv.pivot_maker(sample_sales_df.lazy())
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
+
+    def test_cumsum_diffs_returns_lazyframe(self, sample_sales_df):
+        eager = pv.cumsum_diffs(sample_sales_df, [("PS5", "NSW")])
+        lazy = pv.cumsum_diffs(sample_sales_df.lazy(), [("PS5", "NSW")])
+        assert isinstance(lazy, pl.LazyFrame)
+        assert lazy.collect().equals(eager)
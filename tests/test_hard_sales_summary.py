@@ -6,6 +6,7 @@ import polars as pl
 import pytest
 
 from gamedata import hard_sales_extract as hse
+from gamedata import hard_sales_filter as hsf
 
 
 class TestHardSalesSummary:
@@ -237,6 +238,44 @@ class TestHardSalesSummary:
         assert result[0]['weeks_to_500k'] == 3
 
 
+class TestHardSalesSummaryTable:
+    """hard_sales_summary_table 関数のテスト"""
+
+    def test_matches_summary_dicts(self, sample_sales_df):
+        table = hse.hard_sales_summary_table(sample_sales_df, hw=["PS5", "NSW"])
+        assert isinstance(table, pl.DataFrame)
+        assert table.to_dicts() == hse.hard_sales_summary(sample_sales_df, hw=["PS5", "NSW"])
+
+    def test_keeps_hw_order_and_duplicates(self, sample_sales_df):
+        table = hse.hard_sales_summary_table(sample_sales_df, hw=["XSX", "UNKNOWN", "NSW", "XSX"])
+        assert table["hw"].to_list() == ["XSX", "NSW", "XSX"]
+
+    def test_columns_match_dict_keys(self, sample_sales_df):
+        table = hse.hard_sales_summary_table(sample_sales_df)
+        (summary, *_) = hse.hard_sales_summary(sample_sales_df)
+        assert table.columns == list(summary.keys())
+        assert isinstance(table.schema["sales_period"], pl.Duration)
+
+    def test_reach_week_is_first_week_at_threshold(self, sample_sales_df):
+        """累計が一度閾値に届いた後に減っても、最初に届いた週を返すこと"""
+        df = sample_sales_df.filter(pl.col("hw") == "NSW").with_columns(
+            sum_units=pl.Series([400_000, 500_000, 480_000, 900_000, 1_000_000, 1_100_000])
+        )
+        (summary,) = hse.hard_sales_summary(df)
+        index_weeks = df.sort("report_date")["index_week"].to_list()
+        assert summary["weeks_to_500k"] == index_weeks[1]
+        assert summary["weeks_to_1m"] == index_weeks[4]
+        assert summary["weeks_to_5m"] is None
+
+    def test_max_period_tie_uses_earliest(self, sample_sales_df):
+        df = sample_sales_df.filter(pl.col("hw") == "PS5").with_columns(units=pl.lit(10000))
+        (summary,) = hse.hard_sales_summary(df)
+        assert summary["max_weekly_date"] == date(2020, 11, 15)
+        assert summary["max_monthly_period"] == "2020-11"
+        assert summary["max_quarterly_period"] == "2020Q4"
+        assert summary["max_yearly_year"] == 2021
+
+
 class TestMakerSalesSummary:
     """maker_sales_summary 関数のテスト"""
 
@@ -385,3 +424,42 @@ class TestMakerSalesSummary:
         result = hse.maker_sales_summary(sample_sales_df, makers=['Microsoft'])
         assert result[0]['hw_list'] == ['XSX']
         assert result[0]['total_units'] == 9_000
+
+
+class TestMakerSalesSummaryTable:
+    """maker_sales_summary_table 関数のテスト"""
+
+    def test_matches_summary_dicts(self, sample_sales_df):
+        table = hse.maker_sales_summary_table(sample_sales_df, makers=["SONY", "Nintendo"])
+        assert isinstance(table, pl.DataFrame)
+        assert table.to_dicts() == hse.maker_sales_summary(
+            sample_sales_df, makers=["SONY", "Nintendo"]
+        )
+
+    def test_keeps_maker_order_and_duplicates(self, sample_sales_df):
+        table = hse.maker_sales_summary_table(
+            sample_sales_df, makers=["SONY", "UNKNOWN", "Microsoft", "SONY"]
+        )
+        assert table["maker_name"].to_list() == ["SONY", "Microsoft", "SONY"]
+
+    def test_uses_period_totals(self, sample_sales_df):
+        yearly = hsf.periodic_sales(sample_sales_df, "year", key="maker_name").with_columns(
+            yearly_units=pl.when(pl.col("year") == 2021)
+            .then(pl.col("yearly_units") * 10)
+            .otherwise(pl.col("yearly_units"))
+        )
+        (summary,) = hse.maker_sales_summary(
+            sample_sales_df, makers=["Nintendo"], period_totals={"year": yearly}
+        )
+        assert summary["max_yearly_year"] == 2021
+        assert summary["max_yearly_units"] == 550_000
+        assert summary["max_yearly_hw"] == ["NSW"]
+        # 指定していない粒度はdfから集計する
+        assert summary["max_monthly_units"] == 55_000
+
+    def test_max_period_tie_uses_earliest(self, sample_sales_df):
+        df = sample_sales_df.with_columns(units=pl.lit(10000))
+        (summary,) = hse.maker_sales_summary(df, makers=["Microsoft"])
+        assert summary["max_weekly_date"] == date(2021, 1, 3)
+        assert summary["max_monthly_period"] == "2021-01"
+        assert summary["max_quarterly_period"] == "2021Q1"
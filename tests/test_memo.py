@@ -0,0 +1,122 @@
+"""
+gamedata.memo モジュールのテスト
+"""
+from datetime import date, datetime
+
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_sales_filter as hsf
+from gamedata import hard_sales_long as hsl
+from gamedata import memo
+from conftest import insert_weekly_rows
+
+
+@pytest.fixture(autouse=True)
+def use_db(hard_sales_db):
+    memo.enable_memo(True, maxsize=memo.DEFAULT_MAXSIZE)
+
+
+class TestMemoize:
+    def test_disabled_by_default(self):
+        memo.enable_memo(False)
+        df = hs.load_hard_sales()
+        hsl.monthly_sales_long(df, hw=["NSW"])
+        hsl.monthly_sales_long(df, hw=["NSW"])
+        assert memo.memo_info()["size"] == 0
+        assert memo.memo_info()["hits"] == 0
+
+    def test_same_arguments_hit(self):
+        df = hs.load_hard_sales()
+        first = hsl.sales_long(df, hw=["NSW", "PS5"], begin=date(2020, 1, 1))
+        # 別のlistオブジェクトや、copy=Trueで取り直したDataFrameでも同じキーになる
+        second = hsl.sales_long(hs.load_hard_sales(), ["NSW", "PS5"], begin=date(2020, 1, 1))
+        assert second.equals(first)
+        assert memo.memo_info()["hits"] == 1
+        assert memo.memo_info()["misses"] == 1
+
+    def test_different_arguments_miss(self):
+        df = hs.load_hard_sales()
+        hsl.sales_long(df, hw=["NSW"], begin=date(2020, 1, 1))
+        hsl.sales_long(df, hw=["PS5"], begin=date(2020, 1, 1))
+        hsl.sales_long(df, hw=["NSW"], begin=datetime(2020, 1, 1))
+        hsf.monthly_sales(df, begin=date(2020, 1, 1))
+        assert memo.memo_info()["hits"] == 0
+        assert memo.memo_info()["misses"] == 4
+
+    def test_nested_calls_are_memoized(self):
+        df = hs.load_hard_sales()
+        hsl.monthly_sales_long(df, hw=["NSW"])
+        hsf.monthly_sales(df)
+        assert memo.memo_info()["hits"] == 1
+        assert memo.memo_info()["misses"] == 2
+
+    def test_returned_frame_can_be_modified(self):
+        df = hs.load_hard_sales()
+        first = hsf.yearly_sales(df)
+        first[0, "yearly_units"] = -1
+        second = hsf.yearly_sales(df)
+        second[0, "yearly_units"] = -2
+        assert hsf.yearly_sales(df).equals(hsf.yearly_sales(df.lazy()).collect())
+
+    def test_filtered_frame_is_not_memoized(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "PS5")
+        hsf.yearly_sales(df)
+        hsf.yearly_sales(df)
+        assert memo.memo_info()["size"] == 0
+
+    def test_projected_frame_uses_own_entry(self):
+        df = hs.load_hard_sales()
+        hsl.sales_long(df, hw=["NSW"])
+        projected = df.select(["hw", "report_date", "units", "weekly_id"])
+        result = hsl.sales_long(projected, hw=["NSW"])
+        memo.enable_memo(False)
+        assert result.equals(hsl.sales_long(projected, hw=["NSW"]))
+        assert result.columns == ["hw", "report_date", "units", "weekly_id"]
+
+    def test_reordered_frame_uses_own_entry(self):
+        df = hs.load_hard_sales()
+        hsl.sales_long(df, hw=["NSW"])
+        reordered = df.select(list(reversed(df.columns)))
+        result = hsl.sales_long(reordered, hw=["NSW"])
+        assert memo.memo_info()["hits"] == 0
+        memo.enable_memo(False)
+        assert result.columns == hsl.sales_long(reordered, hw=["NSW"]).columns
+
+    def test_lru_eviction(self):
+        memo.enable_memo(True, maxsize=2)
+        df = hs.load_hard_sales()
+        hsf.yearly_sales(df)
+        hsf.monthly_sales(df)
+        hsf.yearly_sales(df)  # yearly_salesを最近使ったものにする
+        hsf.weekly_sales(df)  # monthly_salesが破棄される
+        assert memo.memo_info()["size"] == 2
+        hsf.yearly_sales(df)
+        hsf.monthly_sales(df)
+        assert memo.memo_info()["hits"] == 2
+        assert memo.memo_info()["misses"] == 4
+
+    def test_reload_invalidates(self):
+        df = hs.load_hard_sales()
+        hsf.yearly_sales(df)
+        hs.load_hard_sales(no_cache=True)
+        assert memo.memo_info()["size"] == 0
+        hsf.yearly_sales(hs.load_hard_sales())
+        assert memo.memo_info()["hits"] == 0
+
+    def test_refresh_invalidates(self, gamehard_db):
+        before = hsf.weekly_sales(hs.load_hard_sales())
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        after = hsf.weekly_sales(hs.refresh_hard_sales())
+        assert after.height == before.height + 1
+        assert memo.memo_info()["hits"] == 0
+
+    def test_clear_memo(self):
+        df = hs.load_hard_sales()
+        hsf.yearly_sales(df)
+        hsf.yearly_sales(df)
+        memo.clear_memo()
+        assert memo.memo_info() == {
+            "enabled": True, "hits": 0, "misses": 0, "size": 0, "maxsize": memo.DEFAULT_MAXSIZE
+        }
@@ -0,0 +1,104 @@
+"""
+gamedata.milestone モジュールのテスト
+"""
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_sales_extract as hse
+from gamedata import hard_sales_report as ch
+from gamedata import milestone as ms
+from conftest import insert_weekly_rows
+
+
+pytestmark = pytest.mark.usefixtures("hard_sales_db")
+
+
+def _scan_reached(df: pl.DataFrame, threshold_units: int) -> pl.DataFrame:
+    """索引を使わずに全体を走査して到達週を求める"""
+    return (
+        df.sort(["hw", "report_date"])
+        .filter(pl.col("sum_units") >= threshold_units)
+        .group_by("hw", maintain_order=True)
+        .first()
+        .sort("report_date")
+    )
+
+
+class TestExtractWeekReachedUnitsUsesIndex:
+    @pytest.mark.parametrize("threshold", [-1, 0, 1, 20000, 100000, 300000, 10_000_000])
+    def test_same_result_as_scan(self, threshold):
+        df = hs.load_hard_sales()
+        assert ms.index_for(df) is not None
+        assert hse.extract_week_reached_units(df, threshold).equals(
+            _scan_reached(df, threshold)
+        )
+
+    def test_selected_columns(self):
+        df = hs.load_hard_sales().select(["report_date", "hw", "sum_units"])
+        result = hse.extract_week_reached_units(df, 100000)
+        assert result.columns == ["hw", "report_date", "sum_units"]
+        assert result.equals(_scan_reached(df, 100000))
+
+    def test_filtered_frame_is_scanned(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "PS5")
+        assert ms.index_for(df) is None
+        assert hse.extract_week_reached_units(df, 1)["hw"].to_list() == ["PS5"]
+
+    def test_index_built_once(self):
+        df = hs.load_hard_sales()
+        with patch.object(
+            ms.MilestoneIndex, "__init__", autospec=True, side_effect=ms.MilestoneIndex.__init__
+        ) as mock_init:
+            for threshold in (1000, 50000, 200000):
+                hse.extract_week_reached_units(df, threshold)
+                ch.reached_unit_summary(threshold)
+        assert mock_init.call_count == 1
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = ms.get_milestone_index()
+        assert ms.get_milestone_index() is first
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 1_000_000)])
+        df = hs.refresh_hard_sales()
+        assert ms.index_for(df) is not first
+        result = hse.extract_week_reached_units(df, 1_000_000)
+        assert result.filter(pl.col("hw") == "PS5")["weekly_id"].to_list() == ["2021-04-04_PS5"]
+
+
+class TestMilestoneTable:
+    def test_matches_scan(self):
+        df = hs.load_hard_sales()
+        table = hse.milestone_table(df, step=50000)
+        assert table.columns == ["threshold_units", *ms.MILESTONE_COLUMNS]
+        for row in table.iter_rows(named=True):
+            expected = _scan_reached(df, row["threshold_units"]).filter(
+                pl.col("hw") == row["hw"]
+            )
+            assert expected["report_date"].to_list() == [row["report_date"]]
+            assert expected["sum_units"].to_list() == [row["sum_units"]]
+
+    def test_contains_only_reached_thresholds(self):
+        df = hs.load_hard_sales()
+        table = hse.milestone_table(df, step=100000)
+        totals = dict(df.group_by("hw").agg(pl.col("sum_units").max()).iter_rows())
+        for hw, total in totals.items():
+            thresholds = table.filter(pl.col("hw") == hw)["threshold_units"].to_list()
+            assert thresholds == list(range(100000, total + 1, 100000))
+
+    def test_cached_per_step(self):
+        index = ms.get_milestone_index()
+        assert index.milestones(100000) is index.milestones(100000)
+        assert index.milestones(100000) is not index.milestones(200000)
+        with pytest.raises(TypeError):
+            index.milestones(100000).drop_in_place("hw")
+
+    def test_other_frame(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "NSW")
+        expected = hse.milestone_table(hs.load_hard_sales()).filter(pl.col("hw") == "NSW")
+        assert hse.milestone_table(df).equals(expected)
+
+    def test_invalid_step(self):
+        with pytest.raises(ValueError):
+            hse.milestone_table(hs.load_hard_sales(), step=0)
@@ -0,0 +1,143 @@
+"""
+database/update/refresh_analysis.py のテスト
+"""
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import _load_refresh_analysis, insert_weekly_rows
+
+
+def _query(db_path: str, sql: str) -> list[tuple]:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+class TestAddDerivedColumns:
+    def _derive(self, units_list, first_date=date(2020, 12, 6)) -> list[dict]:
+        refresh_analysis = _load_refresh_analysis()
+        rows = []
+        for i, units in enumerate(units_list):
+            report_date = first_date + timedelta(weeks=i)
+            row = {
+                "weekly_id": f"{report_date.isoformat()}_NSW",
+                "report_date": report_date.isoformat(),
+                "hw": "NSW",
+                "units": units,
+                "year": report_date.year,
+                "month": report_date.month,
+                "delta_week": i,
+                "delta_month": 0,
+                "delta_year": 0,
+            }
+            rows.append(tuple(row.get(col) for col in refresh_analysis.HARD_SALES_VIEW_COLUMNS))
+        columns = (
+            refresh_analysis.HARD_SALES_VIEW_COLUMNS + refresh_analysis.HARD_SALES_DERIVED_COLUMNS
+        )
+        return [dict(zip(columns, row)) for row in refresh_analysis.add_derived_columns(rows)]
+
+    def test_moving_average_rounds_half_to_even(self):
+        # 4週平均が 2.5 / 3.5 になる行(Polarsのround()と同じく偶数側に丸める)
+        rows = self._derive([1, 2, 3, 4, 5])
+        assert [row["ma4w"] for row in rows] == [None, None, None, 2, 4]
+        assert [row["ma13w"] for row in rows] == [None] * 5
+
+    def test_units_diff_and_yearly_sum(self):
+        rows = self._derive([10, 30, 25, 40, 5])
+        assert [row["units_diff"] for row in rows] == [None, 20, -5, 15, -35]
+        # 2020-12-06〜12-27は2020年、2021-01-03から2021年
+        assert [row["yearly_sum_units"] for row in rows] == [10, 40, 65, 105, 5]
+
+    def test_calendar_columns(self):
+        (row,) = self._derive([1], date(2025, 1, 5))
+        assert (row["q_num"], row["fiscal_year"], row["fiscal_month"], row["fq_num"]) == (
+            1, 2025, 10, 4
+        )
+        assert (row["quarter"], row["fiscal_quarter"]) == ("2025Q1", "2025FQ4")
+        assert (row["index_week"], row["yday"], row["yweek"]) == (1, 5, 2)
+
+
+class TestRebuildHardSalesTable:
+    def test_table_matches_join(self, gamehard_db):
+        refresh_analysis = _load_refresh_analysis()
+        columns = ", ".join(refresh_analysis.HARD_SALES_VIEW_COLUMNS + ["update_at"])
+        expected = _query(gamehard_db, refresh_analysis.HARD_SALES_SELECT)
+        assert (
+            _query(gamehard_db, f"SELECT {columns} FROM gamehard_sales ORDER BY weekly_id")
+            == expected
+        )
+        assert len(expected) == 100
+
+    def test_view_is_alias_of_table(self, gamehard_db):
+        refresh_analysis = _load_refresh_analysis()
+        (sql,) = _query(
+            gamehard_db, "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'hard_sales'"
+        )[0]
+        assert "FROM gamehard_sales" in sql
+        view_columns = [row[1] for row in _query(gamehard_db, "PRAGMA table_info(hard_sales)")]
+        assert view_columns == refresh_analysis.HARD_SALES_VIEW_COLUMNS
+
+    def test_stores_schema_version(self, gamehard_db):
+        refresh_analysis = _load_refresh_analysis()
+        assert _query(gamehard_db, "SELECT DISTINCT schema_version FROM gamehard_sales") == [
+            (refresh_analysis.HARD_SALES_SCHEMA_VERSION,)
+        ]
+
+    def test_creates_indexes(self, gamehard_db):
+        indexes = {
+            name: [row[2] for row in _query(gamehard_db, f"PRAGMA index_info({name})")]
+            for (name,) in _query(
+                gamehard_db,
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+                " AND tbl_name = 'gamehard_sales' AND sql IS NOT NULL",
+            )
+        }
+        assert indexes == {
+            "idx_gamehard_sales_hw_report_date": ["hw", "report_date"],
+            "idx_gamehard_sales_report_date": ["report_date"],
+        }
+
+    def test_hw_range_query_uses_index(self, gamehard_db):
+        plan = _query(
+            gamehard_db,
+            "EXPLAIN QUERY PLAN SELECT * FROM hard_sales"
+            " WHERE hw = 'PS5' AND report_date >= '2021-01-01'",
+        )
+        assert any("idx_gamehard_sales_hw_report_date" in row[3] for row in plan)
+
+    def test_reflects_new_rows(self, gamehard_db):
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        rows = _query(
+            gamehard_db,
+            "SELECT units, sum_units FROM hard_sales WHERE weekly_id = '2021-04-04_PS5'",
+        )
+        assert rows == [(12000, sum(15000 - i * 300 for i in range(20)) + 12000)]
+
+    def test_rebuild_failure_rolls_back_analysis(self, gamehard_db, monkeypatch):
+        refresh_analysis = _load_refresh_analysis()
+
+        def fail(conn):
+            raise RuntimeError("rebuild failed")
+
+        monkeypatch.setattr(refresh_analysis, "_rebuild_hard_sales", fail)
+        conn = sqlite3.connect(gamehard_db)
+        conn.execute("DELETE FROM gamehard_weekly WHERE hw = 'PS5'")
+        conn.commit()
+        conn.close()
+        with pytest.raises(RuntimeError):
+            refresh_analysis.insert_weekly_analysis(gamehard_db, debug_mode=False)
+        analysis = "SELECT COUNT(*) FROM gamehard_weekly_analysis WHERE id LIKE '%_PS5'"
+        assert _query(gamehard_db, analysis) == [(20,)]
+        assert _query(gamehard_db, "SELECT COUNT(*) FROM hard_sales WHERE hw = 'PS5'") == [(20,)]
+
+    def test_debug_mode_does_not_modify(self, gamehard_db):
+        conn = sqlite3.connect(gamehard_db)
+        conn.execute("DELETE FROM gamehard_weekly WHERE hw = 'PS5'")
+        conn.commit()
+        conn.close()
+        _load_refresh_analysis().rebuild_hard_sales_table(gamehard_db, debug_mode=True)
+        assert _query(gamehard_db, "SELECT COUNT(*) FROM hard_sales WHERE hw = 'PS5'") == [(20,)]
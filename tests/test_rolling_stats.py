@@ -0,0 +1,89 @@
+"""
+gamedata.rolling_stats モジュールと rolling() のテスト
+"""
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_sales_extract as hse
+from gamedata import rolling_stats as rs
+from conftest import insert_weekly_rows
+
+
+pytestmark = pytest.mark.usefixtures("hard_sales_db")
+
+
+class TestRolling:
+    def test_mean_matches_derived_columns(self):
+        df = hs.load_hard_sales()
+        result = hse.rolling(df)
+        assert result.columns == [*df.columns, "units_mean4w", "units_mean13w", "units_mean52w"]
+        for window in rs.DEFAULT_WINDOWS:
+            rounded = result[f"units_mean{window}w"].round(0).cast(pl.Int64)
+            assert rounded.to_list() == result[f"ma{window}w"].to_list()
+
+    def test_same_result_as_scan(self):
+        df = hs.load_hard_sales()
+        result = hse.rolling(df, ["sum", "std", "min", "max", "ewm"], [3])
+        ps5 = result.filter(pl.col("hw") == "PS5").sort("report_date")
+        units = ps5["units"]
+        assert ps5["units_sum3w"].to_list() == units.rolling_sum(3).to_list()
+        assert ps5["units_std3w"].to_list() == units.rolling_std(3).to_list()
+        assert ps5["units_min3w"].to_list() == units.rolling_min(3).to_list()
+        assert ps5["units_max3w"].to_list() == units.rolling_max(3).to_list()
+        assert ps5["units_ewm3w"].to_list() == units.ewm_mean(span=3, min_samples=3).to_list()
+
+    def test_unsorted_frame(self):
+        df = hs.load_hard_sales()
+        expected = hse.rolling(df, ["sum"], [4])
+        shuffled = df.sample(fraction=1.0, shuffle=True, seed=1)
+        assert rs.stats_for(shuffled, "hw", "units") is None
+        result = hse.rolling(shuffled, ["sum"], [4])
+        assert result.sort("weekly_id").equals(expected.sort("weekly_id"))
+
+    def test_by_none(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "NSW")
+        result = hse.rolling(df, ["mean"], [4], by=None)
+        assert result["units_mean4w"].round(0).cast(pl.Int64).to_list() == df["ma4w"].to_list()
+
+    def test_other_value_column(self):
+        df = hs.load_hard_sales()
+        result = hse.rolling(df, ["max"], [2], value="sum_units")
+        assert "sum_units_max2w" in result.columns
+
+    @pytest.mark.parametrize(
+        "stats, windows", [(["median"], [4]), (["mean"], [0]), (["mean"], [-1])]
+    )
+    def test_invalid(self, stats, windows):
+        with pytest.raises(ValueError):
+            hse.rolling(hs.load_hard_sales(), stats, windows)
+
+
+class TestRollingStatsCache:
+    def test_computed_once_per_stat_and_window(self):
+        df = hs.load_hard_sales()
+        with patch.object(rs, "_stat_expr", side_effect=rs._stat_expr) as mock_expr:
+            hse.rolling(df, ["mean", "std"], [4, 13])
+            hse.rolling(hs.load_hard_sales(), ["std", "sum"], [13, 26])
+        computed = [call.args[1:3] for call in mock_expr.call_args_list]
+        assert computed == [
+            ("mean", 4), ("mean", 13), ("std", 4), ("std", 13),
+            ("std", 26), ("sum", 13), ("sum", 26),
+        ]
+
+    def test_cached_frame_uses_cache(self):
+        df = hs.load_hard_sales()
+        stats = rs.stats_for(df, "hw", "units")
+        assert stats is not None
+        assert rs.stats_for(hs.load_hard_sales(), "hw", "units") is stats
+        assert rs.stats_for(df.filter(pl.col("hw") == "PS5"), "hw", "units") is None
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = rs.get_rolling_stats()
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        df = hs.refresh_hard_sales()
+        assert rs.stats_for(df, "hw", "units") is not first
+        ps5 = hse.rolling(df, ["sum"], [1]).filter(pl.col("hw") == "PS5")
+        assert ps5.sort("report_date")["units_sum1w"][-1] == 12000
@@ -0,0 +1,97 @@
+"""
+gamedata.sales_cube モジュールのテスト
+"""
+from datetime import date, datetime
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_sales_filter as hsf
+from gamedata import sales_cube as sc
+from conftest import insert_weekly_rows
+
+
+pytestmark = pytest.mark.usefixtures("hard_sales_db")
+
+
+RANGES = [
+    (None, None),
+    (date(2020, 1, 15), None),
+    (None, datetime(2020, 8, 20)),
+    (date(2019, 8, 10), date(2020, 12, 31)),
+    (date(2030, 1, 1), None),
+]
+
+
+class TestFilterFunctionsUseCube:
+    """load_hard_sales()の戻り値を渡すと、group_byした場合と同じ結果をキューブから返すこと"""
+
+    @pytest.mark.parametrize(
+        "fn", [hsf.weekly_sales, hsf.monthly_sales, hsf.quarterly_sales, hsf.yearly_sales]
+    )
+    @pytest.mark.parametrize("begin,end", RANGES)
+    @pytest.mark.parametrize("maker_mode", [False, True])
+    def test_same_result_as_group_by(self, fn, begin, end, maker_mode):
+        df = hs.load_hard_sales()
+        # LazyFrameはキューブを使わずにgroup_byで集計される
+        expected = fn(df.lazy(), begin=begin, end=end, maker_mode=maker_mode).collect()
+        result = fn(df, begin=begin, end=end, maker_mode=maker_mode)
+        assert result.columns == expected.columns
+        assert result.sort(result.columns).equals(expected.sort(expected.columns))
+        period = result.columns[0]
+        assert result[period].equals(expected[period])
+
+    def test_delta_yearly_sales(self):
+        df = hs.load_hard_sales()
+        expected = hsf.delta_yearly_sales(df.lazy()).collect()
+        assert hsf.delta_yearly_sales(df).equals(expected)
+
+    def test_filtered_frame_is_aggregated_directly(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "PS5")
+        assert sc.cube_for(df) is None
+        assert hsf.yearly_sales(df)["hw"].unique().to_list() == ["PS5"]
+
+
+class TestSalesCube:
+    def test_aggregates_once_per_granularity(self):
+        df = hs.load_hard_sales()
+        with patch.object(
+            sc.SalesCube, "_aggregate", autospec=True, side_effect=sc.SalesCube._aggregate
+        ) as mock_aggregate:
+            for _ in range(3):
+                hsf.monthly_sales(df)
+                hsf.yearly_sales(df, maker_mode=True)
+        assert mock_aggregate.call_count == 2
+
+    def test_table_is_read_only(self):
+        table = sc.get_sales_cube().table("year", "hw")
+        with pytest.raises(TypeError):
+            table.drop_in_place("units")
+
+    def test_fiscal_granularities(self):
+        df = hs.load_hard_sales()
+        cube = sc.get_sales_cube()
+        fiscal_year = cube.table("fiscal_year", "hw")
+        expected = df.group_by(["fiscal_year", "hw"]).agg(pl.col("units").sum())
+        assert fiscal_year.select(expected.columns).sort(["hw", "fiscal_year"]).equals(
+            expected.sort(["hw", "fiscal_year"])
+        )
+        fiscal_quarter = cube.table("fiscal_quarter", "maker_name")
+        assert fiscal_quarter["units"].sum() == df["units"].sum()
+        assert fiscal_quarter.columns == [
+            "fiscal_quarter", "fiscal_year", "fq_num", "maker_name", "units", "sum_units"
+        ]
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = sc.get_sales_cube()
+        assert sc.get_sales_cube() is first
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        df = hs.refresh_hard_sales()
+        cube = sc.cube_for(df)
+        assert cube is not first
+        latest = hsf.weekly_sales(df).filter(
+            (pl.col("report_date") == date(2021, 4, 4)) & (pl.col("hw") == "PS5")
+        )
+        assert latest["weekly_units"].to_list() == [12000]
@@ -0,0 +1,154 @@
+"""
+gamedata.sales_lookup モジュールと sales_value / sales_values のテスト
+"""
+from datetime import date, datetime
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_sales_extract as hse
+from gamedata import sales_lookup as sl
+from conftest import insert_weekly_rows
+
+
+pytestmark = pytest.mark.usefixtures("hard_sales_db")
+
+
+def _week(hw: str, **conditions) -> dict:
+    """索引を使わずに条件に合う週の行を取得する"""
+    df = hs.load_hard_sales().filter(pl.col("hw") == hw)
+    for column, value in conditions.items():
+        df = df.filter(pl.col(column) == value)
+    (row,) = df.to_dicts()
+    return row
+
+
+class TestSalesValue:
+    def test_index_week(self):
+        row = _week("PS5", index_week=3)
+        assert hse.sales_value("PS5", index_week=3) == row["units"]
+        assert hse.sales_value("PS5", index_week=3, cumulative=True) == row["sum_units"]
+
+    def test_latest_week(self):
+        df = hs.load_hard_sales().filter(pl.col("hw") == "NSW")
+        assert hse.sales_value("NSW", index_week=-1, cumulative=True) == df["sum_units"].max()
+
+    @pytest.mark.parametrize(
+        "target",
+        [date(2021, 2, 1), date(2021, 2, 7), datetime(2021, 2, 3, 12), datetime(2021, 2, 1)],
+    )
+    def test_report_date_in_week(self, target):
+        row = _week("PS5", report_date=date(2021, 2, 7))
+        assert (row["begin_date"], row["end_date"]) == (date(2021, 2, 1), date(2021, 2, 7))
+        assert hse.sales_value("PS5", report_date=target) == row["units"]
+
+    def test_datetime_after_end_date(self):
+        # Date型のend_dateは0時として比較されるので、end_dateの日中はどの週にも含まれない
+        with pytest.raises(ValueError):
+            hse.sales_value("PS5", report_date=datetime(2021, 2, 7, 12))
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {},
+            {"index_week": 0},
+            {"report_date": date(2021, 2, 7), "index_week": 1},
+            {"index_week": 1000},
+            {"report_date": date(1990, 1, 1)},
+        ],
+    )
+    def test_invalid_or_missing(self, kwargs):
+        with pytest.raises(ValueError):
+            hse.sales_value("PS5", **kwargs)
+
+    def test_unknown_hw(self):
+        with pytest.raises(ValueError):
+            hse.sales_value("XXX", index_week=-1)
+
+
+class TestSalesValues:
+    def test_batch_in_request_order(self):
+        nsw_week = hs.load_hard_sales().filter(pl.col("hw") == "NSW")["index_week"][1]
+        requests = [
+            {"hw": "NSW", "index_week": nsw_week},
+            {"hw": "PS5", "report_date": date(2021, 2, 3)},
+            {"hw": "XXX", "index_week": 1},
+            {"hw": "PS5", "index_week": -1},
+        ]
+        result = hse.sales_values(requests)
+        assert result.columns == sl.LOOKUP_COLUMNS
+        assert result["hw"].to_list() == ["NSW", "PS5", "XXX", "PS5"]
+        assert result["units"].to_list() == [
+            _week("NSW", index_week=nsw_week)["units"],
+            _week("PS5", report_date=date(2021, 2, 7))["units"],
+            None,
+            hs.load_hard_sales().filter(pl.col("hw") == "PS5")["units"][-1],
+        ]
+
+    def test_dataframe_requests(self):
+        requests = pl.DataFrame({"hw": ["PS5", "PS5"], "index_week": [1, 3]})
+        result = hse.sales_values(requests)
+        assert result["index_week"].to_list() == [1, 3]
+        assert result["report_date"].to_list() == [
+            _week("PS5", index_week=1)["report_date"],
+            _week("PS5", index_week=3)["report_date"],
+        ]
+
+    def test_empty_requests(self):
+        result = hse.sales_values([])
+        assert result.height == 0
+        assert result.columns == sl.LOOKUP_COLUMNS
+
+    def test_invalid_request(self):
+        with pytest.raises(ValueError):
+            hse.sales_values([{"hw": "PS5", "index_week": 1}, {"hw": "PS5"}])
+
+    def test_index_built_once(self):
+        with patch.object(
+            sl.SalesLookup, "__init__", autospec=True, side_effect=sl.SalesLookup.__init__
+        ) as mock_init:
+            for week in range(1, 6):
+                hse.sales_value("PS5", index_week=week)
+            hse.sales_values([{"hw": "PS5", "index_week": week} for week in range(1, 6)])
+        assert mock_init.call_count == 1
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = sl.get_sales_lookup()
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        hs.refresh_hard_sales()
+        assert sl.get_sales_lookup() is not first
+        assert hse.sales_value("PS5", report_date=date(2021, 4, 1)) == 12000
+
+
+class TestWeekIntervals:
+    def test_cached_frame_uses_index(self):
+        df = hs.load_hard_sales()
+        intervals = sl.intervals_for(df)
+        assert intervals is not None
+        assert sl.intervals_for(hs.load_hard_sales()) is intervals
+        assert sl.intervals_for(df.filter(pl.col("hw") == "PS5")) is None
+
+    def test_same_result_as_scan(self):
+        df = hs.load_hard_sales()
+        dates = [date(2020, 11, 10), date(2021, 2, 3), datetime(2021, 3, 28, 1), date(2030, 1, 1)]
+        result = hse.extract_by_dates(df, dates, hw=["PS5", "NSW"])
+        expected = pl.concat(
+            [
+                df.filter(
+                    (pl.col("begin_date") <= d)
+                    & (pl.col("end_date") >= d)
+                    & pl.col("hw").is_in(["PS5", "NSW"])
+                ).select(pl.lit(d, dtype=pl.Datetime("us")).alias("target_date"), pl.all())
+                for d in dates
+            ]
+        )
+        assert result.equals(expected)
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = sl.intervals_for(hs.load_hard_sales())
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        df = hs.refresh_hard_sales()
+        assert sl.intervals_for(df) is not first
+        assert hse.extract_by_date(df, date(2021, 4, 1), hw=["PS5"])["units"].to_list() == [12000]
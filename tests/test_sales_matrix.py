@@ -0,0 +1,132 @@
+"""
+gamedata.sales_matrix モジュールと、それを使うピボットテーブルのテスト
+"""
+from datetime import date, datetime
+from unittest.mock import patch
+
+import numpy as np
+import polars as pl
+import pytest
+
+import gamedata.hard_sales as hs
+from gamedata import hard_info as hi
+from gamedata import hard_sales_long as hsl
+from gamedata import hard_sales_pivot as pv
+from gamedata import sales_matrix as sm
+from conftest import insert_weekly_rows
+
+
+pytestmark = pytest.mark.usefixtures("hard_sales_db")
+
+
+class TestScatter:
+    def test_duplicate_cells_use_last_value(self):
+        row = np.array([0, 1, 0, 1, 0])
+        col = np.array([0, 1, 0, 0, 0])
+        values = np.array([1, 2, 3, 4, 5])
+        matrix = sm._scatter((2, 2), row, col, values, add=False)
+        assert matrix.tolist() == [[5, 0], [4, 2]]
+
+    def test_add_sums_duplicate_cells(self):
+        row = np.array([0, 1, 0])
+        col = np.array([0, 1, 0])
+        matrix = sm._scatter((2, 2), row, col, np.array([1, 2, 3]), add=True)
+        assert matrix.tolist() == [[4, 0], [0, 2]]
+
+
+class TestSalesMatrix:
+    def test_axes_and_masks(self):
+        df = hs.load_hard_sales()
+        matrix = sm.get_sales_matrix()
+        assert matrix.hw == hi.sort_hard(sorted(df["hw"].unique().to_list()))
+        assert matrix.units.shape == (df["report_date"].n_unique(), len(matrix.hw))
+        assert matrix.delta_units.shape == (df["delta_week"].n_unique(), len(matrix.hw))
+        assert matrix.valid.sum() == matrix.delta_valid.sum() == df.height
+        assert not matrix.units.flags.writeable
+
+        ps5 = df.filter(pl.col("hw") == "PS5").sort("report_date")
+        j = matrix.hw.index("PS5")
+        rows = np.searchsorted(matrix.report_date, ps5["report_date"].to_numpy())
+        assert matrix.units[rows, j].tolist() == ps5["units"].to_list()
+        assert matrix.sum_units[rows, j].tolist() == ps5["sum_units"].to_list()
+        assert matrix.valid[:, j].sum() == ps5.height
+
+    def test_views_share_memory(self):
+        matrix = sm.get_sales_matrix()
+        view = pv.pivot_sales(hs.load_hard_sales(), hw=["PS5"])
+        assert np.shares_memory(view["PS5"].to_numpy(), matrix.units)
+
+    def test_built_once(self):
+        df = hs.load_hard_sales()
+        with patch.object(
+            sm.SalesMatrix, "__init__", autospec=True, side_effect=sm.SalesMatrix.__init__
+        ) as mock_init:
+            pv.pivot_sales(df)
+            pv.pivot_cumulative_sales(hs.load_hard_sales(), hw=["PS5"])
+            pv.pivot_sales_by_delta(df, end=52)
+            pv.pivot_cumulative_sales_by_delta(df, begin=10)
+        assert mock_init.call_count == 1
+
+    def test_cached_frame_uses_matrix(self):
+        df = hs.load_hard_sales()
+        matrix = sm.matrix_for(df)
+        assert matrix is not None
+        assert sm.matrix_for(hs.load_hard_sales()) is matrix
+        assert sm.matrix_for(df.filter(pl.col("hw") == "PS5")) is None
+        assert sm.matrix_for(df.lazy()) is None
+
+    def test_rebuilt_after_refresh(self, gamehard_db):
+        first = sm.get_sales_matrix()
+        insert_weekly_rows(gamehard_db, [("PS5", "2021-04-04", 12000)])
+        df = hs.refresh_hard_sales()
+        assert sm.matrix_for(df) is not first
+        result = pv.pivot_sales(df, hw=["PS5"])
+        assert result["PS5"][-1] == 12000
+
+
+class TestPivotFromMatrix:
+    @pytest.mark.parametrize("hw", [[], ["PS5"], ["NSW", "PS5"], ["XXX"]])
+    @pytest.mark.parametrize(
+        "begin, end",
+        [
+            (None, None),
+            (date(2021, 1, 1), None),
+            (datetime(2021, 2, 7, 12), datetime(2021, 3, 28, 1)),
+            (date(2030, 1, 1), None),
+        ],
+    )
+    def test_calendar_same_as_long(self, hw, begin, end):
+        df = hs.load_hard_sales()
+        expected = pv._pivot(
+            hsl.sales_long(df, hw=hw, begin=begin, end=end),
+            index="report_date", on="hw", values="units",
+        )
+        assert pv.pivot_sales(df, hw=hw, begin=begin, end=end).equals(expected)
+        expected = pv._pivot(
+            hsl.cumulative_sales_long(df, hw=hw, begin=begin, end=end),
+            index="report_date", on="hw", values="sum_units",
+        )
+        assert pv.pivot_cumulative_sales(df, hw=hw, begin=begin, end=end).equals(expected)
+
+    @pytest.mark.parametrize("hw", [[], ["NSW", "PS5"]])
+    @pytest.mark.parametrize("begin, end", [(None, None), (0, 10), (5, 20), (20, 5)])
+    def test_delta_same_as_long(self, hw, begin, end):
+        df = hs.load_hard_sales()
+        expected = pv._pivot(
+            hsl.sales_by_delta_long(df, begin=begin, end=end, hw=hw),
+            index="delta_week", on="hw", values="units",
+        )
+        assert pv.pivot_sales_by_delta(df, begin=begin, end=end, hw=hw).equals(expected)
+        expected = pv._pivot(
+            hsl.cumulative_sales_by_delta_long(df, hw=hw, begin=begin, end=end),
+            index="delta_week", on="hw", values="sum_units",
+        )
+        result = pv.pivot_cumulative_sales_by_delta(df, hw=hw, begin=begin, end=end)
+        assert result.equals(expected)
+
+    def test_other_modes_use_long(self):
+        df = hs.load_hard_sales()
+        with patch.object(sm.SalesMatrix, "delta_view") as mock_view:
+            result = pv.pivot_sales_by_delta(df, mode="month")
+        mock_view.assert_not_called()
+        assert result.columns[0] == "delta_month"